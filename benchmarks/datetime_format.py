@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Compare `pale.serializers.format_datetime` with the
+`arrow.get(obj).isoformat()` call it replaced, for naive and aware datetimes.
+
+Run from the repository root:
+
+    python benchmarks/datetime_format.py
+"""
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import arrow
+from dateutil import tz
+
+from pale.serializers import format_datetime, PaleDefaultJSONEncoder
+
+
+def arrow_isoformat(obj):
+    return arrow.get(obj).isoformat()
+
+
+def main(count=10000, number=10):
+    start = datetime.datetime(2015, 6, 1, 12, 30, 15, 250000)
+    step = datetime.timedelta(minutes=17, microseconds=3)
+    naive = [start + step * i for i in range(count)]
+    offset = tz.tzoffset(None, -5 * 3600)
+    aware = [dt.replace(tzinfo=offset) for dt in naive]
+
+    for label, values in (('naive', naive), ('aware', aware)):
+        assert map(arrow_isoformat, values) == map(format_datetime, values)
+        arrow_time = min(timeit.repeat(lambda: map(arrow_isoformat, values),
+                                       number=number, repeat=3))
+        fast_time = min(timeit.repeat(lambda: map(format_datetime, values),
+                                      number=number, repeat=3))
+        print "%d %s datetimes, %d iterations" % (count, label, number)
+        print "  arrow.get().isoformat(): %.2f us/value" % (
+                arrow_time / number / count * 1e6)
+        print "  format_datetime:         %.2f us/value" % (
+                fast_time / number / count * 1e6)
+        print "  speedup:                 %.1fx" % (arrow_time / fast_time)
+
+    # and end to end, through the default JSON encoder
+    payload = [{'created': a, 'updated': n} for a, n in zip(aware, naive)]
+    encode = PaleDefaultJSONEncoder().encode
+    encode_time = min(timeit.repeat(lambda: encode(payload),
+                                    number=number, repeat=3))
+    print "encoding %d timestamps: %.2f ms/response" % (
+            2 * count, encode_time / number * 1e3)
+
+
+if __name__ == '__main__':
+    main()
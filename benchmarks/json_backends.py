@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Compare the JSON backends in `pale.serializers` on a rendered payload.
+
+Run from the repository root:
+
+    python benchmarks/json_backends.py
+
+Backends that aren't installed are skipped.
+"""
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pale.serializers import available_backends, get_serializer
+
+
+class Money(object):
+    def __init__(self, cents):
+        self.cents = cents
+
+    def to_dict(self):
+        return {'cents': self.cents, 'currency': 'USD'}
+
+
+def rendered_payload(count):
+    created = datetime.datetime(2015, 1, 1, 12, 0, 0)
+    return {'comments': [{
+        'id': i,
+        'body': u'Comment number %d, caf\xe9 and all.' % i,
+        'score': i / 7.0,
+        'deleted': False,
+        'created': created + datetime.timedelta(seconds=i),
+        'price': Money(i * 100),
+        'author': {'id': i % 50, 'name': 'Author %d' % (i % 50)},
+        'tags': ['one', 'two', 'three'],
+    } for i in range(count)]}
+
+
+def main(count=2000, number=20):
+    payload = rendered_payload(count)
+    print "%d rendered comments, %d iterations" % (count, number)
+    baseline = None
+    for backend in available_backends():
+        encode = get_serializer(backend).encode
+        elapsed = min(timeit.repeat(lambda: encode(payload),
+                                    number=number, repeat=3))
+        if baseline is None:
+            baseline = elapsed
+        print "%-10s %7.2f ms/response  (%.1fx stdlib)" % (
+                backend, elapsed / number * 1e3, baseline / elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Compare the type-dispatch registry in `PaleDefaultJSONEncoder.default`
+with the exception-driven fallback it replaced, on a payload full of
+`to_dict` model objects.
+
+Run from the repository root:
+
+    python benchmarks/json_default.py
+"""
+import datetime
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import arrow
+
+from pale.serializers import PaleDefaultJSONEncoder
+
+
+class LegacyJSONEncoder(json.JSONEncoder):
+    """PaleDefaultJSONEncoder as it was before the encoder registry."""
+
+    def default(self, obj):
+        try:
+            if isinstance(obj, datetime.datetime):
+                encoded = arrow.get(obj).isoformat()
+            else:
+                encoded = json.JSONEncoder.default(self, obj)
+        except TypeError as e:
+            if hasattr(obj, 'to_dict') and callable(obj.to_dict):
+                encoded = obj.to_dict()
+            else:
+                raise e
+        return encoded
+
+
+class Tag(object):
+    def __init__(self, i):
+        self.i = i
+
+    def to_dict(self):
+        return {'id': self.i}
+
+
+def main(count=5000, number=20):
+    payload = [Tag(i) for i in range(count)]
+    legacy = LegacyJSONEncoder().encode
+    registry = PaleDefaultJSONEncoder().encode
+    assert legacy(payload) == registry(payload)
+
+    legacy_time = min(timeit.repeat(lambda: legacy(payload),
+                                    number=number, repeat=3))
+    registry_time = min(timeit.repeat(lambda: registry(payload),
+                                      number=number, repeat=3))
+    print "%d to_dict objects, %d iterations" % (count, number)
+    print "exception fallback: %.2f ms/response" % (
+            legacy_time / number * 1e3)
+    print "encoder registry:   %.2f ms/response" % (
+            registry_time / number * 1e3)
+    print "speedup:            %.1fx" % (legacy_time / registry_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Compare Pale's compiled argument parse plan with the old parsing loop.
+
+Run from the repository root:
+
+    python benchmarks/parse_args.py
+
+The endpoint below looks like a typical high-traffic index endpoint, with a
+pile of optional arguments of which a request only passes a couple.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pale import Endpoint
+from pale.arguments import (BooleanArgument, FloatArgument, IntegerArgument,
+        StringArgument, StringListArgument)
+from pale.context import DefaultContext
+from pale.endpoint import get_current_context, set_current_context
+
+
+class IndexEndpoint(Endpoint):
+    _http_method = 'GET'
+    _uri = '/things'
+    _route_name = 'things'
+
+    offset = IntegerArgument('Pagination offset', default=0)
+    count = IntegerArgument('Page size', default=20, min_value=1,
+            max_value=100)
+    query = StringArgument('Search query')
+    sort = StringArgument('Sort key', default='created')
+    descending = BooleanArgument('Sort descending?', default=True)
+    include_deleted = BooleanArgument('Include deleted things?',
+            default=False)
+    owner = StringArgument('Owner id')
+    min_price = FloatArgument('Minimum price')
+    max_price = FloatArgument('Maximum price')
+    tags = StringListArgument('Tags', separator=',')
+    category = StringArgument('Category')
+    created_after = IntegerArgument('Created after (epoch seconds)')
+    created_before = IntegerArgument('Created before (epoch seconds)')
+    locale = StringArgument('Locale', default='en')
+    verbose = BooleanArgument('Verbose output?')
+
+
+RAW_ARGS = {'count': ['50'], 'query': ['guitar']}
+
+
+def legacy_parse_args(endpoint):
+    """The per-request argument loop Pale used before parse plans."""
+    context = get_current_context()
+    endpoint._patch_args()
+
+    parsed_args = dict()
+    if endpoint._arguments is not None:
+        if not isinstance(endpoint._arguments, dict):
+            raise ValueError("broken endpoint")
+
+        for arg_name, arg_obj in endpoint._arguments.iteritems():
+            patched_value = context.patched_args.get(arg_name, None)
+            if patched_value is not None and \
+                    isinstance(patched_value, list) and \
+                    len(patched_value) == 1 and \
+                    list not in arg_obj.allowed_types:
+                patched_value = patched_value[0]
+
+            validated_value = arg_obj.validate(patched_value, arg_name)
+            if validated_value is not None:
+                parsed_args[arg_name] = validated_value
+    context.args = parsed_args
+
+
+def main(number=20000):
+    endpoint = IndexEndpoint()
+    context = DefaultContext()
+    context._raw_args = RAW_ARGS
+    set_current_context(context)
+
+    legacy_parse_args(endpoint)
+    legacy_result = context.args
+    endpoint._parse_args()
+    assert context.args == legacy_result, (context.args, legacy_result)
+
+    legacy = min(timeit.repeat(lambda: legacy_parse_args(endpoint),
+                               number=number, repeat=3))
+    compiled = min(timeit.repeat(endpoint._parse_args,
+                                 number=number, repeat=3))
+
+    print "%d arguments, %d passed in, %d iterations" % (
+            len(IndexEndpoint._arguments), len(RAW_ARGS), number)
+    print "legacy loop:   %.2f usec/request" % (legacy / number * 1e6)
+    print "compiled plan: %.2f usec/request" % (compiled / number * 1e6)
+    print "speedup:       %.1fx" % (legacy / compiled)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Compare rendering a list endpoint through intermediate dicts with Pale's
+direct-to-JSON compiled encoder (`_direct_json = True`).
+
+Run from the repository root:
+
+    python benchmarks/render_json.py
+"""
+import datetime
+import os
+import resource
+import subprocess
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pale import Endpoint, Resource, ResourceList
+from pale.context import DefaultContext
+from pale.fields import (IntegerField, ResourceField, StringField,
+        TimestampField)
+
+
+class Author(object):
+    def __init__(self, i):
+        self.id = i
+        self.name = 'Author %d' % i
+        self.email = 'author%d@example.com' % i
+
+
+class Comment(object):
+    def __init__(self, i):
+        self.id = i
+        self.body = u'Comment number %d, with some text in it.' % i
+        self.likes = i * 3
+        self.author = Author(i % 50)
+        self.created = datetime.datetime(2015, 1, 1) + \
+                datetime.timedelta(minutes=i)
+
+
+class AuthorResource(Resource):
+    _value_type = 'author'
+    id = IntegerField('id')
+    name = StringField('name')
+    email = StringField('email')
+
+
+class CommentResource(Resource):
+    _value_type = 'comment'
+    id = IntegerField('id')
+    body = StringField('body')
+    likes = IntegerField('likes')
+    created = TimestampField('created')
+    author = ResourceField('author', resource_type=AuthorResource)
+
+
+class CommentsEndpoint(Endpoint):
+    _http_method = 'GET'
+    _uri = '/comments'
+    _route_name = 'comments'
+    _returns = ResourceList('comments', CommentResource)
+
+
+class DirectCommentsEndpoint(CommentsEndpoint):
+    _route_name = 'direct_comments'
+    _direct_json = True
+
+
+def peak_memory(mode, count):
+    """Measure the growth in peak RSS (in MB) from encoding one response,
+    in a fresh process so the two modes don't share a high-water mark."""
+    if mode is None:
+        return dict((m, float(subprocess.check_output(
+            [sys.executable, __file__, 'memory', m, str(count)])))
+            for m in ('rendered', 'direct'))
+
+    context = DefaultContext()
+    payload = {'comments': [Comment(i) for i in range(count)]}
+    if mode == 'direct':
+        endpoint = DirectCommentsEndpoint()
+        encode = endpoint._encode_direct_json
+    else:
+        endpoint = CommentsEndpoint()
+        encode = endpoint._encode_rendered_content
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    encode(payload, context, endpoint._returns)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (after - before) / 1024.0
+
+
+def main(count=5000, number=10):
+    context = DefaultContext()
+    payload = {'comments': [Comment(i) for i in range(count)]}
+    rendered = CommentsEndpoint()
+    direct = DirectCommentsEndpoint()
+
+    def run_rendered():
+        return rendered._encode_rendered_content(payload, context,
+                rendered._returns)
+
+    def run_direct():
+        return direct._encode_direct_json(payload, context, direct._returns)
+
+    assert len(run_rendered()) == len(run_direct())
+
+    rendered_time = min(timeit.repeat(run_rendered, number=number,
+                                      repeat=3))
+    direct_time = min(timeit.repeat(run_direct, number=number, repeat=3))
+
+    print "%d comments per response, %d iterations" % (count, number)
+    print "render + encode: %.2f ms/response" % (
+            rendered_time / number * 1e3)
+    print "direct json:     %.2f ms/response" % (direct_time / number * 1e3)
+    print "speedup:         %.1fx" % (rendered_time / direct_time)
+
+    memory_count = count * 10
+    memory = peak_memory(None, memory_count)
+    print "peak memory growth for %d comments:" % memory_count
+    print "render + encode: %.1f MB" % memory['rendered']
+    print "direct json:     %.1f MB" % memory['direct']
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['memory']:
+        print peak_memory(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
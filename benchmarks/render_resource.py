@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Compare `Resource._render_serializable` using compiled field accessor
+plans with the per-field `render` loop it replaced.
+
+Run from the repository root:
+
+    python benchmarks/render_resource.py
+"""
+import logging
+import os
+import sys
+import timeit
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pale import Resource
+from pale.fields import (DecimalField, IntegerField, ResourceField,
+        StringField)
+
+
+class Account(object):
+    def __init__(self, i):
+        self.id = i
+        self.name = 'Account %d' % i
+
+
+class Order(object):
+    def __init__(self, i):
+        self.id = i
+        self.status = 'shipped'
+        self.total = Decimal(i) / 7
+        self.quantity = i % 12
+        self.note = None
+        self.account = Account(i % 20)
+
+    def reference(self):
+        return 'ORD-%06d' % self.id
+
+
+class AccountResource(Resource):
+    _value_type = 'Benchmark account'
+
+    id = IntegerField("The id")
+    name = StringField("The name")
+
+
+class OrderResource(Resource):
+    _value_type = 'Benchmark order'
+
+    id = IntegerField("The id")
+    status = StringField("The status")
+    total = DecimalField("The total", quantize='.01', prefix='$')
+    quantity = IntegerField("The quantity")
+    note = StringField("A note")
+    reference = StringField("The order reference")
+    code = StringField("The status code", value=lambda o: o.status[:2])
+    account = ResourceField("The account", resource_type=AccountResource)
+
+
+def legacy_render(resource, obj, context):
+    """Resource._render_serializable as it was before accessor plans."""
+    if obj is None:
+        return None
+    output = {}
+    for field in resource._fields_to_render:
+        renderer = resource._fields[field].render
+        output[field] = renderer(obj, field, context)
+    return output
+
+
+def compare(resource, orders, number):
+    count = len(orders)
+    assert [legacy_render(resource, o, None) for o in orders] == \
+            [resource._render_serializable(o, None) for o in orders]
+
+    legacy_time = min(timeit.repeat(
+            lambda: [legacy_render(resource, o, None) for o in orders],
+            number=number, repeat=3))
+    compiled_time = min(timeit.repeat(
+            lambda: [resource._render_serializable(o, None) for o in orders],
+            number=number, repeat=3))
+    print "%d objects, fields %s, %d iterations" % (
+            count, ', '.join(resource._fields_to_render), number)
+    print "  field.render loop:  %.2f us/object" % (
+            legacy_time / number / count * 1e6)
+    print "  compiled accessors: %.2f us/object" % (
+            compiled_time / number / count * 1e6)
+    print "  speedup:            %.1fx" % (legacy_time / compiled_time)
+
+
+def main(count=2000, number=10):
+    # `_render_serializable` logs at info level, which isn't being measured
+    logging.disable(logging.INFO)
+    orders = [Order(i) for i in range(count)]
+    fields = OrderResource._default_fields
+    compare(OrderResource(fields=fields), orders, number)
+    # Python 2's decimal module is pure Python, and quantizing dominates the
+    # time above, so compare the rest of the fields on their own too
+    compare(OrderResource(fields=[f for f in fields if f != 'total']),
+            orders, number)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,7 +17,8 @@ from .endpoint import (Endpoint,
                         PatchEndpoint, ResourcePatch,
                         PutResourceEndpoint,
                         )
-from .resource import NoContentResource, Resource, ResourceList
+from .resource import FileResource, NoContentResource, Resource, ResourceList
+from .serializers import RawJSON
 
 try:
     """Google App Engine won't let you read a file from the file system like
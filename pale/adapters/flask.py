@@ -1,4 +1,5 @@
 from __future__ import absolute_import
+import logging
 import flask
 from flask import Blueprint
 
@@ -26,6 +27,22 @@ class ContextualizedHandler(object):
         return self.handler(request)
 
 
+def stream_response_body(response, chunks, content_length=None):
+    """Send `chunks` as the body of a Flask response as they're generated.
+
+    Werkzeug sends an iterable response body without buffering it, and
+    if the length isn't known up front, the server can send it chunked.  A
+    body with a known length (a file) is passed straight through to the
+    server, so a `wsgi.file_wrapper` reaches it intact.
+    """
+    response.response = chunks
+    if content_length is None:
+        del response.headers['Content-Length']
+    else:
+        response.headers['Content-Length'] = str(content_length)
+        response.direct_passthrough = True
+
+
 def bind_blueprint(pale_api_module, flask_blueprint):
     """Binds an implemented pale API module to a Flask Blueprint."""
 
@@ -47,6 +64,9 @@ def bind_blueprint(pale_api_module, flask_blueprint):
 
     for endpoint in endpoints:
         endpoint._set_response_class(RESPONSE_CLASS)
+        endpoint._set_response_streamer(stream_response_body)
+        if endpoint._static:
+            endpoint._prerender_static()
         method = [endpoint._http_method]
         name = endpoint._route_name
         handler = endpoint._execute
@@ -59,12 +79,13 @@ def bind_blueprint(pale_api_module, flask_blueprint):
 
 
 class DefaultFlaskContext(pale.context.DefaultContext):
+    __slots__ = ('route_kwargs',)
 
     def build_args_from_request(self, request):
         # in flask, `request.values` is querystring args, and form args
         req_args = request.values.to_dict(flat=False)
         if request.content_type == 'application/json':
-            json_args = request.get_json()
+            json_args = self.json_body
             for k,v in json_args.iteritems():
                 if k in req_args:
                     logging.warning("Found duplicate argument %s. "
@@ -72,14 +93,34 @@ class DefaultFlaskContext(pale.context.DefaultContext):
                 req_args[k] = v
         return req_args
 
+    def _lookup_arg(self, name):
+        """Look up a single argument, like `build_args_from_request`."""
+        request = self.request
+        if request.content_type == 'application/json':
+            json_args = self.json_body
+            if name in json_args:
+                if name in request.values:
+                    logging.warning("Found duplicate argument %s. "
+                            "Preferring json argument to querystring arg.",
+                            name)
+                return json_args[name]
+        return request.values.getlist(name) or None
+
+    def _load_raw_args(self):
+        return pale.context.RequestArgs(self)
+
+    def _load_headers(self):
+        return self.request.headers
+
+    def _load_cookies(self):
+        return self.request.cookies
+
+    def _load_body(self):
+        return self.request.data
+
     def __init__(self, endpoint, request):
         super(DefaultFlaskContext, self).__init__()
-        self.headers = request.headers
-        self.cookies = request.cookies
         self.request = request
-        self.body = request.data
-        self._raw_args = self.build_args_from_request(request)
         self.route_kwargs = request.view_args
-        self.current_user = None
         self.endpoint = endpoint
 
@@ -3,7 +3,6 @@ import logging
 import webapp2
 
 import pale
-import json
 
 RESPONSE_CLASS = webapp2.Response
 
@@ -17,6 +16,18 @@ try:
 except Exception, exc:
     logging.warn("Failed to monkeypatch webapp2: %r", exc)
 
+def stream_response_body(response, chunks, content_length=None):
+    """Send `chunks` as the body of a webapp2 response as they're generated.
+
+    Setting a WebOb response's `app_iter` replaces its body, and drops the
+    Content-Length that was set for the original (empty) body, so it's set
+    again if the length is known.
+    """
+    response.app_iter = chunks
+    if content_length is not None:
+        response.content_length = content_length
+
+
 def pale_webapp2_request_handler_generator(pale_endpoint):
     """Generate a webapp2.RequestHandler class for the pale endpoint.
 
@@ -66,6 +77,9 @@ def bind_pale_to_webapp2(pale_app_module,
 
     for endpoint in endpoints:
         endpoint._set_response_class(RESPONSE_CLASS)
+        endpoint._set_response_streamer(stream_response_body)
+        if endpoint._static:
+            endpoint._prerender_static()
         method = endpoint._http_method
         name = endpoint._route_name
 
@@ -75,16 +89,22 @@ def bind_pale_to_webapp2(pale_app_module,
         if route_prefix is not None:
             route_uri = "%s%s" % (route_prefix, route_uri)
 
+        methods = [method, "OPTIONS"]
+        if method == "GET":
+            # GET endpoints answer HEAD requests too, like they do in Flask
+            methods.append("HEAD")
+
         route = webapp2.Route(
                 route_uri,
                 handler=req_handler,
                 name=name,
                 handler_method='pale_handler',
-                methods=[method, "OPTIONS"])
+                methods=methods)
         webapp_wsgiapplication.router.add(route)
 
 
 class DefaultWebapp2Context(pale.context.DefaultContext):
+    __slots__ = ('route_kwargs',)
 
     def build_args_from_request(self, request):
         keys = request.arguments()
@@ -94,10 +114,7 @@ class DefaultWebapp2Context(pale.context.DefaultContext):
             req_args[key] = request.get_all(key)
 
         if request.content_type == 'application/json':
-            try:
-                json_args = request.json_body
-            except AttributeError:
-                json_args = json.loads(request.body)
+            json_args = self.json_body
 
             for k,v in json_args.iteritems():
                 if k in req_args:
@@ -113,14 +130,41 @@ class DefaultWebapp2Context(pale.context.DefaultContext):
             req_args[k] = v
         return req_args
 
+    def _lookup_arg(self, name):
+        """Look up a single argument, like `build_args_from_request`."""
+        request = self.request
+        value = request.get_all(name) or None
+        if request.content_type == 'application/json':
+            json_args = self.json_body
+            if name in json_args:
+                if value is not None:
+                    logging.warning("Found duplicate argument %s. "
+                            "Preferring json argument to querystring arg.",
+                            name)
+                value = json_args[name]
+        if name in request.route_kwargs:
+            if value is not None:
+                logging.warning("Found duplicate argument %s. "
+                        "Preferring route argument to querystring and args.",
+                        name)
+            value = request.route_kwargs[name]
+        return value
+
+    def _load_raw_args(self):
+        return pale.context.RequestArgs(self)
+
+    def _load_headers(self):
+        return self.request.headers
+
+    def _load_cookies(self):
+        return self.request.cookies
+
+    def _load_body(self):
+        return self.request.body
+
     def __init__(self, endpoint, request):
         super(DefaultWebapp2Context, self).__init__()
-        self.headers = request.headers
-        self.cookies = request.cookies
         self.request = request
-        self.body = request.body
-        self._raw_args = self.build_args_from_request(request)
         self.route_args = request.route_args
         self.route_kwargs = request.route_kwargs
-        self.current_user = None
         self.endpoint = endpoint
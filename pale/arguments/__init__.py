@@ -2,5 +2,6 @@ from .base import BaseArgument, JsonDictArgument, ListArgument
 from .boolean import BooleanArgument
 from .number import FloatArgument, IntegerArgument
 from .scope import ScopeArgument
+from .selection import ExpandArgument, FieldSelectionArgument
 from .string import StringArgument, StringListArgument
 from .url import URLArgument
@@ -5,6 +5,20 @@ import logging
 from pale.errors import ArgumentError
 from pale.fields import BaseField
 
+
+def pure_validator(validate):
+    """Mark an Argument's `validate` method as a pure function of its input
+    and the argument's configuration.
+
+    Endpoints compile a parse plan for their arguments when they're declared,
+    and for arguments with a pure validator, the outcome of validating a
+    missing (None) value is resolved once at that point instead of on every
+    request.  Subclasses that override `validate` don't inherit the mark, so
+    they're always validated per request unless they opt in themselves.
+    """
+    validate._pale_pure_validator = True
+    return validate
+
 class BaseArgument(BaseField):
     """The base class for Pale Arguments.
 
@@ -111,14 +125,14 @@ class ListArgument(BaseArgument):
         # should we also validate that the list is not empty?
 
 
-    def validate_items(self, input_list):
+    def validate_items(self, input_list, item_name=None):
         """Validates that items in the list are of the type specified.
 
-        Returns the input list if it's valid, or raises an ArgumentError if
-        it's not."""
+        Returns the input list if it's valid, or raises an ArgumentError
+        (for `item_name`) if it's not."""
         output_list = []
         for item in input_list:
-            valid = self.list_item_type.validate(item, self.item_name)
+            valid = self.list_item_type.validate(item, item_name)
             output_list.append(valid)
 
             # this might lead to confusing error messages.  tbh, we need to
@@ -128,8 +142,10 @@ class ListArgument(BaseArgument):
         return output_list
 
 
+    @pure_validator
     def validate(self, item, item_name):
-        self.item_name = item_name
+        # arguments are shared by every request, so nothing about this one
+        # is kept on `self`
         if item is None:
             item = self.default
         self._validate_type(item, item_name)
@@ -142,7 +158,7 @@ class ListArgument(BaseArgument):
             return item
 
         item_list = list(item)
-        validated_list = self.validate_items(item_list)
+        validated_list = self.validate_items(item_list, item_name)
         return validated_list
 
 
@@ -155,6 +171,7 @@ class JsonDictArgument(BaseArgument):
         super(JsonDictArgument, self).__init__(*args, **kwargs)
 
 
+    @pure_validator
     def validate(self, item, item_name):
         if isinstance(item, basestring):
             try:
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 from pale.errors import ArgumentError
-from .base import BaseArgument
+from .base import BaseArgument, pure_validator
 
 class BooleanArgument(BaseArgument):
     allowed_types = (bool, )
 
+    @pure_validator
     def validate(self, item, item_name):
         if item is None:
             item = self.default
@@ -1,6 +1,6 @@
 from pale.errors.validation import ArgumentError
 
-from .base import BaseArgument
+from .base import BaseArgument, pure_validator
 
 class IntegerArgument(BaseArgument):
     value_type = 'integer'
@@ -8,6 +8,7 @@ class IntegerArgument(BaseArgument):
     min_value = None
     max_value = None
 
+    @pure_validator
     def validate(self, item, item_name):
         if item is None:
             item = self.default
@@ -61,6 +62,7 @@ class FloatArgument(BaseArgument):
     min_value = None
     max_value = None
 
+    @pure_validator
     def validate(self, item, item_name):
         if item is None:
             item = self.default
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import re
+
+from pale.arguments.base import BaseArgument, pure_validator
+from pale.errors import ArgumentError
+
+
+_FIELD_NAME = re.compile(r'^[A-Za-z][A-Za-z0-9_]*$')
+
+
+def _freeze_selection(tree):
+    """Turn a nested dict of field names into a sorted tuple of
+    `(name, child_selection)` pairs, where `child_selection` is None when
+    the field should render its own default fields."""
+    return tuple((name, _freeze_selection(child) if child else None)
+                 for name, child in sorted(tree.iteritems()))
+
+
+def _parse_field_paths(item, item_name, separator, max_depth=None):
+    """Parse a list of dotted field paths into a frozen selection.
+
+    `item` is a separated string of paths, or a list of them when the
+    argument was passed more than once.  Returns None if no paths were
+    given.
+    """
+    if isinstance(item, (list, tuple)):
+        item = separator.join(item)
+
+    tree = {}
+    for path in item.split(separator):
+        path = path.strip()
+        if not path:
+            continue
+        names = path.split('.')
+        if max_depth is not None and len(names) > max_depth:
+            raise ArgumentError(item_name,
+                    "`%s` is nested more than %d levels deep." % (
+                        path, max_depth))
+        node = tree
+        for name in names:
+            if not _FIELD_NAME.match(name):
+                raise ArgumentError(item_name,
+                        "`%s` is not a valid field name." % name)
+            node = node.setdefault(str(name), {})
+
+    if not tree:
+        return None
+    return _freeze_selection(tree)
+
+
+class FieldSelectionArgument(BaseArgument):
+    """An argument for selecting which fields of the response to render.
+
+    The value is a comma-separated list of field names of the endpoint's
+    `_returns` resource (or of the item resource of a ResourceList), and
+    nested resource fields can be narrowed with dots, i.e.
+
+        ?fields=id,title,author.name
+
+    renders only the `id`, `title`, and `author` fields, and only the `name`
+    of the author.  Naming a nested resource field without a dot renders its
+    default fields.
+
+    The validated value is a hashable selection: a sorted tuple of
+    `(field_name, child_selection)` pairs, with `child_selection` being None
+    or another selection.  The endpoint checks the selection against the
+    resource's `_fields` after the arguments are parsed, and renders the
+    response with a copy of the resource narrowed to the selection (see
+    `Resource._select_fields`).  Handlers can also inspect the selection to
+    skip loading data that won't be rendered.
+
+    An endpoint may declare at most one FieldSelectionArgument.
+    """
+    allowed_types = (str, unicode, list, tuple)
+    separator = ','
+
+    @pure_validator
+    def validate(self, item, item_name):
+        if item is None:
+            item = self.default
+        self._validate_type(item, item_name)
+        self._validate_required(item, item_name)
+        if item is None:
+            return None
+
+        selection = _parse_field_paths(item, item_name, self.separator)
+        if selection is None and self.required is True:
+            raise ArgumentError(item_name,
+                    "This argument is required, and must name at least one "
+                    "field.")
+        return selection
+
+
+class ExpandArgument(BaseArgument):
+    """An argument for expanding `expandable` nested resource fields.
+
+    Resource fields declared with `expandable=True` render a stub (like the
+    nested object's key) unless they're named by the request's expand
+    argument, in which case the nested object is fetched and rendered with
+    its resource.  Paths use the same syntax as FieldSelectionArgument, so
+
+        ?expand=author,comments.author
+
+    expands the `author` field, and the `author` of each of the `comments`.
+    Paths can be at most `max_depth` fields long.
+
+    The validated value is a selection in the same format as
+    FieldSelectionArgument's, which the endpoint checks against its
+    `_returns` resource after the arguments are parsed (see
+    `Resource._expand_fields`).  An endpoint may declare at most one
+    ExpandArgument.
+    """
+    allowed_types = (str, unicode, list, tuple)
+    separator = ','
+    max_depth = 2
+
+    @pure_validator
+    def validate(self, item, item_name):
+        if item is None:
+            item = self.default
+        self._validate_type(item, item_name)
+        self._validate_required(item, item_name)
+        if item is None:
+            return None
+        return _parse_field_paths(item, item_name, self.separator,
+                                  self.max_depth)
+
+
+    def doc_dict(self):
+        doc = super(ExpandArgument, self).doc_dict()
+        doc['max_depth'] = self.max_depth
+        return doc
@@ -1,4 +1,4 @@
-from pale.arguments.base import BaseArgument, ListArgument
+from pale.arguments.base import BaseArgument, ListArgument, pure_validator
 from pale.errors import ArgumentError
 
 class StringArgument(BaseArgument):
@@ -6,6 +6,7 @@ class StringArgument(BaseArgument):
     min_length = None
     max_length = None
 
+    @pure_validator
     def validate(self, item, item_name):
         if item is None:
             # TODO: should we also set the default here if item is empty string?
@@ -42,6 +43,7 @@ class StringListArgument(ListArgument):
         self.trim_whitespace = kwargs.pop('trim_whitespace', False)
         super(StringListArgument, self).__init__(*args, **kwargs)
 
+    @pure_validator
     def validate(self, item_list, item_name):
         if item_list is None:
             item_list = self.default
@@ -2,6 +2,7 @@ from __future__ import absolute_import
 import string
 import urlparse
 
+from pale.arguments.base import pure_validator
 from pale.arguments.string import StringArgument
 from pale.errors import ArgumentError
 
@@ -12,9 +13,9 @@ class URLArgument(StringArgument):
         self.path_only = kwargs.pop('path_only', False)
         super(URLArgument, self).__init__(*args, **kwargs)
 
-    def validate_url(self, original_string):
+    def validate_url(self, original_string, item_name=None):
         """Returns the original string if it was valid, raises an argument
-        error if it's not.
+        error (for `item_name`) if it's not.
         """
 
         # nipped from stack overflow: http://stackoverflow.com/questions/827557/how-do-you-validate-a-url-with-a-regular-expression-in-python
@@ -32,14 +33,14 @@ class URLArgument(StringArgument):
                 assert pieces.scheme in ['http', 'https']
 
         except AssertionError as e:
-            raise ArgumentError(self.item_name,
+            raise ArgumentError(item_name,
                     "The input you've provided is not a valid URL.")
         return pieces
 
+    @pure_validator
     def validate(self, item, item_name):
-        self.item_name = item_name
         item = super(URLArgument, self).validate(item, item_name)
 
         if item is not None:
-            item = self.validate_url(item)
+            item = self.validate_url(item, item_name)
         return item
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Batched loading of nested objects for Resource fields.
+
+A ResourceField or ResourceListField declared with a `batch_key` and a
+`batch_load` function doesn't fetch its nested object with `getattr`.
+Instead, `batch_key(obj)` returns the key (or, for a ResourceListField, the
+list of keys) of the nested object(s), and `batch_load(keys, context)`
+fetches the objects for a list of keys in one round trip, returning a dict
+that maps each key to its object.
+
+When a list of objects is rendered, their Resource calls `_prefetch` with
+the whole list first, which collects the keys that every batched field
+needs and calls each `batch_load` function once.  Fields that share a
+`batch_load` function (say, a post's `author` and `editor`) share the call,
+and the loaded objects are cached on the request context, so later renders
+in the same request don't load them again.  Keys that weren't prefetched
+are loaded when they're rendered.
+"""
+
+
+def loaded_objects(loader, context):
+    """Return the per-request cache of objects loaded by `loader`."""
+    cache = getattr(context, '_batch_loaded', None)
+    if cache is None:
+        cache = context._batch_loaded = {}
+    loaded = cache.get(loader)
+    if loaded is None:
+        loaded = cache[loader] = {}
+    return loaded
+
+
+def load_batch(loader, keys, context):
+    """Load the objects for `keys` with `loader`, skipping the keys that
+    were loaded already, and return the loaded objects in key order.
+
+    Keys that the loader doesn't return an object for are None.
+    """
+    if context is None:
+        # nowhere to cache anything, so just load what was asked for
+        results = loader(list(set(keys)), context) if keys else {}
+        return [results.get(key) for key in keys]
+
+    loaded = loaded_objects(loader, context)
+    missing = []
+    for key in keys:
+        if key not in loaded:
+            missing.append(key)
+    if missing:
+        missing = list(set(missing))
+        results = loader(missing, context)
+        for key in missing:
+            loaded[key] = results.get(key)
+    return [loaded[key] for key in keys]
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""Caches for rendered Pale output.
+
+Resources can reuse rendered objects across requests with a
+`_fragment_cache`, and GET endpoints can reuse whole responses with a
+`_response_cache`.  Either is a cache backend: anything with the methods of
+`BaseCache`.  `LRUCache` is a bounded, in-process backend; a backend that's
+shared between processes can be dropped in instead.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+class BaseCache(object):
+    """The interface of a Pale cache backend.
+
+    Keys are hashable, and may be tuples, so backends that store values
+    outside of the process need to turn them into strings themselves (with
+    `repr` and a hash, say).  Values are whatever Pale renders: strings,
+    and tuples, dicts and lists of JSON-serializable values.
+    """
+
+    def get(self, key):
+        """Return the value cached for `key`, or None if there isn't one (or
+        it has expired)."""
+        raise NotImplementedError("get() must be implemented by cache "
+                "backends.")
+
+
+    def set(self, key, value, size=0, ttl=None):
+        """Cache `value` for `key`.
+
+        `size` is the value's approximate size in bytes, which backends can
+        use to limit their memory use, and `ttl` is the number of seconds
+        the value can be used for, or None to use the backend's default.
+        """
+        raise NotImplementedError("set() must be implemented by cache "
+                "backends.")
+
+
+    def delete(self, key):
+        raise NotImplementedError("delete() must be implemented by cache "
+                "backends.")
+
+
+    def clear(self):
+        raise NotImplementedError("clear() must be implemented by cache "
+                "backends.")
+
+
+_CACHE_CONTROL_DIRECTIVE = re.compile(r'([\w-]+)\s*(?:=\s*"?(\d+)"?)?')
+
+
+def cache_control_ttl(cache_control, private=False):
+    """Return the number of seconds a response with the given Cache-Control
+    header can be reused for, or None if it can't be.
+
+    The TTL is the header's `s-maxage`, or its `max-age`.  Responses marked
+    `no-store` or `no-cache` aren't reused, and nor are `private` ones,
+    unless `private` is True (when the cache is per-user).
+    """
+    if not cache_control:
+        return None
+    directives = dict((name.lower(), value) for name, value in
+            _CACHE_CONTROL_DIRECTIVE.findall(cache_control))
+    if 'no-store' in directives or 'no-cache' in directives:
+        return None
+    if 'private' in directives and not private:
+        return None
+    max_age = directives.get('s-maxage') or directives.get('max-age')
+    if not max_age:
+        return None
+    return int(max_age)
+
+
+class LRUCache(BaseCache):
+    """A thread-safe least-recently-used cache.
+
+    The cache holds at most `max_entries` values, and, if `max_bytes` is
+    set, at most that many bytes of values, as measured by the `size` passed
+    to `set`.  The least recently used values are evicted to make room for
+    new ones.  Values expire `ttl` seconds after they're set, if a `ttl` is
+    given here or to `set`.
+
+    None can't be cached, since `get` returns None for missing values.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=None, ttl=None,
+            clock=time.time):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (value, size, expires_at)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, key):
+        """Return the value cached for `key`, or None."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at = entry[2]
+            if expires_at is not None and expires_at <= self._clock():
+                self._bytes -= entry[1]
+                self.misses += 1
+                return None
+            # re-insert it, to mark it as the most recently used
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+
+    def set(self, key, value, size=0, ttl=None):
+        """Cache `value` for `key`.
+
+        `size` is the value's size in bytes, for `max_bytes`; values that
+        are bigger than `max_bytes` on their own aren't cached.  `ttl`
+        overrides the cache's default time to live for this value.
+        """
+        if value is None:
+            return
+        max_bytes = self.max_bytes
+        if max_bytes is not None and size > max_bytes:
+            return
+        if ttl is None:
+            ttl = self.ttl
+        expires_at = self._clock() + ttl if ttl is not None else None
+
+        with self._lock:
+            entries = self._entries
+            old = entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(entries) > self.max_entries or \
+                    (max_bytes is not None and self._bytes > max_bytes):
+                _, evicted = entries.popitem(last=False)
+                self._bytes -= evicted[1]
+
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+    @property
+    def size_in_bytes(self):
+        return self._bytes
+
+
+    def __len__(self):
+        return len(self._entries)
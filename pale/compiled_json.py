@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""Direct-to-JSON encoding for Resources.
+
+Normally an endpoint renders its payload into a tree of dicts and lists with
+`Resource._render_serializable`, and then the JSON serializer walks that tree
+again to produce the response body.  The encoders in this module skip the
+intermediate tree: each Resource instance (and so each set of
+`_fields_to_render`) is compiled once into a `ResourceJSONEncoder`, with its
+field names pre-escaped into constant key prefixes, which writes JSON
+fragments for an object straight into a buffer.
+
+Resources that override `_render_serializable` can't be compiled, since
+their output is only known once they've run, so their rendered output is
+handed to the endpoint's JSON serializer as a single value.  The result is
+still spliced into the surrounding buffer.
+
+The output uses the same separators and escaping as Pale's default JSON
+encoder, but the keys of a compiled resource come out in `_fields_to_render`
+order.
+
+`RawJSON` values, wherever they appear, are written out as they are.
+
+Enable this per endpoint with `_direct_json = True`.  Endpoints that return
+a ResourceList can also stream their response with `_stream_response = True`,
+which uses `ResourceListJSONEncoder.iter_chunks`.
+"""
+from json.encoder import encode_basestring_ascii, FLOAT_REPR, INFINITY
+
+from pale.fields import ResourceField, ResourceListField
+from pale.resource import Resource, ResourceList
+from pale.serializers import RawJSON
+
+
+def _encode_float(value):
+    # this matches the stdlib encoder's handling of special floats
+    if value != value:
+        return 'NaN'
+    if value == INFINITY:
+        return 'Infinity'
+    if value == -INFINITY:
+        return '-Infinity'
+    return FLOAT_REPR(value)
+
+
+_SIMPLE_ENCODERS = {
+    str: encode_basestring_ascii,
+    unicode: encode_basestring_ascii,
+    int: str,
+    long: str,
+    float: _encode_float,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+    RawJSON: lambda value: value.json,
+}
+
+# subclasses of these (int codes, Markup strings, ...) aren't matched by
+# `_SIMPLE_ENCODERS`, and are encoded by the serializer, as they would be
+# without direct JSON
+_SCALAR_TYPES = (basestring, int, long, float)
+
+_CONTAINER_TYPES = (dict, list, tuple)
+
+
+def encode_value(value, serializer):
+    """Encode a single rendered value.
+
+    Scalars are encoded directly, and instances of their subclasses by the
+    serializer.  Other values that the serializer's `default` hook knows how
+    to convert (datetimes, objects with `to_dict`, ...) are converted and
+    then encoded, and containers are handed to `serializer.encode`.
+    """
+    encoder = _SIMPLE_ENCODERS.get(value.__class__)
+    if encoder is not None:
+        return encoder(value)
+    if isinstance(value, _SCALAR_TYPES):
+        return serializer.encode(value)
+    if not isinstance(value, _CONTAINER_TYPES) and \
+            hasattr(serializer, 'default'):
+        converted = serializer.default(value)
+        encoder = _SIMPLE_ENCODERS.get(converted.__class__)
+        if encoder is not None:
+            return encoder(converted)
+        value = converted
+    return serializer.encode(value)
+
+
+def _overrides(obj, method_name, base_class):
+    """Whether `obj`'s class overrides `base_class`'s implementation of the
+    named method."""
+    method = getattr(obj.__class__, method_name).__func__
+    return method is not getattr(base_class, method_name).__func__
+
+
+class ResourceJSONEncoder(object):
+    """Writes the JSON for objects rendered by a single Resource instance.
+
+    Don't create these directly; use `resource_encoder` to get the cached
+    encoder for a resource.
+    """
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.compiled = not _overrides(resource, '_render_serializable',
+                Resource)
+        self.memoize = resource._memoize_renders
+        self._steps = []
+        if not self.compiled or resource._fields_to_render is None:
+            return
+        separator = '{'
+        for name in resource._fields_to_render:
+            field = resource._fields[name]
+            # the separator from the previous field is folded into the key
+            # prefix, so each field costs one constant write
+            key_prefix = separator + encode_basestring_ascii(name) + ': '
+            separator = ', '
+            if isinstance(field, ResourceField) and field.expanded and \
+                    not field._overrides_render(ResourceField):
+                nested, is_list = field.resource_instance, False
+            elif isinstance(field, ResourceListField) and field.expanded and \
+                    not field._overrides_render(ResourceListField):
+                nested, is_list = field.resource_instance, True
+            else:
+                nested, is_list = None, False
+            if nested is None:
+                # a field's renderers are indexed by whether they're for
+                # dicts, see `write`
+                accessors = (field._compile_render(name, False),
+                             field._compile_render(name, True))
+            else:
+                # nested objects are fetched with the field's getter (or
+                # batch loader), and written by their resource's encoder
+                accessors = (field._compile_nested_getter(name, False),
+                             field._compile_nested_getter(name, True))
+                nested = resource_encoder(nested)
+            self._steps.append((key_prefix, accessors, nested, is_list))
+
+
+    def write(self, obj, context, write, serializer):
+        """Write the JSON for `obj` by calling `write` with each fragment."""
+        if obj.__class__ is RawJSON:
+            write(obj.json)
+            return
+        cache = self.resource._fragment_cache
+        if cache is not None and obj is not None:
+            # the JSON is cached separately from rendered dicts, and per
+            # serializer, since they don't all format things the same way
+            key = self.resource._fragment_key(obj, context,
+                    ('json', serializer.__class__.__name__))
+            if key is not None:
+                fragment = cache.get(key)
+                if fragment is None:
+                    chunks = []
+                    self._write_memoized(obj, context, chunks.append,
+                            serializer)
+                    fragment = ''.join(chunks)
+                    cache.set(key, fragment, size=len(fragment))
+                write(fragment)
+                return
+        self._write_memoized(obj, context, write, serializer)
+
+
+    def _write_memoized(self, obj, context, write, serializer):
+        if self.memoize and obj is not None and context is not None:
+            # like `Resource._render_memoized`, but for the JSON
+            memo = Resource._render_memo(context)
+            key = self.resource._memo_key(obj, self)
+            entry = memo.get(key)
+            if entry is None:
+                chunks = []
+                self._write(obj, context, chunks.append, serializer)
+                memo[key] = entry = (obj, self, ''.join(chunks))
+            write(entry[2])
+            return
+        self._write(obj, context, write, serializer)
+
+
+    def _write(self, obj, context, write, serializer):
+        if not self.compiled:
+            rendered = self.resource._render_serializable(obj, context)
+            write(encode_value(rendered, serializer))
+            return
+        if obj is None:
+            write('null')
+            return
+        if not self._steps:
+            write('{}')
+            return
+
+        simple_encoders = _SIMPLE_ENCODERS
+        is_dict = isinstance(obj, dict)
+        for key_prefix, accessors, nested, is_list in self._steps:
+            write(key_prefix)
+            value = accessors[is_dict](obj, context)
+            if nested is None:
+                encoder = simple_encoders.get(value.__class__)
+                if encoder is not None:
+                    write(encoder(value))
+                else:
+                    write(encode_value(value, serializer))
+            elif value.__class__ is RawJSON:
+                write(value.json)
+            elif is_list:
+                value = nested.resource._prefetch(value, context)
+                write('[')
+                item_separator = ''
+                for item in value:
+                    write(item_separator)
+                    nested.write(item, context, write, serializer)
+                    item_separator = ', '
+                write(']')
+            else:
+                nested.write(value, context, write, serializer)
+        write('}')
+
+
+class ResourceListJSONEncoder(object):
+    """Writes the JSON array for a list of objects rendered by a
+    ResourceList's item resource."""
+
+    def __init__(self, resource_list):
+        self.resource = resource_list
+        self.compiled = not _overrides(resource_list, '_render_serializable',
+                ResourceList)
+        if self.compiled:
+            self.item_encoder = resource_encoder(
+                    resource_list._item_resource)
+
+
+    def write(self, list_of_objs, context, write, serializer):
+        if list_of_objs.__class__ is RawJSON:
+            write(list_of_objs.json)
+            return
+        if not self.compiled:
+            rendered = self.resource._render_serializable(list_of_objs,
+                                                          context)
+            write(encode_value(rendered, serializer))
+            return
+
+        item_encoder = self.item_encoder
+        list_of_objs = item_encoder.resource._prefetch(list_of_objs, context)
+        write('[')
+        separator = ''
+        for obj in list_of_objs:
+            if obj is not None:
+                write(separator)
+                item_encoder.write(obj, context, write, serializer)
+                separator = ', '
+        write(']')
+
+
+    def iter_chunks(self, list_of_objs, context, serializer,
+            items_per_chunk=100):
+        """Generate the JSON array for `list_of_objs` in chunks.
+
+        `list_of_objs` is consumed lazily, so it can be a generator or a
+        datastore cursor, and only `items_per_chunk` rendered items are held
+        in memory at once.
+        """
+        if not self.compiled or list_of_objs.__class__ is RawJSON:
+            chunks = []
+            self.write(list_of_objs, context, chunks.append, serializer)
+            yield ''.join(chunks)
+            return
+
+        item_encoder = self.item_encoder
+        prefetch = item_encoder.resource._prefetch
+        chunks = ['[']
+        separator = ''
+        batch = []
+        for obj in list_of_objs:
+            if obj is None:
+                continue
+            batch.append(obj)
+            if len(batch) == items_per_chunk:
+                # nested objects are batch loaded a chunk at a time
+                separator = self._write_batch(prefetch(batch, context),
+                        context, chunks.append, serializer, separator)
+                yield ''.join(chunks)
+                chunks = []
+                batch = []
+        self._write_batch(prefetch(batch, context), context, chunks.append,
+                serializer, separator)
+        chunks.append(']')
+        yield ''.join(chunks)
+
+
+    def _write_batch(self, objs, context, write, serializer, separator):
+        item_encoder = self.item_encoder
+        for obj in objs:
+            write(separator)
+            item_encoder.write(obj, context, write, serializer)
+            separator = ', '
+        return separator
+
+
+def resource_encoder(resource):
+    """Return the compiled JSON encoder for a Resource instance.
+
+    Encoders are built the first time they're needed, and cached on the
+    resource instance.
+    """
+    encoder = resource.__dict__.get('_compiled_json_encoder')
+    if encoder is None:
+        if isinstance(resource, ResourceList):
+            encoder = ResourceListJSONEncoder(resource)
+        else:
+            encoder = ResourceJSONEncoder(resource)
+        resource._compiled_json_encoder = encoder
+    return encoder
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Compression of response bodies, negotiated with `Accept-Encoding`.
+
+Endpoints compress their responses with gzip or deflate (and brotli, when
+the `brotli` package is installed) if the client accepts it and the body is
+at least `_compress_min_size` bytes.  Streamed responses are compressed as
+they're generated.  See `Endpoint._compress_response`.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def supported_encodings():
+    """Return the content codings Pale can compress with, most preferred
+    first."""
+    if brotli is not None:
+        return ('br', 'gzip', 'deflate')
+    return ('gzip', 'deflate')
+
+
+def _parse_accept_encoding(accept_encoding):
+    """Return a dict mapping each coding in an Accept-Encoding header to its
+    quality value."""
+    qualities = {}
+    for item in accept_encoding.split(','):
+        parts = item.split(';')
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def choose_encoding(accept_encoding):
+    """Pick the content coding to compress a response with, given the
+    request's Accept-Encoding header, or None to send it uncompressed.
+
+    The coding with the highest quality value wins, with ties going to the
+    better compression.  `*` stands for any coding that isn't listed, and
+    codings with a quality of 0 are never used.
+    """
+    if not accept_encoding:
+        return None
+    qualities = _parse_accept_encoding(accept_encoding)
+    wildcard = qualities.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in supported_encodings():
+        quality = qualities.get(coding, wildcard)
+        if coding == 'gzip' and 'gzip' not in qualities:
+            # the old name for gzip
+            quality = qualities.get('x-gzip', quality)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def _zlib_compressor(encoding, level):
+    if encoding == 'gzip':
+        # a window size of 16 + MAX_WBITS writes a gzip header and trailer
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    # HTTP's deflate coding is the zlib format, not a raw deflate stream
+    return zlib.compressobj(level)
+
+
+def _to_bytes(data):
+    if isinstance(data, unicode):
+        return data.encode('utf-8')
+    return data
+
+
+def compress(body, encoding, level=6):
+    """Compress a response body with a coding from
+    `supported_encodings`."""
+    body = _to_bytes(body)
+    if encoding == 'br':
+        # brotli's quality goes to 11, rather than 9
+        return brotli.compress(body, quality=min(level, 11))
+    compressor = _zlib_compressor(encoding, level)
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_chunks(chunks, encoding, level=6):
+    """Compress a streamed response body, chunk by chunk.
+
+    Each chunk is flushed as it's compressed, so the client can decompress
+    everything it has received so far, rather than waiting for the
+    compressor to fill a block.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=min(level, 11))
+        for chunk in chunks:
+            data = compressor.process(_to_bytes(chunk)) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+
+    compressor = _zlib_compressor(encoding, level)
+    for chunk in chunks:
+        data = compressor.compress(_to_bytes(chunk)) + \
+                compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
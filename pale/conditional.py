@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Conditional GET support: ETags, Last-Modified, and 304 responses.
+
+Endpoints with `_etag = True` send an ETag computed from their encoded
+response body.  Any endpoint's handler (or before handler) can instead set
+`context.etag` to a version token, and/or `context.last_modified` to a
+datetime, and if the request's `If-None-Match` or `If-Modified-Since`
+header shows that the client already has that version, the endpoint
+responds with 304 Not Modified without rendering anything.
+"""
+import calendar
+import hashlib
+from email.utils import formatdate, mktime_tz, parsedate_tz
+
+
+def quote_etag(token):
+    """Turn a version token into an entity tag, by quoting it if it isn't
+    already quoted."""
+    if token.startswith('"') or token.startswith('W/"'):
+        return token
+    return '"%s"' % token
+
+
+def body_etag(body):
+    """Return a strong entity tag for a response body."""
+    if isinstance(body, unicode):
+        body = body.encode('utf-8')
+    return '"%s"' % hashlib.md5(body).hexdigest()
+
+
+def _opaque_tag(etag):
+    # If-None-Match uses the weak comparison, which ignores the W/ prefix
+    etag = etag.strip()
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    return etag
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches `etag`."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    etag = _opaque_tag(etag)
+    return any(_opaque_tag(candidate) == etag
+               for candidate in if_none_match.split(','))
+
+
+def _timestamp(value):
+    if value.tzinfo is not None:
+        return calendar.timegm(value.utctimetuple())
+    # naive datetimes are assumed to be in UTC, like everywhere else in Pale
+    return calendar.timegm(value.timetuple())
+
+
+def http_date(value):
+    """Format a datetime as an HTTP date, for a Last-Modified header."""
+    return formatdate(_timestamp(value), usegmt=True)
+
+
+def not_modified_since(if_modified_since, last_modified):
+    """Whether something last modified at `last_modified` (a datetime) is
+    unchanged since the date in an If-Modified-Since header."""
+    if not if_modified_since or last_modified is None:
+        return False
+    parsed = parsedate_tz(if_modified_since)
+    if parsed is None:
+        return False
+    # HTTP dates only have whole seconds
+    return _timestamp(last_modified) <= mktime_tz(parsed)
+
+
+def is_not_modified(headers, etag, last_modified):
+    """Whether a request with `headers` can be answered with 304 Not
+    Modified, for a response with the given ETag and last modified time.
+
+    If the request has an If-None-Match header, If-Modified-Since is
+    ignored, as RFC 7232 says it should be.
+    """
+    if not headers:
+        return False
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    return not_modified_since(headers.get('If-Modified-Since'),
+                              last_modified)
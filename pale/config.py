@@ -20,3 +20,37 @@ def authenticator(f):
     global authenticate_context
     authenticate_context = f
     return f
+
+
+def set_json_backend(backend):
+    """Select the JSON backend that endpoints encode their responses with.
+
+    `backend` is the name of one of the backends in `pale.serializers`
+    ('stdlib', 'simplejson', 'ujson' or 'orjson'), or 'fastest' to pick the
+    quickest one that's installed.  Backends that aren't installed fall back
+    to the standard library encoder.
+
+    This replaces the serializer on `pale.Endpoint`, so it applies to every
+    endpoint that hasn't set its own with `_set_json_serializer`.  It's the
+    only way to select the backend for all endpoints; the default is
+    'stdlib'.
+    """
+    from pale.endpoint import Endpoint
+    from pale.serializers import get_serializer
+    Endpoint._set_json_serializer(get_serializer(backend))
+
+
+def set_context_storage(storage):
+    """Select where endpoints keep the context of the current request.
+
+    `storage` is the name of one of the storages in `pale.context_storage`:
+    'thread' (the default), 'greenlet' for gevent or eventlet servers, or
+    'contextvars'.  Storages that aren't available fall back to 'thread'.
+
+    Call this before the app starts handling requests, since the contexts
+    of requests in progress stay in the old storage.  It's the only way to
+    select the storage.
+    """
+    from pale import endpoint
+    from pale.context_storage import get_context_storage
+    endpoint._context_storage = get_context_storage(storage)
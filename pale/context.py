@@ -1,19 +1,201 @@
 # -*- coding: utf-8 -*-
+import json
+import weakref
+from collections import Mapping
+
+
+# the value of a lazy attribute's slot until it's loaded
+_UNLOADED = object()
+
+
+class _LazyAttribute(object):
+    """A context attribute that's loaded by calling the context's `loader`
+    method the first time it's read, unless it was set first."""
+
+    def __init__(self, slot, loader, doc=None):
+        self.slot = slot
+        self.loader = loader
+        self.__doc__ = doc
+
+    def __get__(self, context, owner):
+        if context is None:
+            return self
+        value = getattr(context, self.slot)
+        if value is _UNLOADED:
+            value = getattr(context, self.loader)()
+            setattr(context, self.slot, value)
+        return value
+
+    def __set__(self, context, value):
+        setattr(context, self.slot, value)
+
+
+def _defining_class(cls, name):
+    for klass in cls.__mro__:
+        if name in klass.__dict__:
+            return klass
+    return None
+
+
+# whether each context class's `_lookup_arg` agrees with its
+# `build_args_from_request`, see `RequestArgs`
+_lookup_classes = {}
+
+
+def _looks_up_args(cls):
+    looks_up = _lookup_classes.get(cls)
+    if looks_up is None:
+        lookup_class = _defining_class(cls, '_lookup_arg')
+        looks_up = _lookup_classes[cls] = lookup_class is not None and \
+                lookup_class is _defining_class(cls, 'build_args_from_request')
+    return looks_up
+
+
+class RequestArgs(Mapping):
+    """The raw arguments of a context's request, looked up as they're asked
+    for.
+
+    `get` only looks up the argument it's asked for, with the context's
+    `_lookup_arg(name)`, which returns the argument's raw value or None, so
+    parsing a request's arguments only touches the ones its endpoint
+    declares.  Anything that needs all of them (iterating over them, say)
+    builds the whole dict with the context's `build_args_from_request`
+    first.
+
+    A context class that overrides `build_args_from_request` without also
+    overriding `_lookup_arg` always gets the whole dict, so the arguments
+    it adds aren't missed.
+    """
+    __slots__ = ('_context', '_args', '_looks_up')
+
+    def __init__(self, context):
+        # the context keeps this, and a reference cycle would keep the
+        # request (and its body) around until the garbage collector ran
+        self._context = weakref.ref(context)
+        self._args = None
+        self._looks_up = _looks_up_args(type(context))
+
+    def _all(self):
+        if self._args is None:
+            context = self._context()
+            self._args = context.build_args_from_request(context.request)
+        return self._args
+
+    def get(self, name, default=None):
+        if self._args is not None or not self._looks_up:
+            return self._all().get(name, default)
+        value = self._context()._lookup_arg(name)
+        return default if value is None else value
+
+    def __getitem__(self, name):
+        return self._all()[name]
+
+    def __iter__(self):
+        return iter(self._all())
+
+    def __len__(self):
+        return len(self._all())
+
+
+class RequestState(object):
+    """Data that a request's handlers share; see `DefaultContext.state`."""
+
 
 class DefaultContext(object):
-    """A default Context object for pale request data"""
+    """A default Context object for pale request data
+
+    A context is created for every request, so its attributes are slots,
+    and the ones that come from the request (its headers, cookies, body and
+    arguments) are loaded when they're first read, by the `_load_...`
+    methods that the adapters' contexts implement.  Contexts still have a
+    `__dict__`, so handlers can keep anything else they need on them.
+    """
+    __slots__ = ('__dict__', '__weakref__', 'request', '_headers',
+                 '_cookies', '_body', '_json_body', 'api_version',
+                 '_request_args', 'args',
+                 'route_args', 'patched_args', 'current_user', 'endpoint',
+                 'handler_result', 'response', 'head_request', 'etag',
+                 'last_modified', '_state', '_batch_loaded', '_render_memo',
+                 '_response_cache_key', '_response_body')
+
+    headers = _LazyAttribute('_headers', '_load_headers')
+    cookies = _LazyAttribute('_cookies', '_load_cookies')
+    body = _LazyAttribute('_body', '_load_body')
+    json_body = _LazyAttribute('_json_body', '_load_json_body',
+        """The request body, parsed as JSON.
+
+        The body is parsed the first time this is read, and the result is
+        shared by everything that reads it after that (the request's
+        arguments, PatchEndpoint, PutResourceEndpoint, and handlers), so
+        it shouldn't be modified.  Raises a ValueError if the body isn't
+        JSON.
+        """)
+    _raw_args = _LazyAttribute('_request_args', '_load_raw_args')
+    state = _LazyAttribute('_state', '_load_state',
+        """A `RequestState` object for the request's handlers to keep
+        things on.
+
+        Endpoints are shared by every request (and every thread, on a
+        threaded server), so anything that the before handlers, `_handle`,
+        the after handlers and the after response handlers work out for
+        each other belongs here, rather than on `self`.
+        """)
+
     def __init__(self):
         self.request = None
-        self.headers = None
-        self.cookies = None
+        self._headers = _UNLOADED
+        self._cookies = _UNLOADED
+        self._body = _UNLOADED
+        self._json_body = _UNLOADED
 
         self.api_version = None
 
-        self._raw_args = None
+        self._request_args = _UNLOADED
         self.args = None
         self.route_args = None
+        self.patched_args = None
 
         self.current_user = None
+        self.endpoint = None
 
         self.handler_result = None
         self.response = None
+
+        # whether this is a HEAD request, which is answered without a body
+        self.head_request = False
+
+        # the version of the response, for conditional requests; see
+        # `pale.conditional`
+        self.etag = None
+        self.last_modified = None
+
+        self._state = _UNLOADED
+
+        # objects loaded by Resource fields' `batch_load` functions, see
+        # `pale.batch`
+        self._batch_loaded = None
+        # objects rendered by resources with `_memoize_renders` set
+        self._render_memo = None
+        # the key of the response in the endpoint's `_response_cache`
+        self._response_cache_key = None
+        # the encoded body of the rendered response, if it wasn't streamed
+        self._response_body = None
+
+
+    def _load_headers(self):
+        return None
+
+    def _load_cookies(self):
+        return None
+
+    def _load_body(self):
+        return None
+
+    def _load_json_body(self):
+        return json.loads(self.body or '')
+
+    def _load_raw_args(self):
+        return None
+
+    def _load_state(self):
+        return RequestState()
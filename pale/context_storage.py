@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Storage for the context of the request that's being handled.
+
+`pale.endpoint.get_current_context` returns the context that the endpoint
+handling the current request set with `set_current_context`, and where it's
+kept depends on how the server runs requests concurrently:
+
+- 'thread' (the default) keeps it in a `threading.local`, for servers that
+  handle each request on its own thread.
+- 'greenlet' keeps it per greenlet, for gevent and eventlet servers, which
+  handle thousands of requests on one thread.  This works whether or not
+  the server monkey-patches `threading`, or when it did so.
+- 'contextvars' keeps it in a `contextvars.ContextVar`, which follows the
+  code of a request into the asyncio tasks it starts, on Pythons that have
+  `contextvars`.
+
+Select one for all endpoints with `pale.config.set_context_storage`, before
+the app starts handling requests.
+
+Whichever storage is used, asking for the context where none has been set
+raises an AttributeError, as `get_current_context` always has.
+"""
+import logging
+import threading
+import weakref
+
+
+class ThreadLocalStorage(object):
+    """Keeps a context per thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self):
+        return self._local.context
+
+    def set(self, context):
+        self._local.context = context
+
+
+class GreenletLocalStorage(object):
+    """Keeps a context per greenlet.
+
+    The contexts are weakly keyed by their greenlets, so a context goes
+    away with the greenlet that handled its request.
+    """
+
+    def __init__(self):
+        import greenlet
+        self._getcurrent = greenlet.getcurrent
+        self._contexts = weakref.WeakKeyDictionary()
+
+    def get(self):
+        try:
+            return self._contexts[self._getcurrent()]
+        except KeyError:
+            raise AttributeError("No context has been set in this greenlet.")
+
+    def set(self, context):
+        self._contexts[self._getcurrent()] = context
+
+
+class ContextVarStorage(object):
+    """Keeps the context in a `contextvars.ContextVar`."""
+
+    def __init__(self):
+        import contextvars
+        self._var = contextvars.ContextVar('pale_context')
+
+    def get(self):
+        try:
+            return self._var.get()
+        except LookupError:
+            raise AttributeError("No context has been set in this context.")
+
+    def set(self, context):
+        self._var.set(context)
+
+
+STORAGES = (
+    ('thread', ThreadLocalStorage),
+    ('greenlet', GreenletLocalStorage),
+    ('contextvars', ContextVarStorage),
+)
+"""The context storages Pale knows about, by name."""
+
+_STORAGE_FACTORIES = dict(STORAGES)
+
+
+def get_context_storage(storage='thread'):
+    """Create the named context storage.
+
+    `storage` is one of the names in `STORAGES`.  If the storage needs a
+    module that can't be imported, this logs a warning and falls back to
+    thread-local storage.
+    """
+    if storage not in _STORAGE_FACTORIES:
+        raise ValueError("Unknown context storage %r. Choose one of %s." % (
+            storage, ', '.join(name for name, _ in STORAGES)))
+    try:
+        return _STORAGE_FACTORIES[storage]()
+    except ImportError:
+        logging.warning("Context storage %r isn't available. Falling back "
+                "to thread-local storage.", storage)
+        return ThreadLocalStorage()
+
+
+def available_context_storages():
+    """Return the names of the context storages that can be used."""
+    available = []
+    for name, factory in STORAGES:
+        try:
+            factory()
+        except ImportError:
+            continue
+        available.append(name)
+    return available
@@ -605,6 +605,8 @@ def generate_raml_resources(module, api_root, user):
         "StringChoiceArgument": "string",
         "QueryKindsArgument": "string",
         "StringChoiceArgument": "string",
+        "FieldSelectionArgument": "string",
+        "ExpandArgument": "string",
         "ListArgument": "array"
     }
 
@@ -1,56 +1,87 @@
 # -*- coding: utf-8 -*-
 import datetime
+import hashlib
 import json
 import logging
+import mimetypes
 import sys
 import threading
+import time
 
-import arrow
+from pale import compiled_json
 from pale import config as pale_config
-from pale.arguments import BaseArgument
+from pale.cache import cache_control_ttl
+from pale.compression import choose_encoding, compress, compress_chunks
+from pale.conditional import (body_etag, http_date, is_not_modified,
+        quote_etag)
+from pale.files import FileBody, UNSATISFIABLE, file_etag, parse_range
+from pale.arguments import (BaseArgument, ExpandArgument,
+        FieldSelectionArgument)
+from pale.context import DefaultContext
+from pale.context_storage import ThreadLocalStorage
 from pale.fields import ResourceField, ListField, ResourceListField
 from pale.errors import APIError, ArgumentError, AuthenticationError
 from pale.meta import MetaHasFields
-from pale.resource import NoContentResource, Resource, DebugResource
+from pale.resource import (NoContentResource, Resource, ResourceList,
+        DebugResource, FileResource)
 from pale.response import PaleRaisedResponse
+from pale.serializers import PaleDefaultJSONEncoder, sorted_serializer
+
+# Outcomes for a missing argument value in a compiled argument parse plan;
+# anything else in that slot is a precomputed, immutable validated value.
+_VALIDATE_MISSING = object()
+_OMIT_MISSING = object()
+
+# Validated values that are safe to share between requests.
+_IMMUTABLE_ARGUMENT_TYPES = (basestring, bool, int, long, float, tuple)
+
+
+def _resolve_missing_argument(arg_obj, arg_name):
+    """Work out, ahead of time, what validating a missing value produces.
+
+    This only applies to arguments with a `pure_validator`, since any other
+    validator might depend on something besides its input.  Required
+    arguments (which raise), and arguments whose default validates to a
+    mutable value, are still validated on every request.
+    """
+    if not getattr(arg_obj.validate, '_pale_pure_validator', False):
+        return _VALIDATE_MISSING
+    try:
+        value = arg_obj.validate(None, arg_name)
+    except Exception:
+        return _VALIDATE_MISSING
+    if value is None:
+        return _OMIT_MISSING
+    if isinstance(value, _IMMUTABLE_ARGUMENT_TYPES):
+        return value
+    return _VALIDATE_MISSING
+
+
+# where the current context is kept; see `pale.context_storage`
+_context_storage = ThreadLocalStorage()
 
-_tls = threading.local()
 def get_current_context():
     """Return the context associated with the current request."""
-    return _tls.current_context
+    return _context_storage.get()
 
 def set_current_context(context):
     """Set the context associated with the current request."""
-    _tls.current_context = context
+    _context_storage.set(context)
 
 
-class PaleDefaultJSONEncoder(json.JSONEncoder):
-    """The default JSON Encoder for Pale.
+def _copy_rendered(value):
+    """Copy rendered content, with new dicts and lists all the way down.
 
-    The main difference between this and Python's default JSON encoder
-    is that this encoder attempts to serialize datetimes to ISO format,
-    and tries to call a `to_dict` method on the passed in object before
-    giving up.
+    Unlike `copy.deepcopy`, a dict that appears twice is copied twice, so
+    modifying one appearance doesn't modify the other.
     """
-
-    def default(self, obj):
-        """Default JSON encoding."""
-        try:
-            if isinstance(obj, datetime.datetime):
-                # do the datetime thing,  or
-                encoded = arrow.get(obj).isoformat()
-            else:
-                # try the normal encoder
-                encoded = json.JSONEncoder.default(self, obj)
-        except TypeError as e:
-            # if that fails, check for the to_dict method,
-            if hasattr(obj, 'to_dict') and callable(obj.to_dict):
-                # and use it!
-                encoded = obj.to_dict()
-            else:
-                raise e
-        return encoded
-
+    if isinstance(value, dict):
+        return dict((k, _copy_rendered(v)) for k, v in value.iteritems())
+    if isinstance(value, list):
+        return [_copy_rendered(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_copy_rendered(item) for item in value)
+    return value
 
 
 class Endpoint(object):
@@ -63,6 +94,28 @@ class Endpoint(object):
 
     _default_cache = 'no-cache'
 
+    _direct_json = False
+
+    _stream_response = False
+    _stream_items_per_chunk = 100
+    _response_streamer = None
+
+    _response_cache = None
+    _response_cache_headers = ()
+    _response_cache_per_user = False
+
+    _etag = False
+
+    _compress = True
+    _compress_min_size = 1024
+    _compress_level = 6
+
+    _static = False
+    _static_refresh = None
+    _static_response = None
+    # each static endpoint class gets its own, in `_fix_up_fields`
+    _static_refresh_lock = None
+
 
     @classmethod
     def _fix_up_fields(cls):
@@ -72,6 +125,9 @@ class Endpoint(object):
         Endpoint's metaclass.  The functionality is based on Google's NDB
         implementation."""
         cls._arguments = dict()
+        cls._argument_plan = ()
+        cls._field_selection_argument = None
+        cls._expand_argument = None
         if cls.__module__ == __name__: # skip the classes in this file
             return
         for name in set(dir(cls)):
@@ -85,6 +141,66 @@ class Endpoint(object):
                             % name)
                 attr._fix_up(cls, name)
                 cls._arguments[attr.name] = attr
+        if cls._static and cls._arguments:
+            raise TypeError("%s is a static endpoint, so its response can't "
+                    "depend on arguments, but it has %s." % (
+                        cls.__name__, ', '.join(sorted(cls._arguments))))
+        if cls._static:
+            # so refreshing one endpoint's response doesn't hold up another's
+            cls._static_refresh_lock = threading.Lock()
+        cls._compile_argument_plan()
+
+
+    @classmethod
+    def _compile_argument_plan(cls):
+        """Compile the endpoint's `_arguments` into an ordered parse plan.
+
+        Each step of the plan is a tuple of the argument name, its bound
+        `validate` method, whether a single-item list from the HTTP layer
+        should be unwrapped, and the outcome for a missing value.  Deciding
+        these once, when the endpoint is declared, leaves `_parse_args` with
+        nothing to do per request but look up and validate the values that
+        were actually passed in.
+
+        This is called by `_fix_up_fields`.  If you modify `_arguments` (or
+        an argument's `default` or `required`) after the class is created,
+        call it again to rebuild the plan.
+        """
+        if not isinstance(cls._arguments, dict):
+            raise ValueError("""Your API implementation is broken.  This
+            endpoint's `arguments` value is a `%s` when it should be a dict
+            instead.  Please see the Pale documentation for information on
+            how to fix the problem.""" % (type(cls._arguments), ))
+
+        plan = []
+        selection_args = []
+        expand_args = []
+        for arg_name in sorted(cls._arguments.keys()):
+            arg_obj = cls._arguments[arg_name]
+            if isinstance(arg_obj, FieldSelectionArgument):
+                selection_args.append(arg_name)
+            elif isinstance(arg_obj, ExpandArgument):
+                expand_args.append(arg_name)
+            # HTTP libraries are crap, so we expect values to come in as
+            # lists, which we strip out if the length is 1 and if the
+            # validator doesn't expect a list
+            unwrap = list not in arg_obj.allowed_types
+            plan.append((arg_name,
+                         arg_obj.validate,
+                         unwrap,
+                         _resolve_missing_argument(arg_obj, arg_name)))
+        cls._argument_plan = tuple(plan)
+
+        for arg_type, arg_names in ((FieldSelectionArgument, selection_args),
+                                    (ExpandArgument, expand_args)):
+            if len(arg_names) > 1:
+                raise ValueError("%s has more than one %s (%s), but only "
+                        "one of them can apply to the response." % (
+                            cls.__name__, arg_type.__name__,
+                            ', '.join(arg_names)))
+        cls._field_selection_argument = \
+                selection_args[0] if selection_args else None
+        cls._expand_argument = expand_args[0] if expand_args else None
 
 
     def _set_response_class(self, response_class):
@@ -97,6 +213,18 @@ class Endpoint(object):
         self._response_class = response_class
 
 
+    def _set_response_streamer(self, streamer):
+        """Set the function used to give a response a streamed body.
+
+        Like `_set_response_class`, this is called by the Pale adapter.  The
+        streamer is called with a response object, an iterator of body
+        chunks, and the length of the body if it's known (for files), and
+        should arrange for the HTTP layer to send the chunks as they're
+        generated.
+        """
+        self._response_streamer = streamer
+
+
     @classmethod
     def _set_json_serializer(cls, serializer):
         cls._json_serializer = serializer
@@ -192,8 +320,9 @@ class Endpoint(object):
             definition, and enable manipulation of the response object before it
             is returned to the client, but after the response is rendered.
 
-            Because these are instancemethods, they may share instance data
-            from `self` specified in the endpoint's `_handle` method.
+            Endpoints are shared by every request (and every thread, on a
+            threaded server), so data that these share with the endpoint's
+            `_handle` method belongs on `context.state`, not on `self`.
 
         ``_finalize_content``
             The `_finalize_content` method is overridden by the Endpoint and is called
@@ -203,7 +332,9 @@ class Endpoint(object):
             and expected to return updated rendered content.
 
             For in-place modification of dicts, this method will still be expected
-            to return the given argument.
+            to return the given argument.  The content it's given is a copy,
+            which doesn't share any dicts or lists with cached renderings or
+            with other parts of itself.
 
         ``_allow_cors``
             This value is set to enable CORs for a given endpoint.
@@ -214,7 +345,94 @@ class Endpoint(object):
             Set to True, this will allow access from *all* domains;
                 Access-Control-Allow-Origin = "*"
 
+        ``_direct_json``
+            Set to True to encode the response straight to JSON with an
+            encoder compiled from the `_returns` resource, instead of
+            rendering an intermediate dict and then encoding that.  See
+            `pale.compiled_json`.
+
+        ``_stream_response``
+            Set to True on an endpoint that `_returns` a ResourceList to
+            stream the response body in chunks of `_stream_items_per_chunk`
+            rendered items.  The handler can return a generator or a
+            datastore cursor, which is consumed lazily while the response is
+            sent.  Because the response has started by the time the items
+            are rendered, errors raised while rendering them can't become
+            Pale error responses; they're logged, and the connection is
+            dropped.
+
+        ``_response_cache``
+            Set to a cache backend from `pale.cache` (like an `LRUCache`) on
+            a GET endpoint to reuse its successful responses.  Responses are
+            cached for the `max-age` of their Cache-Control header (the
+            endpoint's `_default_cache`, unless the handler returned its
+            own), unless that's `no-store`, `no-cache` or (for a cache
+            that isn't per-user) `private`, or the response sets a cookie.
+            They're keyed on the endpoint, its route arguments, the
+            validated `context.args`, the request headers named in
+            `_response_cache_headers`, and, if `_response_cache_per_user` is
+            set, the current user (see `_response_cache_user`).  When a
+            response is cached, the before handlers, the handler, the after
+            handlers and the renderer are all skipped, so anything that
+            checks permissions needs to happen while authenticating, or the
+            cache needs to be per-user.  CORS headers and the
+            `_after_response_handlers` still apply to cached responses.
+
+        ``_etag``
+            Set to True to send an ETag with successful responses, computed
+            from the response body, and to respond to GET requests whose
+            `If-None-Match` header matches it with 304 Not Modified.  The
+            JSON for these endpoints is encoded with sorted keys, so the
+            same content always has the same ETag.
+
+            Handlers can also set `context.etag` to a version token for
+            their response, and/or `context.last_modified` to a datetime,
+            whether or not `_etag` is set.  If the request's `If-None-Match`
+            or `If-Modified-Since` header shows the client already has that
+            version, the 304 response is sent without rendering anything.
+            See `pale.conditional`.
+
+        ``_compress``
+            Responses of at least `_compress_min_size` bytes, and streamed
+            responses, are compressed with gzip, deflate or brotli (see
+            `pale.compression`) when the request's `Accept-Encoding` allows
+            it, at zlib level `_compress_level`, and their `Vary` header
+            includes `Accept-Encoding`, as do the 304 Not Modified responses
+            that validate them.  ETags of compressed responses are
+            made weak, since the bytes differ from the uncompressed
+            representation.  Set `_compress` to False on an endpoint to send
+            its responses uncompressed.  Compression happens before the
+            `_after_response_handlers` are called.
+
+        ``_handle_head``
+            GET endpoints also answer HEAD requests, with the headers of the
+            response they'd send for a GET, but no body.  If the endpoint
+            defines `_handle_head`, it's called instead of `_handle` for
+            HEAD requests, so it can skip loading what only the body needs;
+            it can return the same thing as `_handle`, or None.  Unless the
+            endpoint needs the body to compute its ETag (`_etag` is set, and
+            the handler didn't set `context.etag`), the response isn't
+            rendered at all, and is sent without a Content-Length; if it
+            does, `_handle` is called after `_handle_head` for the body.
+            Responses from the `_response_cache` keep theirs, but responses
+            to HEAD requests aren't cached.
+
+        ``_static``
+            Set to True on a GET endpoint whose response never depends on
+            the request, like a list of enum values or a capabilities
+            document.  Its response is rendered once, when the adapter binds
+            the endpoint, with a `DefaultContext` that has no request, and
+            every request is answered with the same bytes: the context
+            creator, the authenticator and the handlers aren't called.  The
+            response is rendered with the CORS headers and the
+            `_after_response_handlers` applied, and always has an ETag.  Set
+            `_static_refresh` to a number of seconds to render it again
+            when it's that old.  Static endpoints can't have arguments.
+
         """
+        if self._static:
+            return self._serve_static(request)
+
         try:
             self._create_context(request)
             self._authenticate()
@@ -223,20 +441,11 @@ class Endpoint(object):
 
             self._parse_args()
 
-            if hasattr(self, '_before_handlers') and \
-                    isinstance(self._before_handlers, (list, tuple)):
-                for handler in self._before_handlers:
-                    handler(context)
-
-            context.handler_result = self._handle(context)
-
-            if hasattr(self, '_after_handlers') and \
-                    isinstance(self._after_handlers, (list, tuple)):
-                for handler in self._after_handlers:
-                    handler(context)
-
-            self._render()
-            response = context.response
+            response = self._cached_response(context)
+            if response is None:
+                self._run_handlers(context)
+                self._render()
+                response = context.response
             # After calling ._render(), the response is ready to go, so we
             # shouldn't need to handle any other exceptions beyond this point.
         except AuthenticationError as e:
@@ -264,6 +473,35 @@ class Endpoint(object):
             response = self._response_class(*err.response)
             response.headers["Content-Type"] = 'application/json'
 
+        self._finish_response(context, response)
+        return response
+
+
+    def _run_handlers(self, context):
+        """Run the before handlers, the handler, and the after handlers."""
+        if hasattr(self, '_before_handlers') and \
+                isinstance(self._before_handlers, (list, tuple)):
+            for handler in self._before_handlers:
+                handler(context)
+
+        if context.head_request and hasattr(self, '_handle_head'):
+            context.handler_result = self._handle_head(context)
+            if self._head_needs_body(context):
+                # `_handle_head` might not have returned what `_handle`
+                # would, and the ETag is computed from the rendered body
+                context.handler_result = self._handle(context)
+        else:
+            context.handler_result = self._handle(context)
+
+        if hasattr(self, '_after_handlers') and \
+                isinstance(self._after_handlers, (list, tuple)):
+            for handler in self._after_handlers:
+                handler(context)
+
+
+    def _finish_response(self, context, response):
+        """Add the CORS headers to the response, and run the
+        `_after_response_handlers`."""
         allow_cors = getattr(self, "_allow_cors", None)
         if allow_cors is True:
             response.headers['Access-Control-Allow-Origin'] = '*'
@@ -283,7 +521,97 @@ class Endpoint(object):
                 self.__class__.__name__)
             raise
 
-        return response
+
+    def _prerender_static(self):
+        """Render the response of a `_static` endpoint, and keep it to
+        answer requests with.
+
+        The adapters call this when they bind the endpoint, so errors in
+        the handler surface then.
+        """
+        if self._renders_stream() or isinstance(self._returns, FileResource):
+            raise ValueError("%s can't be static, since it streams its "
+                    "response." % self.__class__.__name__)
+        context = DefaultContext()
+        context.args = {}
+        context.endpoint = self
+        set_current_context(context)
+
+        self._run_handlers(context)
+        self._render()
+        response = context.response
+        self._finish_response(context, response)
+
+        body = context._response_body
+        headers = [(name, value) for name, value in response.headers.items()
+                   if name.lower() != 'content-length']
+        if response.headers.get('ETag') is None and body:
+            headers.append(('ETag', body_etag(body)))
+        expires_at = None
+        if self._static_refresh:
+            expires_at = time.time() + self._static_refresh
+        # the compressed bodies are added to the dict as they're needed
+        static = (expires_at, response.status, headers, body, {})
+        self._static_response = static
+        return static
+
+
+    def _refreshed_static_response(self, static):
+        """Render the static response again, unless another thread already
+        is, in which case the old one is used for now."""
+        if static is None:
+            return self._prerender_static()
+        if not self._static_refresh_lock.acquire(False):
+            return static
+        try:
+            return self._prerender_static()
+        except Exception:
+            logging.exception("Failed to refresh the static response of %s",
+                    self.__class__.__name__)
+            # keep serving the old response, and try again later
+            static = (time.time() + self._static_refresh,) + static[1:]
+            self._static_response = static
+            return static
+        finally:
+            self._static_refresh_lock.release()
+
+
+    def _serve_static(self, request):
+        """Answer a request to a `_static` endpoint with its prerendered
+        response."""
+        static = self._static_response
+        if static is None or \
+                (static[0] is not None and static[0] <= time.time()):
+            static = self._refreshed_static_response(static)
+        _, status, headers, body, compressed_bodies = static
+
+        context = DefaultContext()
+        context.request = request
+        context.headers = getattr(request, 'headers', None)
+        context.head_request = getattr(request, 'method', None) == 'HEAD'
+        context.endpoint = self
+        set_current_context(context)
+        return self._respond_with(context, status, headers, body,
+                compressed_bodies)
+
+
+    def _respond_with(self, context, status, headers, body,
+            compressed_bodies=None):
+        """Build the response to this request from a stored response's
+        status, headers and encoded body, with the same conditional request,
+        compression and HEAD handling as a rendered response."""
+        if self._conditional_request(context) and \
+                is_not_modified(context.headers, dict(headers).get('ETag'),
+                                None):
+            # a stored response has an ETag if it was sent with one
+            context.response = self._not_modified_response(headers,
+                    self._compressible(dict(headers), body, None))
+            return context.response
+        context.response = self._build_response(status, headers, body)
+        self._compress_response(context, body, None, compressed_bodies)
+        if context.head_request:
+            context.response = self._headers_only_response(context.response)
+        return context.response
 
 
     def _create_context(self, request):
@@ -293,6 +621,7 @@ class Endpoint(object):
                     "context creator currently set!\n\n"))
 
         context = pale_config.create_context(self, request)
+        context.head_request = getattr(request, 'method', None) == 'HEAD'
         set_current_context(context)
 
 
@@ -320,33 +649,289 @@ class Endpoint(object):
         context = get_current_context()
         self._patch_args()
 
+        patched_args = context.patched_args
         parsed_args = dict()
-        if self._arguments is not None:
-            if not isinstance(self._arguments, dict):
-                raise ValueError("""Your API implementation is broken.  This
-                endpoint's `arguments` value is a `%s` when it should be a dict
-                instead.  Please see the Pale documentation for information on
-                how to fix the problem.""" % (type(self.arguments), ))
-
-            for arg_name, arg_obj in self._arguments.iteritems():
-                patched_value = context.patched_args.get(arg_name, None)
-
-                # HTTP libraries are crap, so we expect `patched_value` to
-                # be a list, which we strip out if the length is 1 and if the
-                # validator doesn't expect a list
-                if patched_value is not None and \
+        for arg_name, validate, unwrap, missing in self._argument_plan:
+            patched_value = patched_args.get(arg_name, None)
+
+            if patched_value is None:
+                if missing is _VALIDATE_MISSING:
+                    # required, or a validator we can't reason about ahead
+                    # of time; it will raise or hand us the default.
+                    validated_value = validate(None, arg_name)
+                elif missing is _OMIT_MISSING:
+                    continue
+                else:
+                    parsed_args[arg_name] = missing
+                    continue
+            else:
+                if unwrap and \
                         isinstance(patched_value, list) and \
-                        len(patched_value) == 1 and \
-                        list not in arg_obj.allowed_types:
+                        len(patched_value) == 1:
                     patched_value = patched_value[0]
 
-                # validate will return the validated (and thus valid) value on
-                # success, or raise an ArgumentError if the value is invalid
-                validated_value = arg_obj.validate(patched_value, arg_name)
-                if validated_value is not None:
-                    parsed_args[arg_name] = validated_value
+                # validate will return the validated (and thus valid) value
+                # on success, or raise an ArgumentError if the value is
+                # invalid
+                validated_value = validate(patched_value, arg_name)
+
+            if validated_value is not None:
+                parsed_args[arg_name] = validated_value
         context.args = parsed_args
 
+        if self._field_selection_argument is not None or \
+                self._expand_argument is not None:
+            # check the selection now, rather than after the handler has
+            # done its work
+            self._response_resource(context)
+
+
+    def _response_resource(self, context):
+        """Return the resource that renders the response for this request.
+
+        This is the endpoint's `_returns` resource, narrowed to the fields
+        selected with the endpoint's FieldSelectionArgument, and with the
+        fields named by its ExpandArgument expanded, if it has those
+        arguments and the caller used them.
+        """
+        resource = self._returns
+        for arg_name, modify in (
+                (self._field_selection_argument, Resource._select_fields),
+                (self._expand_argument, Resource._expand_fields)):
+            if arg_name is None:
+                continue
+            value = context.args.get(arg_name)
+            if value is None:
+                continue
+            try:
+                resource = modify(resource, value)
+            except ValueError as e:
+                raise ArgumentError(arg_name, str(e))
+        return resource
+
+
+    def _uses_response_cache(self):
+        return self._response_cache is not None and \
+                self._http_method == 'GET' and \
+                not self._renders_stream() and \
+                not isinstance(self._returns, FileResource)
+
+
+    def _response_cache_user(self, context):
+        """Return what identifies the current user in the response cache key
+        of a `_response_cache_per_user` endpoint.
+
+        This is the `id` of `context.current_user`, or the user itself if it
+        has no `id`.  Override it if that doesn't identify your users.
+        """
+        user = context.current_user
+        return getattr(user, 'id', user)
+
+
+    def _response_cache_key(self, context):
+        """Return the key of this request's response in the endpoint's
+        `_response_cache`."""
+        headers = context.headers or {}
+        parts = [
+            getattr(context, 'route_kwargs', None),
+            context.args,
+            [headers.get(name) for name in self._response_cache_headers],
+        ]
+        if self._response_cache_per_user:
+            parts.append(self._response_cache_user(context))
+        # validated arguments can be datetimes and the like, which are only
+        # used to tell requests apart, so their repr is good enough
+        digest = hashlib.md5(json.dumps(parts, sort_keys=True,
+                default=repr)).hexdigest()
+        return 'pale-response:%s:%s' % (self._route_name, digest)
+
+
+    def _cached_response(self, context):
+        """Return a response for this request from the endpoint's
+        `_response_cache`, or None if it isn't cached."""
+        if not self._uses_response_cache():
+            return None
+        key = context._response_cache_key = self._response_cache_key(context)
+        cached = self._response_cache.get(key)
+        if cached is None:
+            return None
+        status, headers, body = cached
+        return self._respond_with(context, status, headers, body)
+
+
+    def _cache_response(self, context, json_content):
+        """Store a freshly rendered response in the `_response_cache`."""
+        response = context.response
+        status_code = getattr(response, "status_int", None) or \
+                response.status_code
+        # a cookie is for the client that was sent it, not for everyone the
+        # cached response would be replayed to
+        if status_code != 200 or 'Set-Cookie' in response.headers:
+            return
+        ttl = cache_control_ttl(response.headers.get('Cache-Control'),
+                private=self._response_cache_per_user)
+        if not ttl:
+            return
+        headers = [(name, value) for name, value in response.headers.items()
+                   if name.lower() != 'content-length']
+        self._response_cache.set(context._response_cache_key,
+                (response.status, headers, json_content),
+                size=len(json_content), ttl=ttl)
+
+
+    def _conditional_request(self, context):
+        """Whether a 304 Not Modified response can be sent for this
+        request."""
+        return self._http_method in ('GET', 'HEAD') and \
+                context.headers is not None
+
+
+    def _validator_headers(self, context):
+        """The ETag and Last-Modified headers for this response."""
+        headers = []
+        if context.etag is not None:
+            headers.append(('ETag', quote_etag(context.etag)))
+        if context.last_modified is not None:
+            headers.append(('Last-Modified',
+                            http_date(context.last_modified)))
+        return headers
+
+
+    def _not_modified_response(self, headers, compressible=False):
+        """Build a 304 Not Modified response, with the headers from
+        `headers` that RFC 7232 says it should have.  If the full response
+        is `compressible`, its Vary header includes Accept-Encoding, like
+        the full response's."""
+        response = self._response_class('', '304 Not Modified')
+        for name, value in headers:
+            if name in ('Cache-Control', 'ETag', 'Expires', 'Last-Modified',
+                        'Vary'):
+                response.headers[name] = value
+        if compressible:
+            self._vary_on_encoding(response)
+        del response.content_type
+        del response.content_length
+        return response
+
+
+    def _copy_response(self, response, body):
+        """Return a new response with the status and headers of `response`,
+        but with `body`."""
+        return self._build_response(response.status,
+                response.headers.items(), body)
+
+
+    def _build_response(self, status, headers, body):
+        """Return a new response with `status`, exactly the headers in
+        `headers` (except Content-Length, which is `body`'s), and `body`."""
+        response = self._response_class(body)
+        response.status = status
+        copied = set()
+        for name, value in headers:
+            lower_name = name.lower()
+            if lower_name == 'content-length':
+                continue
+            if lower_name in copied:
+                response.headers.add(name, value)
+            else:
+                response.headers[name] = value
+                copied.add(lower_name)
+        if 'content-type' not in copied:
+            # rather than the response class's default
+            del response.content_type
+        return response
+
+
+    def _headers_only_response(self, response):
+        """Return a copy of `response` for a HEAD request: the same headers,
+        including its Content-Length, but no body."""
+        head = self._copy_response(response, '')
+        content_length = response.headers.get('Content-Length')
+        if content_length is not None:
+            head.headers['Content-Length'] = content_length
+        else:
+            del head.content_length
+        return head
+
+
+    def _compress_response(self, context, body, stream,
+            compressed_bodies=None):
+        """Replace `context.response` with a compressed copy, if the client
+        accepts an encoding we support and the response is big enough.
+
+        `body` is the encoded JSON of the response, and `stream` its chunk
+        generator, for streamed responses.  `compressed_bodies` is an
+        optional dict of `body` compressed with each encoding, which is
+        used and filled in instead of compressing it every time.
+        """
+        encoding = self._negotiate_encoding(context, body, stream)
+        if encoding is not None:
+            context.response = self._compressed_response(context.response,
+                    encoding, body, stream, compressed_bodies)
+
+
+    def _compressible(self, headers, body, stream):
+        """Whether a response with `headers` and `body` (or `stream`) is
+        compressed for clients that accept it."""
+        return self._compress and \
+                (stream is not None or
+                 len(body) >= self._compress_min_size) and \
+                not headers.get('Content-Encoding')
+
+
+    def _negotiate_encoding(self, context, body, stream):
+        """Return the encoding to compress `context.response` with, or None,
+        and add Accept-Encoding to its Vary header if it's compressible."""
+        if not self._compressible(context.response.headers, body, stream):
+            return None
+        # the response could have been compressed, so caches need to know
+        # that it depends on the request's Accept-Encoding
+        self._vary_on_encoding(context.response)
+        headers = context.headers
+        return choose_encoding(
+                headers.get('Accept-Encoding') if headers else None)
+
+
+    def _vary_on_encoding(self, response):
+        vary = response.headers.get('Vary')
+        if not vary:
+            response.headers['Vary'] = 'Accept-Encoding'
+        elif 'accept-encoding' not in vary.lower():
+            response.headers['Vary'] = vary + ', Accept-Encoding'
+
+
+    def _compressed_response(self, response, encoding, body, stream,
+            compressed_bodies):
+        """Return a copy of `response` with its body, or its stream,
+        compressed with `encoding`."""
+        level = self._compress_level
+        if stream is None:
+            compressed_body = None
+            if compressed_bodies is not None:
+                compressed_body = compressed_bodies.get(encoding)
+            if compressed_body is None:
+                compressed_body = compress(body, encoding, level)
+                if compressed_bodies is not None:
+                    compressed_bodies[encoding] = compressed_body
+            compressed = self._copy_response(response, compressed_body)
+        else:
+            compressed = self._copy_response(response, '')
+        etag = compressed.headers.get('ETag')
+        if etag is not None and not etag.startswith('W/'):
+            compressed.headers['ETag'] = 'W/' + etag
+        compressed.headers['Content-Encoding'] = encoding
+        if stream is not None:
+            self._response_streamer(compressed,
+                    compress_chunks(stream, encoding, level))
+        return compressed
+
+
+    def _response_serializer(self):
+        """The serializer that encodes this endpoint's responses."""
+        if self._etag:
+            return sorted_serializer(self._json_serializer)
+        return self._json_serializer
+
 
     def _parse_handler_result(self, result):
         """Parses the item(s) returned by your handler implementation.
@@ -367,18 +952,17 @@ class Endpoint(object):
         return payload, list_result
 
 
-    def _render(self):
+    def _encode_rendered_content(self, unrendered_content, context,
+            resource):
         # first, serialize the Python objects in the response_dict into a dict
-        context = get_current_context()
         rendered_content = dict()
 
-        unrendered_content, response_init_list = self._parse_handler_result(
-                context.handler_result)
+        render = resource._renderer()
 
         if hasattr(unrendered_content, 'iteritems'):
             for k, v in unrendered_content.iteritems():
                 # usually there should only be one key and value here
-                dict_val = self._returns._render_serializable(v, context)
+                dict_val = render(v, context)
 
                 # this is where object versioning should be implemented, but
                 # one outstanding question with it is, should this be the
@@ -390,12 +974,14 @@ class Endpoint(object):
                 rendered_content[k] = dict_val
         else:
             # maybe it's a nonetype or a simple string?
-            rendered_content = self._returns._render_serializable(
-                    unrendered_content, context)
+            rendered_content = render(unrendered_content, context)
 
         try:
             if hasattr(self, '_finalize_content'):
-                rendered_content = self._finalize_content(context, rendered_content)
+                # renderings can come from a fragment cache or the request's
+                # render memo, and be shared, so it gets a copy to modify
+                rendered_content = self._finalize_content(context,
+                        _copy_rendered(rendered_content))
         except:
             logging.exception("Failed to complete %s._finalize_content",
                 self.__class__.__name__)
@@ -406,39 +992,363 @@ class Endpoint(object):
                 isinstance(self._returns, NoContentResource):
             json_content = ''
         else:
-            json_content = self._json_serializer.encode(rendered_content)
+            json_content = self._response_serializer().encode(
+                    rendered_content)
+        return json_content
+
+
+    def _renders_direct_json(self):
+        """Whether this endpoint's response can skip the intermediate
+        rendered dict, and be encoded by `pale.compiled_json` instead.
+
+        This is opt-in with `_direct_json = True`, and isn't possible when
+        the endpoint needs the rendered dict for `_finalize_content`.
+        """
+        return self._direct_json and \
+                not hasattr(self, '_finalize_content') and \
+                not isinstance(self._returns, NoContentResource)
+
+
+    def _encode_direct_json(self, unrendered_content, context, resource):
+        """Encode the handler's payload straight to JSON, using the compiled
+        encoder for the response resource."""
+        encoder = compiled_json.resource_encoder(resource)
+        serializer = self._response_serializer()
+        chunks = []
+        write = chunks.append
+
+        if hasattr(unrendered_content, 'iteritems'):
+            write('{')
+            separator = ''
+            for k, v in unrendered_content.iteritems():
+                write(separator)
+                write(compiled_json.encode_value(k, serializer))
+                write(': ')
+                encoder.write(v, context, write, serializer)
+                separator = ', '
+            write('}')
+        else:
+            encoder.write(unrendered_content, context, write, serializer)
+        return ''.join(chunks)
+
+
+    def _renders_stream(self):
+        """Whether this endpoint streams its response body.
+
+        This is opt-in with `_stream_response = True`, and only applies to
+        endpoints that return a ResourceList and don't need the rendered
+        content for `_finalize_content`.
+        """
+        return self._stream_response and \
+                isinstance(self._returns, ResourceList) and \
+                not hasattr(self, '_finalize_content')
+
+
+    def _iter_stream_chunks(self, unrendered_content, context, resource):
+        """Generate the JSON response body for a streamed endpoint."""
+        # The body is generated after `_execute` has returned, so make sure
+        # anything that asks for the current context gets this request's.
+        set_current_context(context)
+        encoder = compiled_json.resource_encoder(resource)
+        serializer = self._response_serializer()
+        items_per_chunk = self._stream_items_per_chunk
+        try:
+            if hasattr(unrendered_content, 'iteritems'):
+                separator = '{'
+                for k, v in unrendered_content.iteritems():
+                    yield '%s%s: ' % (separator,
+                            compiled_json.encode_value(k, serializer))
+                    for chunk in encoder.iter_chunks(v, context, serializer,
+                                                     items_per_chunk):
+                        yield chunk
+                    separator = ', '
+                yield '{}' if separator == '{' else '}'
+            else:
+                for chunk in encoder.iter_chunks(unrendered_content, context,
+                                                 serializer, items_per_chunk):
+                    yield chunk
+        except Exception:
+            logging.exception("Failed to stream response for %s",
+                self.__class__.__name__)
+            raise
+
+
+    def _render(self):
+        context = get_current_context()
+
+        unrendered_content, response_init_list = self._parse_handler_result(
+                context.handler_result)
+
+        if self._render_not_modified(context, response_init_list):
+            return
+
+        if isinstance(self._returns, FileResource):
+            self._render_file(context, unrendered_content,
+                              response_init_list)
+            return
+
+        if context.head_request and not self._head_needs_body(context):
+            # nothing in the headers depends on the body, so skip it
+            self._render_head(context, response_init_list)
+            return
+
+        json_content, stream = self._encode_content(unrendered_content,
+                                                    context)
+        context._response_body = json_content
         response_init_list[0] = json_content
-        response_init_tuple = tuple(response_init_list)
+        context.response = self._new_response(response_init_list)
+        if stream is not None:
+            self._response_streamer(context.response, stream)
+        self._add_content_headers(context, json_content, stream)
+
+        if stream is None and not context.head_request and \
+                getattr(context, '_response_cache_key', None) is not None:
+            self._cache_response(context, json_content)
+
+        status_code = getattr(context.response, "status_int", None) or \
+                context.response.status_code
+        if status_code == 200 and self._conditional_request(context) and \
+                is_not_modified(context.headers,
+                                context.response.headers.get('ETag'),
+                                context.last_modified):
+            context.response = self._not_modified_response(
+                    context.response.headers.items(),
+                    self._compressible(context.response.headers,
+                                       json_content, stream))
+        elif stream is not None or json_content:
+            self._compress_response(context, json_content, stream)
+
+        if context.head_request:
+            context.response = self._headers_only_response(context.response)
+
+
+    def _render_not_modified(self, context, response_init_list):
+        """Respond with a 304 Not Modified, without rendering anything, if
+        the handler told us what version it would return and the client
+        already has it.  Returns whether it did."""
+        if context.etag is None and context.last_modified is None:
+            return False
+        if not self._conditional_request(context) or \
+                not is_not_modified(context.headers,
+                        context.etag and quote_etag(context.etag),
+                        context.last_modified):
+            return False
+        self._check_response_class()
+        cache_ctrl = self._response_headers(response_init_list)[
+                'Cache-Control']
+        # the body's size isn't known, so it might have been compressed
+        context.response = self._not_modified_response(
+                [('Cache-Control', cache_ctrl)] +
+                self._validator_headers(context), self._compress)
+        return True
+
+
+    def _check_response_class(self):
         if self._response_class is None:
             raise ValueError("""Error with Pale configuration.  Attempted to
-            parse a handler result without a response class set on the endpoint.
-            This is probably an issue with the pale HTTP adapter you're using,
-            since that is where the response class is usually set.""")
-        context.response = self._response_class(*response_init_tuple)
-
-        # patch up cache-control
-        updated_cache_ctrl_from_endpoint = False
-        if len(response_init_tuple) > 2:
-            # headers is the 3rd arg for both flask and webapp2
-            headers = response_init_tuple[2]
-            cache_ctrl = headers.get('Cache-Control')
-            if cache_ctrl is not None:
-                context.response.headers['Cache-Control'] = cache_ctrl
-                updated_cache_ctrl_from_endpoint = True
-
-        if not updated_cache_ctrl_from_endpoint:
-            context.response.headers['Cache-Control'] = \
-                    self._default_cache
+            respond without a response class set on the endpoint.  This is
+            probably an issue with the pale HTTP adapter you're using, since
+            that is where the response class is usually set.""")
+
+
+    def _response_headers(self, response_init_list):
+        """Return the headers the handler returned with its payload, with
+        Cache-Control defaulting to the endpoint's `_default_cache`."""
+        headers = {}
+        # headers is the 3rd arg for both flask and webapp2
+        if len(response_init_list) > 2 and response_init_list[2]:
+            headers.update(response_init_list[2])
+        if headers.get('Cache-Control') is None:
+            headers['Cache-Control'] = self._default_cache
+        return headers
+
+
+    def _new_response(self, response_init_list):
+        """Create a response from the handler's result, with the endpoint's
+        Cache-Control header."""
+        self._check_response_class()
+        response = self._response_class(*tuple(response_init_list))
+        response.headers['Cache-Control'] = self._response_headers(
+                response_init_list)['Cache-Control']
+        return response
 
+
+    def _encode_content(self, unrendered_content, context):
+        """Encode the handler's payload.  Returns the encoded JSON and, for a
+        streamed response, the generator of its chunks (or None)."""
+        resource = self._response_resource(context)
+        if self._renders_stream():
+            if self._response_streamer is None:
+                raise ValueError("""Error with Pale configuration.  %s
+                wants to stream its response, but the Pale HTTP adapter
+                you're using didn't set a response streamer."""
+                % self.__class__.__name__)
+            return '', self._iter_stream_chunks(unrendered_content, context,
+                                                resource)
+        if self._renders_direct_json():
+            return self._encode_direct_json(unrendered_content, context,
+                                            resource), None
+        return self._encode_rendered_content(unrendered_content, context,
+                                             resource), None
+
+
+    def _add_content_headers(self, context, json_content, stream):
+        """Set the Content-Type and validator headers of a rendered
+        response, and make an empty 200 a 204 No Content."""
+        response = context.response
         # Add default json response type.
-        if len(json_content):
-            context.response.headers["Content-Type"] = 'application/json'
+        if stream is not None or len(json_content):
+            response.headers["Content-Type"] = 'application/json'
         else:
-            del context.response.content_type
-            del context.response.content_length
-            status_code = getattr(context.response, "status_int", None) or context.response.status_code
+            del response.content_type
+            del response.content_length
+            status_code = getattr(response, "status_int", None) or \
+                    response.status_code
             if status_code == 200: # 200 OK
-                context.response.status = '204 No Content'
+                response.status = '204 No Content'
+
+        status_code = getattr(response, "status_int", None) or \
+                response.status_code
+        if status_code == 200:
+            if self._etag and context.etag is None and stream is None:
+                context.etag = body_etag(json_content)
+            for name, value in self._validator_headers(context):
+                response.headers[name] = value
+
+
+    def _head_needs_body(self, context):
+        """Whether the response to a HEAD request has to be rendered, because
+        its ETag is computed from the body."""
+        return self._etag and context.etag is None and \
+                not self._renders_stream() and \
+                not isinstance(self._returns, FileResource)
+
+
+    def _render_file(self, context, source, response_init_list):
+        """Respond with the file the handler returned, for an endpoint that
+        returns a FileResource.
+
+        The file isn't read here; it's handed to the adapter's response
+        streamer, with its length.  Files with a known size support single
+        byte range requests, and real files get a Last-Modified header (and
+        an ETag, if the endpoint sets `_etag`) from their metadata.
+        """
+        self._check_response_class()
+        if self._response_streamer is None:
+            raise ValueError("""Error with Pale configuration.  %s
+            responds with files, but the Pale HTTP adapter you're using
+            didn't set a response streamer.""" % self.__class__.__name__)
+        body = FileBody(source)
+        self._set_file_version(context, body)
+
+        headers = self._response_headers(response_init_list)
+        validator_headers = self._validator_headers(context)
+
+        if self._conditional_request(context) and \
+                is_not_modified(context.headers,
+                        context.etag and quote_etag(context.etag),
+                        context.last_modified):
+            body.close()
+            context.response = self._not_modified_response(
+                    [('Cache-Control', headers['Cache-Control'])] +
+                    validator_headers)
+            return
+
+        status = response_init_list[1] if len(response_init_list) > 1 \
+                else None
+        first, length = 0, body.size
+        byte_range = None
+        if body.size is not None and status is None:
+            byte_range = self._file_range(context, body.size,
+                                          validator_headers)
+        if byte_range is UNSATISFIABLE:
+            body.close()
+            context.response = self._response_class('',
+                    '416 Requested Range Not Satisfiable')
+            context.response.headers['Content-Range'] = \
+                    'bytes */%d' % body.size
+            return
+        if byte_range is not None:
+            first, last = byte_range
+            length = last - first + 1
+            status = '206 Partial Content'
+            headers['Content-Range'] = 'bytes %d-%d/%d' % (first, last,
+                                                           body.size)
+        if body.size is not None:
+            headers['Accept-Ranges'] = 'bytes'
+
+        content_type = self._returns._content_type
+        if content_type is None and body.name is not None:
+            content_type = mimetypes.guess_type(body.name)[0]
+        headers['Content-Type'] = content_type or 'application/octet-stream'
+        headers.update(validator_headers)
+        response = self._response_class('', status or '200 OK')
+        for name, value in headers.iteritems():
+            response.headers[name] = value
+        self._send_file(context, response, body, first, length)
+
+
+    def _set_file_version(self, context, body):
+        """Set the context's Last-Modified (and ETag, if the endpoint sets
+        `_etag`) from the metadata of a real file, unless the handler set
+        them."""
+        if body.mtime is None:
+            return
+        if context.last_modified is None:
+            context.last_modified = datetime.datetime.utcfromtimestamp(
+                    int(body.mtime))
+        if self._etag and context.etag is None:
+            context.etag = file_etag(body.size, body.mtime)
+
+
+    def _send_file(self, context, response, body, first, length):
+        """Hand `length` bytes of the file from `first` to the response
+        streamer, or only their length for a HEAD request."""
+        if context.head_request:
+            body.close()
+            if length is not None:
+                response.headers['Content-Length'] = str(length)
+            else:
+                del response.content_length
+        else:
+            environ = getattr(context.request, 'environ', None)
+            self._response_streamer(response,
+                    body.wsgi_body(environ, first, length), length)
+        context.response = response
+
+
+    def _file_range(self, context, size, validator_headers):
+        """Return the byte range of a file of `size` bytes that the request
+        asks for, as `pale.files.parse_range` does, or None for all of
+        it."""
+        if not context.headers:
+            return None
+        if_range = context.headers.get('If-Range')
+        # a range only applies if the client still has the version it was
+        # taken from
+        if if_range and if_range not in dict(validator_headers).values():
+            return None
+        return parse_range(context.headers.get('Range'), size)
+
+
+    def _render_head(self, context, response_init_list):
+        """Build the response to a HEAD request without rendering the
+        handler's result."""
+        response_init_list[0] = ''
+        response = self._new_response(response_init_list)
+        status_code = getattr(response, "status_int", None) or \
+                response.status_code
+        if not isinstance(self._returns, NoContentResource):
+            response.headers['Content-Type'] = 'application/json'
+        elif status_code == 200:
+            del response.content_type
+            response.status = '204 No Content'
+        if status_code == 200:
+            for name, value in self._validator_headers(context):
+                response.headers[name] = value
+        # the length of the body we didn't render isn't known
+        del response.content_length
+        context.response = response
 
 class ResourcePatch(object):
     """Represents a resource patch which is to be applied
@@ -576,7 +1486,7 @@ class PatchEndpoint(Endpoint):
                 self.MERGE_CONTENT_TYPE)
 
         try:
-            patch = ResourcePatch(patch=json.loads(context.body),
+            patch = ResourcePatch(patch=context.json_body,
                                   resource=resource)
         except Exception, exc:
             raise APIError.UnprocessableEntity(
@@ -611,7 +1521,7 @@ class PutResourceEndpoint(Endpoint):
                 self.MERGE_CONTENT_TYPE)
 
         try:
-            patch = ResourcePatch(patch=json.loads(context.body),
+            patch = ResourcePatch(patch=context.json_body,
                                   resource=resource)
         except Exception, exc:
             raise APIError.UnprocessableEntity(
@@ -3,6 +3,16 @@ import logging
 import types
 from collections import Iterable
 
+
+def _call_value(val, attr_name, obj):
+    try:
+        return val()
+    except:
+        logging.exception("Attempted to call `%s` on obj of type %s.",
+            attr_name, type(obj))
+        raise
+
+
 class BaseField(object):
     """The base class for all Fields and Arguments.
 
@@ -93,6 +103,75 @@ class BaseField(object):
         return val
 
 
+    def _compile_getter(self, name, for_dict):
+        """Build a function that fetches this field's raw value.
+
+        The returned function takes `(obj, context)` and does what
+        `BaseField.render` does, but the choice between `value_lambda`,
+        `property_name`, and item or attribute access is made once, here,
+        instead of for every object.  `for_dict` says whether the function
+        will be passed dicts or other objects.
+
+        Callable values are still called through, since that can only be
+        known once the value has been fetched.
+        """
+        value_lambda = self.value_lambda
+        if value_lambda is not None:
+            attr_name = name
+            def get_value(obj, context):
+                val = value_lambda(obj)
+                if callable(val):
+                    val = _call_value(val, attr_name, obj)
+                return val
+            return get_value
+
+        attr_name = name
+        if self.property_name is not None:
+            attr_name = self.property_name
+
+        if for_dict:
+            def get_item(obj, context):
+                val = obj.get(attr_name, None)
+                if callable(val):
+                    val = _call_value(val, attr_name, obj)
+                return val
+            return get_item
+
+        def get_attribute(obj, context):
+            val = getattr(obj, attr_name, None)
+            if callable(val):
+                val = _call_value(val, attr_name, obj)
+            return val
+        return get_attribute
+
+
+    def _compile_render(self, name, for_dict):
+        """Build a function that renders this field for a resource.
+
+        The returned function takes `(obj, context)`, where `obj` is never
+        None, and returns the same value as `self.render(obj, name,
+        context)`.  Resources compile one of these per field, and call them
+        in a tight loop instead of `render`.
+
+        Fields that don't override `render` use the accessor from
+        `_compile_getter`.  Fields with a custom `render` that don't provide
+        their own `_compile_render` have their `render` method called.
+        """
+        if not self._overrides_render(BaseField):
+            return self._compile_getter(name, for_dict)
+        render = self.render
+        def call_render(obj, context):
+            return render(obj, name, context)
+        return call_render
+
+
+    def _overrides_render(self, field_class):
+        """Whether this field's class has its own `render`, rather than the
+        one from `field_class`."""
+        return self.__class__.render.__func__ is not \
+                field_class.render.__func__
+
+
     def doc_dict(self):
         """Generate the documentation for this field."""
         doc = {
@@ -43,3 +43,26 @@ class DecimalField(BaseField):
 
         return self.prefix+str(value)
 
+    def _compile_render(self, name, for_dict):
+        if self._overrides_render(DecimalField):
+            return super(DecimalField, self)._compile_render(name, for_dict)
+        get_value = self._compile_getter(name, for_dict)
+        quantize = self.quantize
+        prefix = self.prefix
+        if quantize:
+            def render_decimal(obj, context):
+                value = get_value(obj, context)
+                if value is None:
+                    return None
+                if value.__class__ is not Decimal:
+                    value = Decimal(value)
+                return prefix + str(value.quantize(quantize))
+        else:
+            def render_decimal(obj, context):
+                value = get_value(obj, context)
+                if value is None:
+                    return None
+                if value.__class__ is not Decimal:
+                    value = Decimal(value)
+                return prefix + str(value)
+        return render_decimal
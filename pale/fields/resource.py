@@ -1,10 +1,58 @@
+from pale.batch import load_batch
 from pale.fields.base import BaseField, ListField
-from pale.resource import Resource
+from pale.resource import Resource, UNCACHEABLE
+from pale.serializers import RawJSON
 
 import logging
 
+
+def _compile_stub(field):
+    """Build the renderer for an expandable field that wasn't expanded."""
+    stub = field.stub
+    if stub is None:
+        return lambda obj, context: None
+    return lambda obj, context: stub(obj)
+
+
+def _check_batch_functions(field):
+    assert (field.batch_key is None) == (field.batch_load is None), \
+            ("A Field's `batch_key` and `batch_load` must be set together.")
+    assert field.batch_key is None or field.value_lambda is None, \
+            ("Field does not support setting both `value` *AND* batch "
+             "loading.  Please pick one or the other")
+
+
 class ResourceField(BaseField):
-    """A field that contains a nested resource"""
+    """A field that contains a nested resource
+
+    kwargs:
+        expandable:
+            `bool`.  If True, the nested resource is only fetched and
+            rendered when the request expands this field with the endpoint's
+            ExpandArgument.  Otherwise, the field renders its `stub`.
+
+        stub:
+            A function that's passed the object being rendered (not the
+            nested object), and returns the value to render for an
+            unexpanded field, like the nested object's key or URL.  It
+            shouldn't fetch the nested object.  Unexpanded fields without a
+            stub render as null.
+
+        batch_key, batch_load:
+            Functions for loading the nested objects of a list of objects in
+            one round trip, instead of one at a time.  `batch_key(obj)`
+            returns the key of `obj`'s nested object (or None if it has
+            none), and `batch_load(keys, context)` returns a dict mapping
+            keys to the objects they identify.  See `pale.batch`.
+
+    Usage:
+        author = ResourceField("The post's author",
+            resource_type=UserResource,
+            expandable=True,
+            stub=lambda post: post.author_id,
+            batch_key=lambda post: post.author_id,
+            batch_load=load_users)
+    """
 
     value_type = 'resource'
 
@@ -13,12 +61,23 @@ class ResourceField(BaseField):
             description,
             resource_type=Resource,
             subfields=None,
+            expandable=False,
+            stub=None,
+            batch_key=None,
+            batch_load=None,
             **kwargs):
         super(ResourceField, self).__init__(
                 self.value_type,
                 description,
                 **kwargs)
         self.resource_type = resource_type
+        self.expandable = expandable
+        self.stub = stub
+        # expanded copies of the field are made by `Resource._expand_fields`
+        self.expanded = not expandable
+        self.batch_key = batch_key
+        self.batch_load = batch_load
+        _check_batch_functions(self)
 
         if subfields is None:
             subfields = resource_type._default_fields
@@ -36,22 +95,96 @@ class ResourceField(BaseField):
             logging.warn("paledoc: `subfields` on ResourceField %s is None",
                 self.__class__.__name__)
         doc['default_fields'] = list(self.subfields or [])
+        doc['expandable'] = self.expandable
         return doc
 
 
     def render(self, obj, name, context):
         if obj is None:
             return None
-        # the base renderer basically just calls getattr, so it will
-        # return the resource here
-        resource = super(ResourceField, self).render(obj, name, context)
-        renderer = self.resource_instance._render_serializable
+        if not self.expanded:
+            return self.stub(obj) if self.stub is not None else None
+        if self.batch_load is not None:
+            resource = self._load_nested(obj, context)
+        else:
+            # the base renderer basically just calls getattr, so it will
+            # return the resource here
+            resource = super(ResourceField, self).render(obj, name, context)
+        renderer = self.resource_instance._renderer()
         output = renderer(resource, context)
         return output
 
 
+    def _compile_render(self, name, for_dict):
+        if self._overrides_render(ResourceField):
+            return super(ResourceField, self)._compile_render(name, for_dict)
+        if not self.expanded:
+            return _compile_stub(self)
+        get_value = self._compile_nested_getter(name, for_dict)
+        renderer = self.resource_instance._renderer()
+        def render_resource(obj, context):
+            return renderer(get_value(obj, context), context)
+        return render_resource
+
+
+    def _compile_nested_getter(self, name, for_dict):
+        """Build a function that fetches the nested object for an object,
+        with its batch loader if the field has one."""
+        if self.batch_load is None:
+            return self._compile_getter(name, for_dict)
+        return self._load_nested
+
+
+    def _load_nested(self, obj, context):
+        key = self.batch_key(obj)
+        if key is None:
+            return None
+        return load_batch(self.batch_load, [key], context)[0]
+
+
+    def _compile_nested_version_key(self, name, for_dict):
+        """Build a function that returns the version key of an object's
+        nested object, for `Resource._version_key`."""
+        get_value = self._compile_nested_getter(name, for_dict)
+        version_key = self.resource_instance._version_key
+        def nested_version_key(obj, context):
+            nested = get_value(obj, context)
+            if nested is None:
+                return None
+            key = version_key(nested, context)
+            # without a key, a change to the nested object couldn't be told
+            # apart from its cached rendering
+            return UNCACHEABLE if key is None else key
+        return nested_version_key
+
+
+    def _batch_keys(self, objs):
+        """The keys of the nested objects of `objs`, for prefetching."""
+        batch_key = self.batch_key
+        keys = []
+        for obj in objs:
+            key = batch_key(obj)
+            if key is not None:
+                keys.append(key)
+        return keys
+
+
+    def _prefetch_nested(self, objs, context):
+        """Prefetch for the nested objects of `objs`, once they're loaded."""
+        if not self.resource_instance._batched_fields():
+            return
+        nested = [self._load_nested(obj, context) for obj in objs]
+        self.resource_instance._prefetch(nested, context)
+
+
 class ResourceListField(BaseField):
-    """A Field that contains a list of Fields."""
+    """A Field that contains a list of Fields.
+
+    Like ResourceField, this can be declared `expandable`, with a `stub`
+    function that returns the value to render when it isn't expanded (like
+    a list of keys), and can batch load its nested objects, in which case
+    `batch_key(obj)` returns the list of keys of `obj`'s nested objects.
+    """
     item_type = ResourceField
     value_type = 'resource_list'
 
@@ -59,6 +192,10 @@ class ResourceListField(BaseField):
             description,
             resource_type=Resource,
             subfields=None,
+            expandable=False,
+            stub=None,
+            batch_key=None,
+            batch_load=None,
             **kwargs):
         super(ResourceListField, self).__init__(
                 self.value_type,
@@ -66,6 +203,12 @@ class ResourceListField(BaseField):
                 **kwargs)
 
         self.resource_type = resource_type
+        self.expandable = expandable
+        self.stub = stub
+        self.expanded = not expandable
+        self.batch_key = batch_key
+        self.batch_load = batch_load
+        _check_batch_functions(self)
 
         if subfields is None:
             subfields = resource_type._default_fields
@@ -79,20 +222,106 @@ class ResourceListField(BaseField):
     def doc_dict(self):
         doc = super(ResourceListField, self).doc_dict()
         doc['resource_type'] = self.resource_type._value_type
+        doc['expandable'] = self.expandable
         return doc
 
 
     def render(self, obj, name, context):
         if obj is None:
             return None
+        if not self.expanded:
+            return self.stub(obj) if self.stub is not None else None
 
         output = []
-        # again, the base renderer basically just calls getattr.
-        # We're expecting the attr to be a list, though.
-        resources = super(ResourceListField, self).render(obj, name, context)
-        renderer = self.resource_instance._render_serializable
+        if self.batch_load is not None:
+            resources = self._load_nested(obj, context)
+        else:
+            # again, the base renderer basically just calls getattr.
+            # We're expecting the attr to be a list, though.
+            resources = super(ResourceListField, self).render(
+                    obj, name, context)
+        if resources.__class__ is RawJSON:
+            return resources
+        resources = self.resource_instance._prefetch(resources, context)
+        renderer = self.resource_instance._renderer()
         for res in resources:
             item = renderer(res, context)
             output.append(item)
         return output
 
+
+    def _compile_render(self, name, for_dict):
+        if self._overrides_render(ResourceListField):
+            return super(ResourceListField, self)._compile_render(
+                    name, for_dict)
+        if not self.expanded:
+            return _compile_stub(self)
+        get_value = self._compile_nested_getter(name, for_dict)
+        prefetch = self.resource_instance._prefetch
+        renderer = self.resource_instance._renderer()
+        def render_resources(obj, context):
+            resources = get_value(obj, context)
+            if resources.__class__ is RawJSON:
+                return resources
+            resources = prefetch(resources, context)
+            return [renderer(res, context) for res in resources]
+        return render_resources
+
+
+    def _compile_nested_getter(self, name, for_dict):
+        """Build a function that fetches the list of nested objects for an
+        object, with its batch loader if the field has one."""
+        if self.batch_load is None:
+            return self._compile_getter(name, for_dict)
+        return self._load_nested
+
+
+    def _load_nested(self, obj, context):
+        keys = self.batch_key(obj)
+        if not keys:
+            return []
+        return load_batch(self.batch_load, keys, context)
+
+
+    def _compile_nested_version_key(self, name, for_dict):
+        """Build a function that returns the version keys of an object's
+        nested objects, for `Resource._version_key`."""
+        get_value = self._compile_nested_getter(name, for_dict)
+        version_key = self.resource_instance._version_key
+        def nested_version_keys(obj, context):
+            nested = get_value(obj, context)
+            if nested is None:
+                return None
+            if not isinstance(nested, (list, tuple)):
+                # it might be a generator that rendering needs to consume
+                return UNCACHEABLE
+            keys = []
+            for item in nested:
+                if item is None:
+                    keys.append(None)
+                    continue
+                key = version_key(item, context)
+                if key is None:
+                    return UNCACHEABLE
+                keys.append(key)
+            return tuple(keys)
+        return nested_version_keys
+
+
+    def _batch_keys(self, objs):
+        """The keys of the nested objects of `objs`, for prefetching."""
+        batch_key = self.batch_key
+        keys = []
+        for obj in objs:
+            keys.extend(batch_key(obj) or ())
+        return keys
+
+
+    def _prefetch_nested(self, objs, context):
+        """Prefetch for the nested objects of `objs`, once they're loaded."""
+        if not self.resource_instance._batched_fields():
+            return
+        nested = []
+        for obj in objs:
+            nested.extend(self._load_nested(obj, context))
+        self.resource_instance._prefetch(nested, context)
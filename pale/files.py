@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""File bodies for endpoints that return a `FileResource`.
+
+The handler of such an endpoint returns a file path or a file object, and
+instead of being encoded, the file is handed to the HTTP layer as an
+iterable body that's read a block at a time (or to the server's
+`wsgi.file_wrapper`, which can use `sendfile`), so it never has to fit in
+memory.  Single byte ranges are supported, with `parse_range`.
+"""
+import os
+
+
+UNSATISFIABLE = object()
+"""Returned by `parse_range` for a range that doesn't overlap the file."""
+
+
+def parse_range(range_header, size):
+    """Parse a Range header for a file of `size` bytes.
+
+    Returns the `(first, last)` byte positions (inclusive) of the requested
+    range, `UNSATISFIABLE` if the range starts past the end of the file (as
+    every range of an empty file does), or None if the whole file should be
+    sent instead: when there's no header, when it's malformed, or when it
+    asks for more than one range, which isn't supported.
+    """
+    if not range_header:
+        return None
+    unit, _, ranges = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in ranges:
+        return None
+    first, sep, last = ranges.strip().partition('-')
+    if not sep:
+        return None
+    if not first:
+        return _parse_suffix_range(last, size)
+    try:
+        first = int(first)
+        last = int(last) if last else None
+    except ValueError:
+        return None
+    if last is not None and first > last:
+        return None
+    if first >= size:
+        return UNSATISFIABLE
+    if last is None:
+        return first, size - 1
+    return first, min(last, size - 1)
+
+
+def _parse_suffix_range(suffix, size):
+    """Parse the end of a suffix range (`bytes=-N`), for the last `N` bytes
+    of a file of `size` bytes, like `parse_range`."""
+    try:
+        suffix = int(suffix)
+    except ValueError:
+        return None
+    if suffix <= 0 or size == 0:
+        # an empty file has no last bytes
+        return UNSATISFIABLE
+    return max(size - suffix, 0), size - 1
+
+
+def file_etag(size, mtime):
+    """Return an entity tag for a file, from its size and modification
+    time, so it doesn't need to be read."""
+    return '"%x-%x"' % (size, int(mtime * 1000))
+
+
+class FileBody(object):
+    """A file to send as a response body.
+
+    `source` is the path of a file, or a file object, which is sent from its
+    beginning and closed once it's sent.  The file's `size` and `mtime` are
+    None if they can't be found out without reading it (for a pipe, say).
+    """
+
+    def __init__(self, source, block_size=64 * 1024):
+        self.block_size = block_size
+        self.size = None
+        self.mtime = None
+        if isinstance(source, basestring):
+            self.name = source
+            self.file = None
+            stat = os.stat(source)
+            self.size, self.mtime = stat.st_size, stat.st_mtime
+            return
+
+        self.file = source
+        name = getattr(source, 'name', None)
+        self.name = name if isinstance(name, basestring) else None
+        try:
+            stat = os.fstat(source.fileno())
+        except (AttributeError, EnvironmentError, ValueError):
+            # a file-like object, like a StringIO
+            stat = None
+        try:
+            if stat is None:
+                source.seek(0, os.SEEK_END)
+                self.size = source.tell()
+            source.seek(0)
+        except (AttributeError, EnvironmentError, ValueError):
+            # it can't seek, so it can only be sent as it is
+            return
+        if stat is not None:
+            self.size, self.mtime = stat.st_size, stat.st_mtime
+
+
+    def open(self):
+        if self.file is None:
+            self.file = open(self.name, 'rb')
+        return self.file
+
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+    def iter_range(self, first, length):
+        """Generate the `length` bytes of the file starting at `first`, a
+        block at a time, and close it when they've been sent (or the server
+        gives up on sending them).  A `length` of None reads to the end."""
+        try:
+            f = self.open()
+            if first:
+                f.seek(first)
+            remaining = length
+            block_size = self.block_size
+            while remaining is None or remaining > 0:
+                if remaining is not None:
+                    block_size = min(block_size, remaining)
+                block = f.read(block_size)
+                if not block:
+                    break
+                if remaining is not None:
+                    remaining -= len(block)
+                yield block
+        finally:
+            self.close()
+
+
+    def wsgi_body(self, environ, first=0, length=None):
+        """Return an iterable for the requested bytes of the file.
+
+        The whole of a real file is given to the server's
+        `wsgi.file_wrapper`, if it has one, so it can be sent without being
+        copied through Python.  Everything else is read a block at a time.
+        """
+        file_wrapper = environ.get('wsgi.file_wrapper') if environ else None
+        whole_file = not first and (length is None or length == self.size)
+        if file_wrapper is not None and whole_file:
+            f = self.open()
+            if hasattr(f, 'fileno'):
+                return file_wrapper(f, self.block_size)
+        return self.iter_range(first, length)
@@ -1,8 +1,26 @@
+import copy
+import hashlib
 import logging
-import types
 
+from pale.batch import load_batch
 from pale.fields import BaseField
 from pale.meta import MetaHasFields
+from pale.serializers import PaleDefaultJSONEncoder, RawJSON
+
+
+# Per-instance caches of things compiled from a resource's fields, which
+# copies of the resource must not share.
+_COMPILED_ATTRIBUTES = ('_compiled_render_plan', '_compiled_batch_fields',
+                        '_compiled_json_encoder', '_compiled_key_plan',
+                        '_compiled_signature', '_selection_cache')
+
+# for measuring rendered values stored in a fragment cache
+_size_encoder = PaleDefaultJSONEncoder()
+
+# returned by a field's nested version key function when the version of its
+# nested objects can't be determined, because they have no key or can't be
+# looked at without consuming them
+UNCACHEABLE = object()
 
 class Resource(object):
     __metaclass__ = MetaHasFields
@@ -11,6 +29,12 @@ class Resource(object):
 
     _default_fields = None
 
+    _max_cached_selections = 64
+
+    _memoize_renders = False
+
+    _fragment_cache = None
+
     @classmethod
     def _all_fields(cls):
         return tuple(cls._fields.keys())
@@ -56,6 +80,196 @@ class Resource(object):
             self._fields_to_render = self._default_fields
 
 
+    def _cache_key(self, obj):
+        """Return a hashable key that identifies `obj`, or None.
+
+        Override this to identify objects by something other than their
+        identity, like a datastore key, so that separately loaded copies of
+        the same object are recognized as the same object.
+
+        Resources with a `_fragment_cache` need a key that also identifies
+        the object's version, like its id and `updated_at` time, since the
+        cached rendering is reused for as long as the key stays the same.
+        """
+        return None
+
+
+    def _renderer(self):
+        """Return the function that nested fields and lists should call to
+        render an object with this resource.
+
+        This is `_render_serializable`, unless the resource sets
+        `_memoize_renders = True`.  Then, each object is rendered at most
+        once per request, and later appearances of it in the same response
+        reuse the first rendering.  The objects are identified by
+        `_cache_key`, or by their identity, and the same object rendered by
+        different resources (or different field selections of a resource)
+        is rendered for each of them.  Since the rendered value is shared,
+        it shouldn't be modified (endpoints give `_finalize_content` a
+        copy).
+        """
+        if self._fragment_cache is not None:
+            return self._render_cached
+        if self._memoize_renders:
+            return self._render_memoized
+        return self._render_serializable
+
+
+    def _render_cached(self, obj, context):
+        """Render `obj` through the resource's `_fragment_cache`.
+
+        Set `_fragment_cache` to a `pale.cache.LRUCache` (or anything with
+        the same `get` and `set` methods) to reuse renderings across
+        requests.  Objects are cached by their `_cache_key`, combined with
+        the keys of the objects nested in them (see `_version_key`), and
+        with the fields the resource renders.  Objects without a key, or
+        with expanded nested objects without keys, aren't cached.
+
+        Cached renderings are shared between requests, so they must not be
+        modified, and resources whose output depends on the context (on the
+        current user, say) shouldn't be cached.
+        """
+        if obj is None or obj.__class__ is RawJSON:
+            return self._render_serializable(obj, context)
+        key = self._fragment_key(obj, context, 'dict')
+        if key is None:
+            return self._render_uncached(obj, context)
+        cache = self._fragment_cache
+        rendered = cache.get(key)
+        if rendered is None:
+            rendered = self._render_uncached(obj, context)
+            try:
+                size = len(_size_encoder.encode(rendered))
+            except (TypeError, ValueError):
+                # it won't be serializable by the endpoint either, so don't
+                # keep it around
+                return rendered
+            cache.set(key, rendered, size=size)
+        return rendered
+
+
+    def _render_uncached(self, obj, context):
+        if self._memoize_renders:
+            return self._render_memoized(obj, context)
+        return self._render_serializable(obj, context)
+
+
+    def _fragment_key(self, obj, context, kind):
+        """The key for `obj`'s rendering in the fragment cache, or None if
+        it can't be cached.  `kind` distinguishes the kinds of rendering
+        (dicts, or encoded JSON) that are cached for the same object."""
+        version = self._version_key(obj, context)
+        if version is None:
+            return None
+        return (kind, self._render_signature()) + version
+
+
+    def _version_key(self, obj, context):
+        """Return a key for the version of `obj` and everything nested in
+        it that this resource renders, or None if `obj` has no key.
+
+        This is the object's `_cache_key`, plus the version keys of the
+        objects in its rendered, expanded ResourceFields and
+        ResourceListFields, so a cached rendering of a parent is replaced
+        when one of its children changes, even if the parent's own key
+        didn't.  If a nested object has no key, neither does `obj`.
+        """
+        if obj.__class__ is RawJSON:
+            return None
+        own_key = self._cache_key(obj)
+        if own_key is None:
+            return None
+        key_plan = self._key_plan()
+        if not key_plan:
+            return (own_key, ())
+        index = 1 if isinstance(obj, dict) else 0
+        nested_keys = tuple(nested_key[index](obj, context)
+                            for nested_key in key_plan)
+        if UNCACHEABLE in nested_keys:
+            return None
+        return (own_key, nested_keys)
+
+
+    def _key_plan(self):
+        """Compile the functions that compute the version keys of the
+        objects nested in an object, for `_version_key`."""
+        fields = self._fields_to_render
+        cached = self.__dict__.get('_compiled_key_plan')
+        if cached is not None and cached[0] is fields:
+            return cached[1]
+        plan = []
+        for name in fields or ():
+            field = self._fields[name]
+            if hasattr(field, '_compile_nested_version_key') and \
+                    field.expanded:
+                plan.append((field._compile_nested_version_key(name, False),
+                             field._compile_nested_version_key(name, True)))
+        plan = tuple(plan)
+        self._compiled_key_plan = (fields, plan)
+        return plan
+
+
+    def _render_signature(self):
+        """Return a string that identifies what this resource renders: its
+        class, its fields, and the same for its nested resources.
+
+        Copies of a resource with different field selections or expansions
+        have different signatures, so they don't share fragment cache
+        entries.
+        """
+        fields = self._fields_to_render
+        cached = self.__dict__.get('_compiled_signature')
+        if cached is not None and cached[0] is fields:
+            return cached[1]
+        signature = hashlib.md5(repr(self._signature_parts())).hexdigest()
+        self._compiled_signature = (fields, signature)
+        return signature
+
+
+    def _signature_parts(self):
+        nested = []
+        for name in self._fields_to_render or ():
+            field = self._fields[name]
+            nested_resource = getattr(field, 'resource_instance', None)
+            if isinstance(nested_resource, Resource):
+                nested.append((name, getattr(field, 'expanded', True),
+                               nested_resource._signature_parts()))
+        return (self.__class__.__module__, self.__class__.__name__,
+                tuple(self._fields_to_render or ()), tuple(nested))
+
+
+    def _render_memoized(self, obj, context):
+        if obj is None or context is None or obj.__class__ is RawJSON:
+            return self._render_serializable(obj, context)
+        memo = self._render_memo(context)
+        key = self._memo_key(obj)
+        entry = memo.get(key)
+        if entry is None:
+            rendered = self._render_serializable(obj, context)
+            # keep a reference to the object (and the resource) so that
+            # their ids can't be reused for something else in this request
+            memo[key] = entry = (obj, self, rendered)
+        return entry[2]
+
+
+    def _memo_key(self, obj, owner=None):
+        """The key for `obj` in the request's render memo.  The `owner` is
+        the resource, or the thing rendering for it, that's memoizing."""
+        key = self._cache_key(obj)
+        if key is None:
+            key = id(obj)
+        return (key, id(owner if owner is not None else self))
+
+
+    @staticmethod
+    def _render_memo(context):
+        """Return the request's memo of rendered objects."""
+        memo = getattr(context, '_render_memo', None)
+        if memo is None:
+            memo = context._render_memo = {}
+        return memo
+
+
     def _render_serializable(self, obj, context):
         """Renders a JSON-serializable version of the object passed in.
         Usually this means turning a Python object into a dict, but sometimes
@@ -80,14 +294,200 @@ class Resource(object):
             logging.debug(
                     "_render_serializable passed a None obj, returning None")
             return None
-        output = {}
+        if obj.__class__ is RawJSON:
+            # it's already rendered
+            return obj
         if self._fields_to_render is None:
-            return output
-        for field in self._fields_to_render:
-            renderer = self._fields[field].render
-            output[field] = renderer(obj, field, context)
-        return output
+            return {}
+        object_plan, dict_plan = self._render_plan()
+        plan = dict_plan if isinstance(obj, dict) else object_plan
+        return {name: render(obj, context) for name, render in plan}
+
+
+    def _render_plan(self):
+        """Return the compiled renderers for `_fields_to_render`.
+
+        This is a pair of tuples of `(name, renderer)` pairs, one for
+        rendering objects and one for rendering dicts, built from each
+        field's `_compile_render`.  The plan is compiled the first time it's
+        needed, and compiled again if `_fields_to_render` is replaced.
+        """
+        fields = self._fields_to_render
+        cached = self.__dict__.get('_compiled_render_plan')
+        if cached is not None and cached[0] is fields:
+            return cached[1]
+        plan = (
+            tuple((name, self._fields[name]._compile_render(name, False))
+                for name in fields),
+            tuple((name, self._fields[name]._compile_render(name, True))
+                for name in fields),
+        )
+        self._compiled_render_plan = (fields, plan)
+        return plan
+
+
+    def _batched_fields(self):
+        """Return the fields in `_fields_to_render` that batch load their
+        nested objects (and are expanded, if they're expandable)."""
+        fields = self._fields_to_render
+        cached = self.__dict__.get('_compiled_batch_fields')
+        if cached is not None and cached[0] is fields:
+            return cached[1]
+        batched = []
+        for name in fields or ():
+            field = self._fields[name]
+            if getattr(field, 'batch_load', None) is not None and \
+                    getattr(field, 'expanded', True):
+                batched.append(field)
+        batched = tuple(batched)
+        self._compiled_batch_fields = (fields, batched)
+        return batched
+
+
+    def _prefetch(self, objs, context):
+        """Batch load the nested objects that rendering `objs` will need.
+
+        For each of the resource's batched fields, this collects the keys
+        of the nested objects of every object in `objs`, and loads them with
+        one call per `batch_load` function, before doing the same for the
+        objects nested in those.  See `pale.batch`.
+
+        Returns `objs`, which is consumed into a list if there's anything to
+        prefetch, so that it can be iterated over again when it's rendered.
+        """
+        batched = self._batched_fields()
+        if not batched or objs is None or context is None:
+            # without a context, there's nowhere to keep the loaded objects
+            return objs
+        objs = list(objs)
+        present = [obj for obj in objs
+                   if obj is not None and obj.__class__ is not RawJSON]
+        if not present:
+            return objs
+
+        keys_by_loader = {}
+        for field in batched:
+            keys = keys_by_loader.setdefault(field.batch_load, [])
+            keys.extend(field._batch_keys(present))
+        for loader, keys in keys_by_loader.iteritems():
+            if keys:
+                load_batch(loader, keys, context)
+        for field in batched:
+            field._prefetch_nested(present, context)
+        return objs
+
+
+
+    def _select_fields(self, selection):
+        """Return a copy of this resource that only renders `selection`.
+
+        `selection` is a sorted tuple of `(field_name, child_selection)`
+        pairs, as produced by `FieldSelectionArgument`.  A `child_selection`
+        narrows a nested ResourceField or ResourceListField in the same way,
+        and None leaves the nested resource's fields as they are.
+
+        Narrowed copies are cached per selection (see `_cached_copy`), so
+        their render plans and compiled JSON encoders are only built once.
+        Raises a ValueError if the selection names a field that the
+        resource doesn't have.
+        """
+        return self._cached_copy(('fields', selection), self._narrowed,
+                                 selection)
+
+
+    def _expand_fields(self, expansion):
+        """Return a copy of this resource with the nested resource fields in
+        `expansion` expanded.
+
+        `expansion` has the same format as a field selection, and comes from
+        an `ExpandArgument`.  The named fields are rendered with their
+        nested resource instead of their stub, and a child expansion expands
+        fields of the nested resource in turn.  Copies are cached like
+        `_select_fields`'s, and a ValueError is raised if the expansion
+        names a field that isn't a nested resource.
+        """
+        return self._cached_copy(('expand', expansion), self._expanded,
+                                 expansion)
+
+
+    def _cached_copy(self, key, build, *args):
+        """Look up (or build and cache) a modified copy of this resource.
 
+        At most `_max_cached_selections` copies are kept per resource, since
+        the keys come from API callers.
+        """
+        cache = self.__dict__.get('_selection_cache')
+        if cache is None:
+            cache = self._selection_cache = {}
+        resource = cache.get(key)
+        if resource is None:
+            resource = build(*args)
+            if len(cache) >= self._max_cached_selections:
+                cache.clear()
+            cache[key] = resource
+        return resource
+
+
+    def _copy(self):
+        """Copy this resource, without its compiled plans and caches."""
+        clone = copy.copy(self)
+        for attr in _COMPILED_ATTRIBUTES:
+            clone.__dict__.pop(attr, None)
+        return clone
+
+
+    def _narrowed(self, selection):
+        fields = self._fields
+        narrowed_fields = None
+        names = []
+        for name, child_selection in selection:
+            field = fields.get(name)
+            if field is None:
+                raise ValueError("%s has no field `%s`." % (
+                    self._value_type, name))
+            if child_selection is not None:
+                nested = getattr(field, 'resource_instance', None)
+                if not isinstance(nested, Resource):
+                    raise ValueError("`%s` is not a resource, so its fields "
+                            "can't be selected." % name)
+                field = copy.copy(field)
+                field.resource_instance = nested._select_fields(
+                        child_selection)
+                if narrowed_fields is None:
+                    narrowed_fields = dict(fields)
+                narrowed_fields[name] = field
+            names.append(name)
+
+        clone = self._copy()
+        if narrowed_fields is not None:
+            # fields are normally shared by the class, so only this copy
+            # gets the narrowed nested resources
+            clone._fields = narrowed_fields
+        clone._fields_to_render = tuple(names)
+        return clone
+
+
+    def _expanded(self, expansion):
+        fields = dict(self._fields)
+        for name, child_expansion in expansion:
+            field = fields.get(name)
+            if field is None:
+                raise ValueError("%s has no field `%s`." % (
+                    self._value_type, name))
+            nested = getattr(field, 'resource_instance', None)
+            if not isinstance(nested, Resource):
+                raise ValueError("`%s` is not a resource, so it can't be "
+                        "expanded." % name)
+            field = copy.copy(field)
+            field.expanded = True
+            if child_expansion is not None:
+                field.resource_instance = nested._expand_fields(
+                        child_expansion)
+            fields[name] = field
+
+        clone = self._copy()
+        clone._fields = fields
+        return clone
 
 
 class ResourceList(Resource):
@@ -104,13 +504,14 @@ class ResourceList(Resource):
 
         if isinstance(item_type, Resource):
             self._item_resource = item_type
-        if isinstance(item_type, types.ObjectType):
+        elif isinstance(item_type, type) and issubclass(item_type, Resource):
             self._item_resource = item_type()
         else:
             raise ValueError("""Failed to initialize ResourceList, since it
             was passed an `item_type` other than an Instance of a Resource or
             a Resource class.""")
-        self._description = "A list of %s Resources" % self._item_resource.name
+        self._description = "A list of %s Resources" % (
+                self._item_resource._value_type, )
 
 
     def _render_serializable(self, list_of_objs, context):
@@ -124,14 +525,31 @@ class ResourceList(Resource):
         This method returns a JSON-serializable list of JSON-serializable
         dicts.
         """
+        if list_of_objs.__class__ is RawJSON:
+            return list_of_objs
         output = []
+        list_of_objs = self._item_resource._prefetch(list_of_objs, context)
+        render = self._item_resource._renderer()
         for obj in list_of_objs:
             if obj is not None:
-                item = self._item_resource._render_serializable(obj, context)
+                item = render(obj, context)
                 output.append(item)
         return output
 
 
+    def _narrowed(self, selection):
+        # a field selection applies to the items in the list
+        clone = self._copy()
+        clone._item_resource = self._item_resource._select_fields(selection)
+        return clone
+
+
+    def _expanded(self, expansion):
+        clone = self._copy()
+        clone._item_resource = self._item_resource._expand_fields(expansion)
+        return clone
+
+
 class NoContentResource(Resource):
     """An empty resource to represent endpoints that return No-Content."""
     _description = "The shell of a Resource where content used to be"
@@ -140,6 +558,28 @@ class NoContentResource(Resource):
         return None
 
 
+class FileResource(Resource):
+    """A resource for endpoints that respond with the contents of a file,
+    rather than with JSON.
+
+    The endpoint's handler returns the path of the file, or a file object,
+    and the file is sent as it is, without being read into memory; see
+    `pale.files`.  Requests for a single byte range get a 206 response.
+    `content_type` is the response's Content-Type, or None to guess it from
+    the file's name.
+    """
+    _value_type = "File"
+
+    def __init__(self, doc_string=None, content_type=None):
+        super(FileResource, self).__init__(doc_string)
+        self._content_type = content_type
+
+
+    def _render_serializable(self, obj, context):
+        raise TypeError("FileResource responses are sent as files, so "
+                "they can't be rendered, or nested in other resources.")
+
+
 class DebugResource(Resource):
     """A schema-less resource to help with debugging.
 
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""JSON serializers for Pale responses.
+
+An endpoint's `_json_serializer` can be any object with an `encode` method
+that turns a rendered value into a JSON string, and a `default` method that
+converts a single value the JSON encoder doesn't understand (the same
+contract as `json.JSONEncoder`).
+
+Pale ships with serializers backed by the standard library's `json` module
+(the default), and by `simplejson`, `ujson` and `orjson` when they're
+installed.  All of them share `PaleDefaultJSONEncoder.default`, and so the
+encoders registered with `register_encoder`, so datetimes and objects with a
+`to_dict` method encode the same way whichever backend is in use.
+
+Select a backend for all endpoints with `pale.config.set_json_backend`.
+
+Values that are already encoded, like JSON from a cache or an upstream
+service, can be wrapped in a `RawJSON`, and every serializer splices them
+into its output as they are, rather than having them decoded just so they
+can be encoded again.
+"""
+import copy
+import datetime
+import decimal
+import inspect
+import json
+import logging
+import re
+import threading
+import uuid
+
+
+_registered_encoders = {}
+_encoder_cache = {}
+
+
+def register_encoder(value_type, encoder):
+    """Register a function to convert values of `value_type` to JSON.
+
+    `encoder` is called with a value whose type is `value_type` (or a
+    subclass of it, unless that has an encoder of its own), and should
+    return something JSON serializable, just like `json.JSONEncoder.default`
+    does.  Registering an encoder for a type that already has one replaces
+    it.
+
+    Pale registers encoders for datetimes, dates, Decimals (as strings),
+    sets and UUIDs.  Objects with a `to_dict` method are converted with it
+    unless their type has a registered encoder.
+    """
+    _registered_encoders[value_type] = encoder
+    _encoder_cache.clear()
+
+
+def _encode_with_to_dict(obj):
+    return obj.to_dict()
+
+
+def _resolve_encoder(cls):
+    """Find the encoder for a class by walking its MRO, or None."""
+    for base in inspect.getmro(cls):
+        encoder = _registered_encoders.get(base)
+        if encoder is not None:
+            return encoder
+    if callable(getattr(cls, 'to_dict', None)):
+        return _encode_with_to_dict
+    return None
+
+
+def encoder_for(cls):
+    """Return the encoder that Pale uses for instances of `cls`, or None.
+
+    Lookups are cached per class, so after the first one, this is a single
+    dict lookup.
+    """
+    try:
+        return _encoder_cache[cls]
+    except KeyError:
+        encoder = _encoder_cache[cls] = _resolve_encoder(cls)
+        return encoder
+
+
+def format_datetime(obj):
+    """Format a datetime in ISO 8601, with its UTC offset.
+
+    Naive datetimes are assumed to be in UTC.  The output is identical to
+    `arrow.get(obj).isoformat()`, which is what Pale used to do for every
+    datetime, but without building an Arrow object per value.  The offset of
+    an aware datetime is formatted by `datetime.isoformat` itself, which is
+    exactly what Arrow ends up calling.
+    """
+    if obj.__class__ is not datetime.datetime:
+        # subclasses can override isoformat, so leave them to arrow, which
+        # rebuilds a plain datetime from their fields
+        return _arrow_isoformat(obj)
+    if obj.tzinfo is None:
+        return obj.isoformat() + '+00:00'
+    return obj.isoformat()
+
+
+def _arrow_isoformat(obj):
+    import arrow
+    return arrow.get(obj).isoformat()
+
+
+class RawJSON(object):
+    """JSON text to include in a response as it is.
+
+    Handlers, resources and fields can return a RawJSON anywhere they'd
+    return a value to encode, and the JSON is written into the response
+    without being parsed.  A Resource that's given a RawJSON to render
+    passes it through untouched, so a handler can return a cached rendering
+    of an object in its place.
+
+    Unless `validate` is False, the text is given a cheap sanity check (it
+    has to start and end like a JSON value), which raises a ValueError for
+    things like empty strings; it isn't parsed, so it's up to the caller to
+    make sure it's really JSON.  The text should be unicode or ASCII, which
+    is what Pale's default encoder produces.
+    """
+    __slots__ = ('json',)
+
+    def __init__(self, json_text, validate=True):
+        if validate:
+            _check_raw_json(json_text)
+        self.json = json_text
+
+    def __repr__(self):
+        return 'RawJSON(%r)' % self.json
+
+
+_JSON_LITERALS = frozenset(['true', 'false', 'null'])
+_JSON_DELIMITERS = {'{': '}', '[': ']', '"': '"'}
+
+
+def _check_raw_json(json_text):
+    if not isinstance(json_text, basestring):
+        raise ValueError("RawJSON needs a string, not %r." % (json_text,))
+    stripped = json_text.strip()
+    if stripped:
+        first, last = stripped[0], stripped[-1]
+        if len(stripped) > 1 and _JSON_DELIMITERS.get(first) == last:
+            return
+        if stripped in _JSON_LITERALS:
+            return
+        if first in '-0123456789' and last in '0123456789':
+            return
+    raise ValueError("%r doesn't look like JSON." % json_text[:40])
+
+
+# While a serializer is encoding, the RawJSON values it has come across are
+# kept here by id, and the encoder writes a placeholder string in their
+# place, which is replaced once the encoding is done.
+_raw_json_state = threading.local()
+_RAW_JSON_MARK = u'\ufdd0pale-raw-json:'
+_RAW_JSON_PLACEHOLDER = re.compile(
+        ur'"(?:\\ufdd0|\ufdd0)pale-raw-json:([0-9a-f]+)"')
+
+
+def _encode_raw_json(obj):
+    values = getattr(_raw_json_state, 'values', None)
+    if values is None:
+        # outside of a serializer's `encode`, it can only be decoded
+        return json.loads(obj.json)
+    key = '%x' % id(obj)
+    values[key] = obj
+    return _RAW_JSON_MARK + key
+
+
+def _encode_splicing_raw_json(encode, obj):
+    """Encode `obj` with `encode`, splicing the JSON of the RawJSON values
+    in it into the output."""
+    previous = getattr(_raw_json_state, 'values', None)
+    values = _raw_json_state.values = {}
+    try:
+        encoded = encode(obj)
+    finally:
+        _raw_json_state.values = previous
+    if not values:
+        return encoded
+    def splice(match):
+        raw = values.get(match.group(1))
+        return raw.json if raw is not None else match.group(0)
+    return _RAW_JSON_PLACEHOLDER.sub(splice, encoded)
+
+
+class PaleDefaultJSONEncoder(json.JSONEncoder):
+    """The default JSON Encoder for Pale.
+
+    The main difference between this and Python's default JSON encoder
+    is that this encoder converts values with the encoders registered with
+    `register_encoder` (so datetimes are serialized to ISO format), and
+    tries to call a `to_dict` method on the passed in object before giving
+    up.
+    """
+
+    def default(self, obj):
+        """Default JSON encoding."""
+        encoder = encoder_for(obj.__class__)
+        if encoder is not None:
+            return encoder(obj)
+        # `to_dict` might have been set on the instance, rather than its
+        # class
+        to_dict = getattr(obj, 'to_dict', None)
+        if callable(to_dict):
+            return to_dict()
+        raise TypeError(repr(obj) + " is not JSON serializable")
+
+    def encode(self, obj):
+        return _encode_splicing_raw_json(
+                super(PaleDefaultJSONEncoder, self).encode, obj)
+
+
+register_encoder(RawJSON, _encode_raw_json)
+register_encoder(datetime.datetime, format_datetime)
+register_encoder(datetime.date, datetime.date.isoformat)
+register_encoder(decimal.Decimal, str)
+register_encoder(set, list)
+register_encoder(frozenset, list)
+register_encoder(uuid.UUID, str)
+
+
+# Pale's conversions for values that JSON doesn't support natively, shared by
+# every backend.
+_pale_default = PaleDefaultJSONEncoder().default
+
+
+class SimpleJSONSerializer(object):
+    """A serializer backed by simplejson, which uses its C speedups when
+    they're compiled.
+
+    simplejson's extensions (native Decimals, namedtuples as objects,
+    `for_json`) are turned off so the output matches the default encoder.
+    """
+
+    def __init__(self, sort_keys=False):
+        import simplejson
+        self._encoder = simplejson.JSONEncoder(
+                default=self.default,
+                sort_keys=sort_keys,
+                use_decimal=False,
+                namedtuple_as_object=False,
+                tuple_as_array=True,
+                for_json=False,
+                iterable_as_array=False)
+
+    def default(self, obj):
+        return _pale_default(obj)
+
+    def encode(self, obj):
+        return _encode_splicing_raw_json(self._encoder.encode, obj)
+
+
+# The types that ujson encodes exactly like the standard library does.
+_UJSON_NATIVE_TYPES = frozenset([str, unicode, int, long, float, bool,
+                                 type(None)])
+
+
+class UJSONSerializer(object):
+    """A serializer backed by ujson.
+
+    ujson has no `default` hook, and it has its own opinions about some
+    types (Decimals become floats, objects with `toDict` are converted), so
+    values are first run through `_prepare`, which rebuilds containers and
+    applies Pale's conversions to anything other than plain JSON types.
+    That pass runs in Python, so this is usually slower than the other
+    backends (see `benchmarks/json_backends.py`); it's here for apps that
+    already standardize on ujson.  Note that ujson's output uses compact
+    separators.
+    """
+
+    def __init__(self, sort_keys=False):
+        import ujson
+        self._dumps = ujson.dumps
+        self._sort_keys = sort_keys
+        # for the values ujson can't represent, like integers beyond 64 bits
+        self._fallback = PaleDefaultJSONEncoder(sort_keys=sort_keys)
+
+    def default(self, obj):
+        return _pale_default(obj)
+
+    def _prepare(self, obj):
+        if obj.__class__ in _UJSON_NATIVE_TYPES:
+            return obj
+        prepare = self._prepare
+        if isinstance(obj, dict):
+            return dict((k, prepare(v)) for k, v in obj.iteritems())
+        if isinstance(obj, (list, tuple)):
+            return [prepare(v) for v in obj]
+        if isinstance(obj, (basestring, int, long, float)):
+            return obj
+        return prepare(self.default(obj))
+
+    def encode(self, obj):
+        return _encode_splicing_raw_json(self._encode, obj)
+
+    def _encode(self, obj):
+        try:
+            return self._dumps(self._prepare(obj),
+                    ensure_ascii=True,
+                    escape_forward_slashes=False,
+                    sort_keys=self._sort_keys)
+        except OverflowError:
+            return self._fallback.encode(obj)
+
+
+class ORJSONSerializer(object):
+    """A serializer backed by orjson.
+
+    orjson has its own datetime format, so datetimes are passed through to
+    Pale's `default` instead.  orjson doesn't escape non-ASCII characters,
+    so the output is UTF-8 rather than the default encoder's ASCII.
+    """
+
+    def __init__(self, sort_keys=False):
+        import orjson
+        self._dumps = orjson.dumps
+        self._option = orjson.OPT_PASSTHROUGH_DATETIME | \
+                orjson.OPT_PASSTHROUGH_DATACLASS | \
+                orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            self._option |= orjson.OPT_SORT_KEYS
+
+    def default(self, obj):
+        return _pale_default(obj)
+
+    def encode(self, obj):
+        return _encode_splicing_raw_json(self._encode, obj)
+
+    def _encode(self, obj):
+        return self._dumps(obj, default=self.default,
+                option=self._option).decode('utf-8')
+
+
+BACKENDS = (
+    ('stdlib', lambda sort_keys: PaleDefaultJSONEncoder(sort_keys=sort_keys)),
+    ('simplejson', SimpleJSONSerializer),
+    ('ujson', UJSONSerializer),
+    ('orjson', ORJSONSerializer),
+)
+"""The JSON backends Pale knows about, by name."""
+
+_BACKEND_FACTORIES = dict(BACKENDS)
+
+
+def get_serializer(backend='stdlib', sort_keys=False):
+    """Create a serializer for the named backend.
+
+    `backend` is one of the names in `BACKENDS`, or 'fastest' for the first
+    of orjson and simplejson that's installed.  If the backend can't
+    be imported, this logs a warning and falls back to the standard library
+    encoder.
+    """
+    if backend == 'fastest':
+        available = available_backends()
+        for name in ('orjson', 'simplejson'):
+            if name in available:
+                return get_serializer(name, sort_keys)
+        return get_serializer('stdlib', sort_keys)
+
+    if backend not in _BACKEND_FACTORIES:
+        raise ValueError("Unknown JSON backend %r. Choose one of %s." % (
+            backend, ', '.join(name for name, _ in BACKENDS)))
+    try:
+        return _BACKEND_FACTORIES[backend](sort_keys)
+    except ImportError:
+        logging.warning("JSON backend %r isn't installed. Falling back to "
+                "the standard library's json module.", backend)
+        return PaleDefaultJSONEncoder(sort_keys=sort_keys)
+
+
+_sorted_serializers = {}
+
+
+def sorted_serializer(serializer):
+    """Return a serializer that encodes like `serializer`, but with the keys
+    of every object sorted, so equal values always encode to the same
+    string.
+
+    This works for the standard library's encoders and Pale's serializers;
+    other serializers are returned as they are, and should sort their keys
+    themselves.
+    """
+    try:
+        return _sorted_serializers[serializer]
+    except KeyError:
+        pass
+    if isinstance(serializer, json.JSONEncoder):
+        result = copy.copy(serializer)
+        result.sort_keys = True
+    elif serializer.__class__ in (SimpleJSONSerializer, UJSONSerializer,
+                                  ORJSONSerializer):
+        result = serializer.__class__(sort_keys=True)
+    else:
+        result = serializer
+    _sorted_serializers[serializer] = result
+    return result
+
+
+def available_backends():
+    """Return the names of the JSON backends that can be imported."""
+    available = []
+    for name, factory in BACKENDS:
+        try:
+            factory(False)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""A cache backend shared by the worker processes on a host.
+
+`SharedMemoryCache` keeps its values in a memory-mapped file, so every
+process that opens the same file (say, the workers of a pre-forking server
+like gunicorn) shares one cache: it's only warmed once, and its memory isn't
+duplicated per worker.  Use it anywhere Pale takes a cache backend, like an
+endpoint's `_response_cache`:
+
+    _response_cache = SharedMemoryCache('/var/run/my-api/responses.cache')
+
+The file is split into `slot_count` fixed-size slots, which are grouped
+into buckets of `ways` slots.  A key hashes to one bucket, so the hash index
+is just the slot headers of that bucket, and a lookup reads at most `ways`
+headers.  When a bucket is full, a slot is evicted with the clock
+algorithm: each slot has a referenced bit that's set when it's read, and the
+bucket's clock hand sweeps over its slots, clearing the bits, until it finds
+one that hasn't been used since the last sweep.
+
+Buckets are protected by striped locks: `fcntl` byte-range locks between
+processes (shared for reads, exclusive for writes), and a thread lock per
+stripe within a process.  Values are pickled, and values whose pickle
+doesn't fit in a slot aren't cached.
+
+Unpickling runs code, so anyone who can write to the file can run code in
+the processes that read it.  Keep it in a directory that only the server's
+user can write to (not a shared one like `/tmp`); the cache refuses to open
+a file that's a symlink, that belongs to another user, or that other users
+can read or write.
+
+This needs `fcntl`, so it's only available on Unix.
+"""
+import cPickle as pickle
+import fcntl
+import hashlib
+import mmap
+import os
+import stat
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from pale.cache import BaseCache
+
+
+_MAGIC = 'PALESHM1'
+# magic, slot count, slot size, ways
+_FILE_HEADER = struct.Struct('<8sIII')
+_FILE_HEADER_SIZE = 64
+
+# key digest, expiry time (0 for none), value length, flags
+_SLOT_HEADER = struct.Struct('<16sdIB3x')
+_FLAGS_OFFSET = 28
+
+_VALID = 1
+_REFERENCED = 2
+
+
+def _round_up(n, multiple):
+    return (n + multiple - 1) // multiple * multiple
+
+
+class SharedMemoryCache(BaseCache):
+    """A cache stored in a memory-mapped file at `path`.
+
+    The file is created (and sized to about `slot_count * slot_size`
+    bytes) by the first process to open it.  Processes that open an
+    existing file have to pass the same `slot_count`, `slot_size` and
+    `ways`, or a ValueError is raised; delete the file to change them.
+
+    `ttl` is the default time to live of the values, in seconds, or None
+    for values that don't expire.  The `size` passed to `set` isn't used,
+    since the cache's memory is fixed.
+
+    Raises a ValueError if the file isn't a regular file that belongs to
+    the current user and only they can access, and an OSError if it's a
+    symlink.
+    """
+
+    def __init__(self, path, slot_count=8192, slot_size=8192, ways=8,
+            stripes=64, ttl=None, clock=time.time):
+        if slot_count % ways:
+            raise ValueError("slot_count must be a multiple of ways.")
+        if slot_size <= _SLOT_HEADER.size:
+            raise ValueError("slot_size must be bigger than %d bytes." %
+                    _SLOT_HEADER.size)
+        self.path = path
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.ways = ways
+        self.ttl = ttl
+        self._clock = clock
+        self._bucket_count = slot_count // ways
+        self._stripes = min(stripes, self._bucket_count)
+        self._thread_locks = [threading.Lock()
+                              for _ in xrange(self._stripes)]
+        # each bucket's clock hand is a byte after the file header
+        self._hands_offset = _FILE_HEADER_SIZE
+        self._slots_offset = _round_up(
+                _FILE_HEADER_SIZE + self._bucket_count, 64)
+        self._max_value_size = slot_size - _SLOT_HEADER.size
+        self.hits = 0
+        self.misses = 0
+
+        size = self._slots_offset + slot_count * slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW,
+                0600)
+        try:
+            self._check_owner()
+            self._open(size)
+        except:
+            os.close(self._fd)
+            raise
+
+
+    def _check_owner(self):
+        # the values are unpickled, so another user who could write them
+        # could run code in this process
+        info = os.fstat(self._fd)
+        if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid() or \
+                info.st_mode & 0077:
+            raise ValueError("%s must be a regular file that only its owner, "
+                    "the current user, can access." % self.path)
+
+
+    def _open(self, size):
+        # byte 0 of the file guards its initialization; the stripe locks
+        # are the bytes after it
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0, 0)
+        try:
+            existing_size = os.fstat(self._fd).st_size
+            if existing_size == 0:
+                os.ftruncate(self._fd, size)
+                self._mmap = mmap.mmap(self._fd, size)
+                self._mmap[0:_FILE_HEADER.size] = _FILE_HEADER.pack(_MAGIC,
+                        self.slot_count, self.slot_size, self.ways)
+                return
+
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            header = os.read(self._fd, _FILE_HEADER.size)
+            expected = _FILE_HEADER.pack(_MAGIC, self.slot_count,
+                    self.slot_size, self.ways)
+            if header != expected or existing_size != size:
+                raise ValueError("%s isn't a SharedMemoryCache file with "
+                        "%d slots of %d bytes in buckets of %d." % (
+                            self.path, self.slot_count, self.slot_size,
+                            self.ways))
+            self._mmap = mmap.mmap(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0, 0)
+
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+
+    def _locate(self, key):
+        """Return the digest that identifies `key`, and its bucket."""
+        digest = hashlib.md5(repr(key)).digest()
+        bucket = struct.unpack_from('<Q', digest)[0] % self._bucket_count
+        return digest, bucket
+
+
+    @contextmanager
+    def _locked(self, bucket, exclusive):
+        stripe = bucket % self._stripes
+        with self._thread_locks[stripe]:
+            fcntl.lockf(self._fd,
+                    fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH,
+                    1, stripe + 1, 0)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe + 1, 0)
+
+
+    def _slot_offsets(self, bucket):
+        first = self._slots_offset + bucket * self.ways * self.slot_size
+        return xrange(first, first + self.ways * self.slot_size,
+                      self.slot_size)
+
+
+    def get(self, key):
+        digest, bucket = self._locate(key)
+        mm = self._mmap
+        data = None
+        with self._locked(bucket, exclusive=False):
+            for offset in self._slot_offsets(bucket):
+                slot_digest, expires_at, length, flags = \
+                        _SLOT_HEADER.unpack_from(mm, offset)
+                if not flags & _VALID or slot_digest != digest:
+                    continue
+                if expires_at and expires_at <= self._clock():
+                    break
+                start = offset + _SLOT_HEADER.size
+                data = mm[start:start + length]
+                if not flags & _REFERENCED:
+                    # other readers can only set the same bit, so this is
+                    # safe under the shared lock
+                    mm[offset + _FLAGS_OFFSET] = chr(flags | _REFERENCED)
+                break
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(data)
+
+
+    def set(self, key, value, size=0, ttl=None):
+        if value is None:
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self._max_value_size:
+            return
+        if ttl is None:
+            ttl = self.ttl
+        expires_at = self._clock() + ttl if ttl is not None else 0.0
+
+        digest, bucket = self._locate(key)
+        mm = self._mmap
+        with self._locked(bucket, exclusive=True):
+            offset = self._choose_slot(bucket, digest)
+            start = offset + _SLOT_HEADER.size
+            mm[start:start + len(data)] = data
+            mm[offset:start] = _SLOT_HEADER.pack(digest, expires_at,
+                    len(data), _VALID)
+
+
+    def _choose_slot(self, bucket, digest):
+        """Pick the slot for `digest` in `bucket`: the one that already
+        holds it, or an empty or expired one, or else the one the clock
+        evicts.  Must be called with the bucket locked exclusively."""
+        mm = self._mmap
+        now = self._clock()
+        offsets = self._slot_offsets(bucket)
+        free = None
+        for offset in offsets:
+            slot_digest, expires_at, _, flags = \
+                    _SLOT_HEADER.unpack_from(mm, offset)
+            if flags & _VALID and slot_digest == digest:
+                return offset
+            if free is None and (not flags & _VALID or
+                    (expires_at and expires_at <= now)):
+                free = offset
+        if free is not None:
+            return free
+
+        hand_offset = self._hands_offset + bucket
+        hand = ord(mm[hand_offset]) % self.ways
+        # after one sweep every referenced bit is clear, so this finds a
+        # slot within two
+        while True:
+            offset = offsets[hand]
+            hand = (hand + 1) % self.ways
+            flags = ord(mm[offset + _FLAGS_OFFSET])
+            if flags & _REFERENCED:
+                mm[offset + _FLAGS_OFFSET] = chr(flags & ~_REFERENCED)
+                continue
+            mm[hand_offset] = chr(hand)
+            return offset
+
+
+    def delete(self, key):
+        digest, bucket = self._locate(key)
+        mm = self._mmap
+        with self._locked(bucket, exclusive=True):
+            for offset in self._slot_offsets(bucket):
+                slot_digest, _, _, flags = _SLOT_HEADER.unpack_from(mm,
+                        offset)
+                if flags & _VALID and slot_digest == digest:
+                    mm[offset + _FLAGS_OFFSET] = chr(0)
+
+
+    def clear(self):
+        mm = self._mmap
+        for bucket in xrange(self._bucket_count):
+            with self._locked(bucket, exclusive=True):
+                for offset in self._slot_offsets(bucket):
+                    mm[offset + _FLAGS_OFFSET] = chr(0)
+
+
+    def __len__(self):
+        """The number of cached values, including expired ones that haven't
+        been replaced yet."""
+        mm = self._mmap
+        count = 0
+        for bucket in xrange(self._bucket_count):
+            for offset in self._slot_offsets(bucket):
+                if ord(mm[offset + _FLAGS_OFFSET]) & _VALID:
+                    count += 1
+        return count
@@ -1,10 +1,13 @@
 import datetime
+import os
 
 from multiprocessing import Manager
 
-from pale import Endpoint, PatchEndpoint, PutResourceEndpoint
-from pale.arguments import BooleanArgument, IntegerArgument, StringArgument
-from pale.resource import DebugResource, NoContentResource
+from pale import Endpoint, PatchEndpoint, PutResourceEndpoint, ResourceList
+from pale.arguments import (BooleanArgument, FieldSelectionArgument,
+        IntegerArgument, ListArgument, StringArgument, URLArgument)
+from pale.cache import LRUCache
+from pale.resource import DebugResource, FileResource, NoContentResource
 from pale.errors.api_error import APIError
 from tests.example_app.models import DateTimeModel, DateTimeRangeModel
 from tests.example_app.api.resources import (DateTimeResource,
@@ -119,12 +122,188 @@ class TimeRangeEndpoint(Endpoint):
             "The duration in milliseconds to be used.",
             required=True)
 
+    fields = FieldSelectionArgument(
+            "The fields of the range to return.",
+            details="A comma-separated list of field names, like "
+            "`start,end.year`.  Defaults to all of the range's fields.")
+
 
     def _handle(self, context):
         millis = context.args['duration']
         time_range = DateTimeRangeModel(millis*1000) # microseconds
         return {'range': time_range}
 
+class CachedTimeEndpoint(Endpoint):
+    """Returns the time of the first request for each name, for a minute.
+
+    This illustrates and tests the response cache: the handler only runs
+    when there isn't a cached response for the request's arguments.
+    """
+
+    _http_method = "GET"
+    _uri = "/time/cached"
+    _route_name = "cached_time"
+
+    _default_cache = 'max-age=60'
+    _response_cache = LRUCache(max_entries=100)
+    _etag = True
+
+    _returns = DateTimeResource(
+            "The time when the response was rendered.")
+
+
+    name = StringArgument("The name for your datetime")
+
+
+    def _handle(self, context):
+        now = DateTimeModel(datetime.datetime.utcnow())
+        now.name = context.args.get('name', None)
+        return {'time': now}
+
+
+class EpochEndpoint(Endpoint):
+    """Returns the Unix epoch, which never changes.
+
+    The handler supplies the version of its response, so clients that
+    already have it get a 304 without the response being rendered.
+    """
+
+    _http_method = "GET"
+    _uri = "/time/epoch"
+    _route_name = "epoch"
+
+    _returns = DateTimeResource("The Unix epoch.")
+
+
+    def _set_version(self, context):
+        context.etag = 'epoch-v1'
+        context.last_modified = datetime.datetime(1970, 1, 1)
+
+    def _handle(self, context):
+        self._set_version(context)
+        return {'time': DateTimeModel(context.last_modified)}
+
+    def _handle_head(self, context):
+        # HEAD responses have no body, so there's no model to build
+        self._set_version(context)
+
+
+class TimeUnitsEndpoint(Endpoint):
+    """Lists the units of time that the time resources use.
+
+    The list never changes, so the response is rendered once, when the
+    endpoint is bound.
+    """
+
+    _http_method = "GET"
+    _uri = "/time/units"
+    _route_name = "time_units"
+    _allow_cors = True
+
+    _static = True
+    _default_cache = 'max-age=86400'
+
+    _returns = DebugResource("The units of time.")
+
+    _after_response_handlers = (add_after_response_test, )
+
+
+    def _handle(self, context):
+        return {'units': ['year', 'month', 'day', 'hours', 'minutes',
+                          'seconds']}
+
+
+class ReadmeEndpoint(Endpoint):
+    """Sends the example app's README.
+
+    The file is sent without being read into memory, and clients can ask
+    for a byte range of it.
+    """
+
+    _http_method = "GET"
+    _uri = "/files/readme"
+    _route_name = "readme"
+
+    _etag = True
+
+    _returns = FileResource("The README, as markdown.",
+            content_type='text/plain; charset=utf-8')
+
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+            'README.md')
+
+
+    def _handle(self, context):
+        return self.path
+
+
+LINK_ARGUMENT = URLArgument("A link.")
+
+
+def count_links(context):
+    """Counts the links passed to the LinksEndpoint, for its handler."""
+    context.state.count = len(context.args['links']) + \
+            len(context.args.get('mirrors', ()))
+
+
+class LinksEndpoint(Endpoint):
+    """Echoes the links and mirrors it's passed.
+
+    Both lists share their item argument, and the before handler passes its
+    count to the handler on `context.state`, so requests on different
+    threads mustn't see each other's state.
+    """
+
+    _http_method = "GET"
+    _uri = "/links"
+    _route_name = "links"
+
+    _returns = DebugResource("The links.")
+
+    _before_handlers = (count_links, )
+
+
+    links = ListArgument("Some links.", item_type=LINK_ARGUMENT,
+            required=True)
+    mirrors = ListArgument("Mirrors of the links.", item_type=LINK_ARGUMENT)
+
+
+    def _handle(self, context):
+        return {'links': [link.geturl() for link in context.args['links']],
+                'mirrors': [mirror.geturl()
+                            for mirror in context.args.get('mirrors', ())],
+                'count': context.state.count}
+
+
+class TimeSeriesEndpoint(Endpoint):
+    """Streams a series of consecutive days, starting today.
+
+    The days are generated lazily while the response is being sent, which
+    is what you'd do with a large datastore query.
+    """
+
+    _http_method = "GET"
+    _uri = "/time/series"
+    _route_name = "time_series"
+
+    _stream_response = True
+    _stream_items_per_chunk = 10
+
+    _returns = ResourceList("A series of days.", DateTimeResource)
+
+
+    days = IntegerArgument("The number of days in the series.",
+            required=True,
+            min_value=0)
+
+
+    def _handle(self, context):
+        start = datetime.datetime.utcnow()
+        series = (DateTimeModel(start + datetime.timedelta(days=i))
+                for i in xrange(context.args['days']))
+        return {'days': series}
+
+
 """
 Resource endpoints.
 We create a multiprocessing memory manager and shared
@@ -145,6 +324,7 @@ class GetResourceEndpoint(Endpoint):
     _uri = "/resource"
     _http_method = 'GET'
     _route_name = "resource_get"
+    _etag = True
 
     _returns = DebugResource("app resource.")
 
@@ -4,9 +4,10 @@ import unittest
 import urlparse
 
 from pale import Endpoint
-from pale.arguments import (BaseArgument, BooleanArgument, JsonDictArgument,
-        FloatArgument, IntegerArgument, ListArgument, ScopeArgument,
-        StringArgument, StringListArgument, URLArgument)
+from pale.arguments import (BaseArgument, BooleanArgument,
+        ExpandArgument, FieldSelectionArgument, JsonDictArgument, FloatArgument,
+        IntegerArgument, ListArgument, ScopeArgument, StringArgument,
+        StringListArgument, URLArgument)
 from pale.errors import ArgumentError
 
 
@@ -272,6 +273,47 @@ class ArgumentTests(unittest.TestCase):
                 ['hello', 'world'])
 
 
+    def test_field_selection_argument(self):
+        fields = FieldSelectionArgument('test fields arg')
+        self.expect_valid_argument(fields, None, None)
+        self.expect_valid_argument(fields, '', None)
+        self.expect_valid_argument(fields, 'title', (('title', None),))
+        self.expect_valid_argument(fields, 'title, id,',
+                (('id', None), ('title', None)))
+        self.expect_valid_argument(fields, 'id,author.name,author.id',
+                (('author', (('id', None), ('name', None))), ('id', None)))
+        # naming a parent and its child narrows the parent
+        self.expect_valid_argument(fields, 'author,author.name',
+                (('author', (('name', None),)),))
+        # the argument can be passed more than once
+        self.expect_valid_argument(fields, ['id', u'author.name'],
+                (('author', (('name', None),)), ('id', None)))
+
+        self.expect_invalid_argument(fields, 'author..name')
+        self.expect_invalid_argument(fields, '_private')
+        self.expect_invalid_argument(fields, 'id;drop')
+        self.expect_invalid_argument(fields, 10)
+
+        required = FieldSelectionArgument('test fields arg', required=True)
+        self.expect_invalid_argument(required, None)
+        self.expect_invalid_argument(required, ' , ')
+
+        with_default = FieldSelectionArgument('test fields arg',
+                default='id')
+        self.expect_valid_argument(with_default, None, (('id', None),))
+
+
+    def test_expand_argument(self):
+        expand = ExpandArgument('test expand arg')
+        self.expect_valid_argument(expand, None, None)
+        self.expect_valid_argument(expand, 'author,comments.author',
+                (('author', None), ('comments', (('author', None),))))
+        self.expect_invalid_argument(expand, 'comments.author.company')
+        expand.max_depth = 3
+        self.expect_valid_argument(expand, 'comments.author.company',
+                (('comments', (('author', (('company', None),)),)),))
+
+
     def test_list_argument(self):
         required_bool_list_arg = ListArgument('test list arg',
                 required=True,
@@ -349,3 +391,117 @@ class ArgumentTests(unittest.TestCase):
                     'extra': 'something else',
                     'optionals': ['hello', 'how are you']
                 })
+
+
+    def test_endpoint_argument_parse_plan(self):
+        from pale.context import DefaultContext
+        from pale.endpoint import set_current_context
+
+        class PlanTestEndpoint(Endpoint):
+            _http_method = 'GET'
+            _uri = '/plan'
+            _route_name = 'plan'
+
+            count = IntegerArgument('a count', default=10)
+            offset = IntegerArgument('an offset')
+            name = StringArgument('a name', required=True)
+            active = BooleanArgument('active?', default=False)
+            tags = StringListArgument('tags', separator=',')
+            ids = ListArgument('ids', item_type=IntegerArgument('an id'))
+
+        plan = PlanTestEndpoint._argument_plan
+        self.assertEqual([step[0] for step in plan],
+                sorted(PlanTestEndpoint._arguments.keys()))
+        steps = dict((step[0], step) for step in plan)
+        # list arguments keep their lists, everything else gets unwrapped
+        self.assertFalse(steps['ids'][2])
+        self.assertFalse(steps['tags'][2])
+        self.assertTrue(steps['count'][2])
+        # defaults are validated ahead of time
+        self.assertEqual(steps['count'][3], 10)
+        self.assertEqual(steps['active'][3], False)
+
+        def parse(raw_args):
+            context = DefaultContext()
+            context._raw_args = raw_args
+            set_current_context(context)
+            PlanTestEndpoint()._parse_args()
+            return context.args
+
+        self.assertEqual(parse({'name': ['bob']}),
+                {'name': 'bob', 'count': 10, 'active': False})
+        self.assertEqual(parse({'name': ['bob'],
+                                'count': ['3'],
+                                'offset': ['5'],
+                                'active': ['true'],
+                                'tags': ['a,b'],
+                                'ids': ['1', '2']}),
+                {'name': 'bob', 'count': 3, 'offset': 5, 'active': True,
+                 'tags': ['a', 'b'], 'ids': [1, 2]})
+
+        with self.assertRaises(ArgumentError):
+            parse({})
+        with self.assertRaises(ArgumentError):
+            parse({'name': ['bob'], 'count': ['many']})
+
+
+    def test_endpoint_selection_arguments(self):
+        from pale import Resource, ResourceList
+        from pale.context import DefaultContext
+        from pale.endpoint import set_current_context
+        from pale.fields import IntegerField, ResourceField, StringField
+
+        class AuthorResource(Resource):
+            _value_type = 'Test author resource'
+            name = StringField("The name")
+
+        class PostResource(Resource):
+            _value_type = 'Test post resource'
+            id = IntegerField("The id")
+            title = StringField("The title")
+            author = ResourceField("The author",
+                    resource_type=AuthorResource,
+                    expandable=True)
+
+        class SelectionTestEndpoint(Endpoint):
+            _http_method = 'GET'
+            _uri = '/posts'
+            _route_name = 'selection_test'
+            _returns = ResourceList('Posts', PostResource)
+
+            fields = FieldSelectionArgument('the fields to render')
+            expand = ExpandArgument('the fields to expand')
+
+        self.assertEqual(SelectionTestEndpoint._field_selection_argument,
+                'fields')
+        self.assertEqual(SelectionTestEndpoint._expand_argument, 'expand')
+
+        def response_resource(raw_args):
+            context = DefaultContext()
+            context._raw_args = raw_args
+            set_current_context(context)
+            endpoint = SelectionTestEndpoint()
+            endpoint._parse_args()
+            return endpoint._response_resource(context)
+
+        self.assertIs(response_resource({}), SelectionTestEndpoint._returns)
+        resource = response_resource({'fields': ['id,author'],
+                                      'expand': ['author']})
+        self.assertEqual(resource._item_resource._fields_to_render,
+                ('author', 'id'))
+        self.assertTrue(resource._item_resource._fields['author'].expanded)
+
+        for raw_args in ({'fields': ['nope']}, {'expand': ['title']},
+                         {'expand': ['author.nope']}):
+            with self.assertRaises(ArgumentError):
+                response_resource(raw_args)
+
+        with self.assertRaises(ValueError):
+            class TwoSelectionsEndpoint(Endpoint):
+                _http_method = 'GET'
+                _uri = '/posts'
+                _route_name = 'two_selections_test'
+                _returns = PostResource('A post')
+
+                fields = FieldSelectionArgument('the fields to render')
+                only = FieldSelectionArgument('the fields to render, again')
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from pale import Resource, ResourceList
+from pale.batch import load_batch
+from pale.compiled_json import resource_encoder
+from pale.context import DefaultContext
+from pale.endpoint import PaleDefaultJSONEncoder
+from pale.fields import (IntegerField, ResourceField, ResourceListField,
+        StringField)
+
+
+COMPANIES = {1: {'name': 'Loudr'}, 2: {'name': 'Other'}}
+USERS = dict((i, {'id': i, 'name': 'User %d' % i, 'company_id': i % 2 + 1})
+             for i in range(10))
+
+
+class Post(object):
+    def __init__(self, i):
+        self.id = i
+        self.author_id = i % 3
+        self.editor_id = 9
+        self.reviewer_ids = [i % 3, 5]
+
+
+class Loader(object):
+    """Records the keys it's asked for."""
+
+    def __init__(self, table):
+        self.table = table
+        self.calls = []
+
+    def __call__(self, keys, context):
+        self.calls.append(sorted(keys))
+        return dict((key, self.table[key]) for key in keys
+                    if key in self.table)
+
+
+def make_resources(load_users, load_companies):
+    class CompanyResource(Resource):
+        _value_type = 'Test company resource'
+        name = StringField("The name")
+
+    class UserResource(Resource):
+        _value_type = 'Test user resource'
+        id = IntegerField("The id")
+        name = StringField("The name")
+        company = ResourceField("The user's company",
+                resource_type=CompanyResource,
+                batch_key=lambda user: user['company_id'],
+                batch_load=load_companies)
+
+    class PostResource(Resource):
+        _value_type = 'Test post resource'
+        id = IntegerField("The id")
+        author = ResourceField("The author",
+                resource_type=UserResource,
+                batch_key=lambda post: post.author_id,
+                batch_load=load_users)
+        editor = ResourceField("The editor",
+                resource_type=UserResource,
+                subfields=('name',),
+                batch_key=lambda post: post.editor_id,
+                batch_load=load_users)
+        reviewers = ResourceListField("The reviewers",
+                resource_type=UserResource,
+                subfields=('id',),
+                batch_key=lambda post: post.reviewer_ids,
+                batch_load=load_users)
+
+    return PostResource
+
+
+class BatchLoadingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.load_users = Loader(USERS)
+        self.load_companies = Loader(COMPANIES)
+        PostResource = make_resources(self.load_users, self.load_companies)
+        self.resource = ResourceList('Posts', PostResource)
+        self.posts = [Post(i) for i in range(20)]
+
+    def expected(self):
+        return [{
+            'id': post.id,
+            'author': {
+                'id': post.author_id,
+                'name': 'User %d' % post.author_id,
+                'company': COMPANIES[post.author_id % 2 + 1],
+            },
+            'editor': {'name': 'User 9'},
+            'reviewers': [{'id': i} for i in post.reviewer_ids],
+        } for post in self.posts]
+
+    def assertBatched(self):
+        # one call per loader, however many posts there are
+        self.assertEqual(self.load_users.calls, [[0, 1, 2, 5, 9]])
+        self.assertEqual(self.load_companies.calls, [[1, 2]])
+
+    def test_render_serializable(self):
+        rendered = self.resource._render_serializable(
+                iter(self.posts), DefaultContext())
+        self.assertEqual(rendered, self.expected())
+        self.assertBatched()
+
+    def test_compiled_json(self):
+        chunks = []
+        resource_encoder(self.resource).write(self.posts, DefaultContext(),
+                chunks.append, PaleDefaultJSONEncoder())
+        self.assertEqual(json.loads(''.join(chunks)), self.expected())
+        self.assertBatched()
+
+    def test_streamed_chunks_are_batched(self):
+        chunks = list(resource_encoder(self.resource).iter_chunks(
+                iter(self.posts), DefaultContext(), PaleDefaultJSONEncoder(),
+                items_per_chunk=15))
+        self.assertEqual(json.loads(''.join(chunks)), self.expected())
+        # the first chunk needs users 0-2, 5, and 9, and everything the
+        # second chunk needs was loaded already
+        self.assertEqual(self.load_users.calls, [[0, 1, 2, 5, 9]])
+
+    def test_without_prefetching(self):
+        # a single object loads its nested objects as they're rendered
+        context = DefaultContext()
+        item_resource = self.resource._item_resource
+        rendered = item_resource._render_serializable(self.posts[0], context)
+        self.assertEqual(rendered, self.expected()[0])
+        loaded = sorted(sum(self.load_users.calls, []))
+        self.assertEqual(loaded, [0, 5, 9])
+        # and the context remembers them
+        calls = len(self.load_users.calls)
+        item_resource._render_serializable(self.posts[3], context)
+        self.assertEqual(len(self.load_users.calls), calls)
+
+    def test_load_batch(self):
+        context = DefaultContext()
+        self.assertEqual(load_batch(self.load_users, [1, 1, 42], context),
+                [USERS[1], USERS[1], None])
+        self.assertEqual(load_batch(self.load_users, [42, 2], context),
+                [None, USERS[2]])
+        self.assertEqual(self.load_users.calls, [[1, 42], [2]])
+        self.assertEqual(load_batch(self.load_users, [3], None), [USERS[3]])
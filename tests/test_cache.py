@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from pale import Endpoint, Resource, ResourceList
+from pale.cache import LRUCache, cache_control_ttl
+from pale.compiled_json import resource_encoder
+from pale.context import DefaultContext
+from pale.endpoint import PaleDefaultJSONEncoder
+from pale.fields import (IntegerField, ResourceField, ResourceListField,
+        StringField)
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def test_get_and_set(self):
+        cache = LRUCache()
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('a', 2)
+        self.assertEqual(cache.get('a'), 2)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        cache.delete('a')
+        self.assertIsNone(cache.get('a'))
+        # None means missing, so it isn't stored
+        cache.set('b', None)
+        self.assertEqual(len(cache), 0)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_max_bytes(self):
+        cache = LRUCache(max_bytes=10)
+        cache.set('a', 'aaaa', size=4)
+        cache.set('b', 'bbbb', size=4)
+        self.assertEqual(cache.size_in_bytes, 8)
+        cache.set('c', 'cccc', size=4)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size_in_bytes, 8)
+        # too big to cache at all, and nothing else is evicted for it
+        cache.set('d', 'd' * 11, size=11)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        self.assertEqual((len(cache), cache.size_in_bytes), (0, 0))
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = LRUCache(ttl=10, clock=clock)
+        cache.set('a', 1)
+        cache.set('b', 2, size=3, ttl=60)
+        clock.now += 10
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        clock.now += 50
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.size_in_bytes, 0)
+
+
+class CacheControlTTLTests(unittest.TestCase):
+
+    def test_ttl(self):
+        self.assertEqual(cache_control_ttl('max-age=3'), 3)
+        self.assertEqual(cache_control_ttl('public, max-age=60, s-maxage=30'),
+                30)
+        self.assertEqual(cache_control_ttl('max-age=0'), 0)
+        for uncacheable in (None, '', 'no-cache', 'no-store, max-age=60',
+                            'public'):
+            self.assertIsNone(cache_control_ttl(uncacheable))
+        self.assertIsNone(cache_control_ttl('private, max-age=60'))
+        self.assertEqual(cache_control_ttl('private, max-age=60',
+                                           private=True), 60)
+
+
+class Author(object):
+    renders = 0
+
+    def __init__(self, key, version=1):
+        self.key = key
+        self.version = version
+
+    def rendered_name(self):
+        Author.renders += 1
+        return 'author %d' % self.key
+
+
+class Article(object):
+    def __init__(self, key, author, version=1):
+        self.key = key
+        self.version = version
+        self.title = 'article %d' % key
+        self.author = author
+        self.coauthors = [author]
+
+
+class AuthorResource(Resource):
+    _value_type = 'Test author resource'
+
+    key = IntegerField("The key")
+    name = StringField("The name", property_name='rendered_name')
+
+    def _cache_key(self, author):
+        return (author.key, author.version)
+
+
+class ArticleResource(Resource):
+    _value_type = 'Test article resource'
+    _default_fields = ('title', 'author')
+
+    title = StringField("The title")
+    author = ResourceField("The author", resource_type=AuthorResource)
+    coauthors = ResourceListField("The coauthors",
+            resource_type=AuthorResource)
+
+    def _cache_key(self, article):
+        return (article.key, article.version)
+
+
+class FragmentCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        Author.renders = 0
+        self.cache = LRUCache()
+        ArticleResource._fragment_cache = self.cache
+        AuthorResource._fragment_cache = self.cache
+
+    def tearDown(self):
+        ArticleResource._fragment_cache = None
+        AuthorResource._fragment_cache = None
+
+    def render(self, resource, obj):
+        return resource._renderer()(obj, DefaultContext())
+
+    def test_reused_across_requests(self):
+        resource = ArticleResource()
+        article = Article(1, Author(1))
+        expected = {'title': 'article 1',
+                    'author': {'key': 1, 'name': 'author 1'}}
+        self.assertEqual(self.render(resource, article), expected)
+        self.assertEqual(self.render(resource, article), expected)
+        # separately loaded copies share the rendering too
+        self.assertEqual(self.render(resource, Article(1, Author(1))),
+                expected)
+        self.assertEqual(Author.renders, 1)
+
+    def test_new_versions_are_rendered(self):
+        resource = ArticleResource()
+        author = Author(1)
+        self.render(resource, Article(1, author))
+        author.version = 2
+        # the article's key didn't change, but its author's did
+        self.render(resource, Article(1, author))
+        self.assertEqual(Author.renders, 2)
+        article = Article(1, author, version=2)
+        article.title = 'edited'
+        self.assertEqual(self.render(resource, article)['title'], 'edited')
+        # the author's own rendering is still cached
+        self.assertEqual(Author.renders, 2)
+
+    def test_selections_are_cached_separately(self):
+        resource = ArticleResource()
+        article = Article(1, Author(1))
+        self.render(resource, article)
+        narrowed = resource._select_fields((('author', (('key', None),)),))
+        self.assertEqual(self.render(narrowed, article),
+                {'author': {'key': 1}})
+        self.assertNotEqual(resource._render_signature(),
+                narrowed._render_signature())
+        self.assertEqual(self.render(resource, article)['author']['name'],
+                'author 1')
+
+    def test_objects_without_keys_are_not_cached(self):
+        resource = ArticleResource()
+        article = Article(1, Author(1))
+        article.coauthors = iter([Author(2)])
+        resource = resource._select_fields((('coauthors', None),))
+        # a generator can't be looked at without consuming it
+        self.assertEqual(self.render(resource, article),
+                {'coauthors': [{'key': 2, 'name': 'author 2'}]})
+        self.assertIsNone(resource._fragment_key(article, None, 'dict'))
+        self.assertEqual(len(self.cache), 1)
+
+    def test_nested_objects_without_keys(self):
+        class KeylessAuthorResource(Resource):
+            _value_type = 'Test keyless author resource'
+            name = StringField("The name", property_name='rendered_name')
+
+        class KeylessArticleResource(ArticleResource):
+            author = ResourceField("The author",
+                    resource_type=KeylessAuthorResource)
+            coauthors = ResourceListField("The coauthors",
+                    resource_type=KeylessAuthorResource)
+
+        KeylessArticleResource._fragment_cache = self.cache
+        self.addCleanup(setattr, KeylessArticleResource, '_fragment_cache',
+                None)
+        author = Author(1)
+        article = Article(1, author)
+        for fields in (None, (('coauthors', None),)):
+            resource = KeylessArticleResource()
+            if fields is not None:
+                resource = resource._select_fields(fields)
+            self.assertIsNone(resource._fragment_key(article, None, 'dict'))
+        resource = KeylessArticleResource()
+        self.render(resource, article)
+        # the article's key didn't change, so only a render that isn't
+        # cached notices the change to its author
+        author.key = 2
+        self.assertEqual(self.render(resource, article)['author']['name'],
+                'author 2')
+        self.assertEqual(len(self.cache), 0)
+
+    def test_json_fragments(self):
+        articles = ResourceList('Articles', ArticleResource)
+        objs = [Article(i, Author(i % 2)) for i in range(4)]
+        encoder = resource_encoder(articles)
+        serializer = PaleDefaultJSONEncoder()
+        for _ in range(2):
+            chunks = []
+            encoder.write(objs, DefaultContext(), chunks.append, serializer)
+            self.assertEqual(json.loads(''.join(chunks)),
+                    [{'title': 'article %d' % i,
+                      'author': {'key': i % 2,
+                                 'name': 'author %d' % (i % 2)}}
+                     for i in range(4)])
+        self.assertEqual(Author.renders, 2)
+
+    def test_finalize_content_gets_a_copy(self):
+        endpoint = ExcitedArticlesEndpoint()
+        author = Author(1)
+        payload = {'articles': [Article(1, author), Article(2, author)]}
+        for _ in range(3):
+            content = json.loads(endpoint._encode_rendered_content(payload,
+                    DefaultContext(), endpoint._returns))
+            self.assertEqual(
+                    [a['author']['name'] for a in content['articles']],
+                    ['author 1!', 'author 1!'])
+        self.assertEqual(Author.renders, 1)
+
+
+class ExcitedArticlesEndpoint(Endpoint):
+    """Modifies what it rendered in `_finalize_content`."""
+    _http_method = "GET"
+    _uri = "/excited"
+    _route_name = "excited"
+    _returns = ResourceList('Articles', ArticleResource)
+
+    def _finalize_content(self, context, content):
+        for article in content['articles']:
+            article['author']['name'] += '!'
+        return content
+
+
+class MemoizedAuthorResource(AuthorResource):
+    _memoize_renders = True
+
+
+class MemoizedArticleResource(ArticleResource):
+    author = ResourceField("The author",
+            resource_type=MemoizedAuthorResource)
+
+
+class RenderMemoTests(unittest.TestCase):
+
+    def test_finalize_content_gets_a_copy(self):
+        endpoint = ExcitedArticlesEndpoint()
+        returns = ResourceList('Articles', MemoizedArticleResource)
+        author = Author(1)
+        Author.renders = 0
+        # the same author appears twice, and is rendered once
+        payload = {'articles': [Article(1, author), Article(2, author)]}
+        content = json.loads(endpoint._encode_rendered_content(payload,
+                DefaultContext(), returns))
+        self.assertEqual([a['author']['name'] for a in content['articles']],
+                ['author 1!', 'author 1!'])
+        self.assertEqual(Author.renders, 1)
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+import datetime
+import json
+import unittest
+from decimal import Decimal
+
+from pale import Endpoint, RawJSON, Resource, ResourceList
+from pale.compiled_json import encode_value, resource_encoder
+from pale.context import DefaultContext
+from pale.endpoint import PaleDefaultJSONEncoder
+from pale.fields import (DecimalField, IntegerField, ListField,
+        ResourceField, ResourceListField, StringField)
+
+from tests.example_app.api.resources import (DateTimeRangeResource,
+        DateTimeResource)
+from tests.example_app.models import DateTimeModel, DateTimeRangeModel
+
+
+class Author(object):
+    def __init__(self, name):
+        self.name = name
+        self.joined = datetime.datetime(2015, 6, 1, 12, 30)
+
+
+class Post(object):
+    def __init__(self, post_id, title, author, tags):
+        self.id = post_id
+        self.title = title
+        self.author = author
+        self.tags = tags
+        self.coauthors = [Author(u'Zoë'), Author('Ann')]
+        self.price = Decimal('3.14159')
+        self.score = 0.5
+
+    def summary(self):
+        return self.title[:5]
+
+
+class AuthorResource(Resource):
+    _value_type = 'Test author resource'
+    _underlying_model = Author
+
+    name = StringField("The author's name")
+    joined = StringField("When the author joined")
+
+
+class PostResource(Resource):
+    _value_type = 'Test post resource'
+    _underlying_model = Post
+
+    id = IntegerField("The post id")
+    title = StringField("The title")
+    summary = StringField("A summary of the post")
+    author = ResourceField("The author", resource_type=AuthorResource)
+    coauthors = ResourceListField("Co-authors",
+            resource_type=AuthorResource)
+    tags = ListField("Tags", item_type=StringField)
+    price = DecimalField("Price", quantize='.01', prefix='$')
+    score = StringField("A float score")
+    shouting = StringField("The title, loudly",
+            value=lambda post: post.title.upper())
+
+
+class CompiledJSONTests(unittest.TestCase):
+
+    def setUp(self):
+        self.serializer = PaleDefaultJSONEncoder()
+        self.context = DefaultContext()
+
+    def encode(self, resource, obj):
+        chunks = []
+        resource_encoder(resource).write(obj, self.context, chunks.append,
+                self.serializer)
+        return ''.join(chunks)
+
+    def assertEncodesLikeRenderer(self, resource, obj):
+        direct = self.encode(resource, obj)
+        rendered = resource._render_serializable(obj, self.context)
+        self.assertEqual(json.loads(direct),
+                json.loads(self.serializer.encode(rendered)))
+        return direct
+
+    def test_encode_value(self):
+        for value in ('hi', u'h\xe9llo "quoted"\n', 12, 12L, 1.5, True,
+                False, None, float('nan'), float('inf'), [1, 'two'],
+                {'a': [None]}, datetime.datetime(2015, 1, 1)):
+            self.assertEqual(encode_value(value, self.serializer),
+                    self.serializer.encode(value))
+
+    def test_scalar_subclasses(self):
+        class Code(int):
+            pass
+        class Markup(unicode):
+            pass
+        class Big(long):
+            pass
+        class Ratio(float):
+            pass
+        for value in (Code(3), Markup(u'<b>\xe9</b>'), Big(2 ** 70),
+                Ratio(0.25)):
+            self.assertEqual(encode_value(value, self.serializer),
+                    self.serializer.encode(value))
+
+        resource = PostResource('A post', fields=('id', 'title'))
+        post = Post(Code(3), Markup(u'Hello'), Author('Bob'), [])
+        self.assertEqual(json.loads(self.encode(resource, post)),
+                {'id': 3, 'title': 'Hello'})
+
+    def test_compiled_resource(self):
+        resource = PostResource('A post', fields=PostResource._all_fields())
+        post = Post(7, 'Hello, world', Author('Bob'), ['a', 'b'])
+        direct = self.assertEncodesLikeRenderer(resource, post)
+        # the keys come out in the order the fields are rendered
+        keys = [k for k in PostResource._all_fields()]
+        positions = [direct.index('"%s": ' % k) for k in keys]
+        self.assertEqual(positions, sorted(positions))
+
+        self.assertEqual(self.encode(resource, None), 'null')
+
+    def test_resource_list(self):
+        resource = ResourceList('Posts', PostResource)
+        posts = [Post(i, 'Post %d' % i, Author('Bob'), []) for i in range(5)]
+        posts.insert(2, None)
+        self.assertEncodesLikeRenderer(resource, posts)
+        self.assertEqual(self.encode(resource, []), '[]')
+
+    def test_expandable_fields(self):
+        class ExpandablePostResource(PostResource):
+            author = ResourceField("The author",
+                    resource_type=AuthorResource,
+                    expandable=True,
+                    stub=lambda post: post.author.name)
+            coauthors = ResourceListField("Co-authors",
+                    resource_type=AuthorResource,
+                    expandable=True)
+
+        resource = ExpandablePostResource('Posts',
+                fields=('id', 'author', 'coauthors'))
+        post = Post(7, 'Hello, world', Author('Bob'), [])
+        self.assertEqual(json.loads(self.encode(resource, post)),
+                {'id': 7, 'author': 'Bob', 'coauthors': None})
+        expanded = resource._expand_fields(
+                (('author', None), ('coauthors', None)))
+        self.assertEqual(
+                json.loads(self.assertEncodesLikeRenderer(expanded, post)),
+                {'id': 7,
+                 'author': {'name': 'Bob', 'joined': '2015-06-01T12:30:00+00:00'},
+                 'coauthors': [
+                     {'name': u'Zo\xeb', 'joined': '2015-06-01T12:30:00+00:00'},
+                     {'name': 'Ann', 'joined': '2015-06-01T12:30:00+00:00'}]})
+
+    def test_raw_json(self):
+        resource = PostResource('A post',
+                fields=('id', 'title', 'author', 'coauthors'))
+        post = Post(7, RawJSON('"raw title"'), RawJSON('{"name":"Raw"}'),
+                [])
+        post.coauthors = RawJSON('[{"name":"Ann"}]')
+        expected = {'id': 7, 'title': 'raw title', 'author': {'name': 'Raw'},
+                    'coauthors': [{'name': 'Ann'}]}
+        direct = self.assertEncodesLikeRenderer(resource, post)
+        self.assertEqual(json.loads(direct), expected)
+        self.assertIn('{"name":"Raw"}', direct)
+
+        # an object that's already rendered is passed through
+        self.assertEqual(self.encode(resource, RawJSON('{"id": 1}')),
+                '{"id": 1}')
+        posts = ResourceList('Posts', PostResource)
+        self.assertEqual(self.encode(posts, RawJSON('[]')), '[]')
+        self.assertEqual(self.encode(posts, [RawJSON('{"id": 1}')]),
+                '[{"id": 1}]')
+
+    def test_overridden_render_serializable(self):
+        # DateTimeResource adds keys in its own _render_serializable, so it
+        # can't be compiled, but it can still be nested in a compiled one.
+        self.assertFalse(resource_encoder(DateTimeResource()).compiled)
+        self.assertTrue(resource_encoder(DateTimeRangeResource()).compiled)
+        time_range = DateTimeRangeModel(60 * 1000 * 1000)
+        self.assertEncodesLikeRenderer(DateTimeRangeResource(), time_range)
+
+    def test_endpoint_direct_json(self):
+        class DirectEndpoint(Endpoint):
+            _http_method = 'GET'
+            _uri = '/posts'
+            _route_name = 'direct_posts'
+            _direct_json = True
+            _returns = ResourceList('Posts', PostResource)
+
+        endpoint = DirectEndpoint()
+        self.assertTrue(endpoint._renders_direct_json())
+        posts = {'posts': [Post(1, 'One', Author('Al'), ['x'])]}
+        direct = endpoint._encode_direct_json(posts, self.context,
+                endpoint._returns)
+        rendered = endpoint._encode_rendered_content(posts, self.context,
+                endpoint._returns)
+        self.assertEqual(json.loads(direct), json.loads(rendered))
+
+        DirectEndpoint._finalize_content = lambda self, ctx, content: content
+        self.assertFalse(endpoint._renders_direct_json())
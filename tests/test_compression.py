@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import gzip
+import unittest
+import zlib
+from StringIO import StringIO
+
+from pale.compression import choose_encoding, compress, compress_chunks
+
+
+def gunzip(data):
+    return gzip.GzipFile(fileobj=StringIO(data)).read()
+
+
+class CompressionTests(unittest.TestCase):
+
+    def test_choose_encoding(self):
+        self.assertIsNone(choose_encoding(None))
+        self.assertIsNone(choose_encoding(''))
+        self.assertIsNone(choose_encoding('identity'))
+        self.assertEqual(choose_encoding('gzip'), 'gzip')
+        self.assertEqual(choose_encoding('deflate, gzip'), 'gzip')
+        self.assertEqual(choose_encoding('gzip;q=0.5, deflate'), 'deflate')
+        self.assertEqual(choose_encoding('x-gzip'), 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0, deflate;q=0'))
+        self.assertIsNone(choose_encoding('*;q=0'))
+        self.assertIn(choose_encoding('*'), ('br', 'gzip'))
+        self.assertEqual(choose_encoding('*, br;q=0'), 'gzip')
+        self.assertEqual(choose_encoding('gzip;q=nope, deflate'), 'deflate')
+
+    def test_compress(self):
+        body = '{"days": [%s]}' % ', '.join(['{"year": 2015}'] * 100)
+        self.assertEqual(gunzip(compress(body, 'gzip')), body)
+        self.assertEqual(zlib.decompress(compress(body, 'deflate')), body)
+        self.assertLess(len(compress(body, 'gzip')), len(body) / 10)
+        self.assertEqual(gunzip(compress(u'{"name": "☃"}', 'gzip')),
+                '{"name": "\xe2\x98\x83"}')
+
+    def test_compress_chunks(self):
+        chunks = ['[', '{"year": 2015}', ', {"year": 2016}', ']']
+        for encoding, decompress in (('gzip', gunzip),
+                                     ('deflate', zlib.decompress)):
+            compressed = list(compress_chunks(iter(chunks), encoding))
+            self.assertEqual(decompress(''.join(compressed)), ''.join(chunks))
+            # every chunk is flushed, so it can be decoded on arrival
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS
+                    if encoding == 'gzip' else zlib.MAX_WBITS)
+            self.assertEqual(decompressor.decompress(compressed[0]), '[')
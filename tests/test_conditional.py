@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import datetime
+import unittest
+
+from dateutil import tz
+
+from pale.conditional import (body_etag, etag_matches, http_date,
+        is_not_modified, not_modified_since, quote_etag)
+
+
+class ConditionalTests(unittest.TestCase):
+
+    def test_etags(self):
+        self.assertEqual(quote_etag('v1'), '"v1"')
+        self.assertEqual(quote_etag('"v1"'), '"v1"')
+        self.assertEqual(quote_etag('W/"v1"'), 'W/"v1"')
+        self.assertEqual(body_etag(u'{"a": 1}'), body_etag('{"a": 1}'))
+        self.assertNotEqual(body_etag('{"a": 1}'), body_etag('{"a": 2}'))
+
+        self.assertTrue(etag_matches('"v1"', '"v1"'))
+        self.assertTrue(etag_matches('"v0", W/"v1"', '"v1"'))
+        self.assertTrue(etag_matches('*', '"v1"'))
+        self.assertFalse(etag_matches('"v0"', '"v1"'))
+        self.assertFalse(etag_matches('"v1"', None))
+        self.assertFalse(etag_matches(None, '"v1"'))
+
+    def test_dates(self):
+        modified = datetime.datetime(2015, 6, 1, 12, 30, 15, 500)
+        self.assertEqual(http_date(modified),
+                'Mon, 01 Jun 2015 12:30:15 GMT')
+        aware = datetime.datetime(2015, 6, 1, 14, 30, 15,
+                tzinfo=tz.tzoffset(None, 7200))
+        self.assertEqual(http_date(aware), 'Mon, 01 Jun 2015 12:30:15 GMT')
+
+        # HTTP dates have whole seconds, so the microseconds don't count
+        self.assertTrue(not_modified_since(
+            'Mon, 01 Jun 2015 12:30:15 GMT', modified))
+        self.assertTrue(not_modified_since(
+            'Tue, 02 Jun 2015 00:00:00 GMT', modified))
+        self.assertFalse(not_modified_since(
+            'Mon, 01 Jun 2015 12:30:14 GMT', modified))
+        self.assertFalse(not_modified_since('yesterday', modified))
+        self.assertFalse(not_modified_since(None, modified))
+
+    def test_is_not_modified(self):
+        modified = datetime.datetime(2015, 6, 1)
+        since = 'Tue, 02 Jun 2015 00:00:00 GMT'
+        self.assertTrue(is_not_modified({'If-None-Match': '"v1"'}, '"v1"',
+                                        None))
+        self.assertTrue(is_not_modified({'If-Modified-Since': since}, None,
+                                        modified))
+        self.assertFalse(is_not_modified(
+            {'If-None-Match': '"v0"', 'If-Modified-Since': since},
+            '"v1"', modified))
+        self.assertFalse(is_not_modified({}, '"v1"', modified))
+        self.assertFalse(is_not_modified(None, '"v1"', modified))
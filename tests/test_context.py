@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+import flask
+import webapp2
+
+from pale.adapters.flask import DefaultFlaskContext
+from pale.adapters.webapp2 import DefaultWebapp2Context
+from pale.context import _UNLOADED, DefaultContext
+
+
+class DefaultContextTests(unittest.TestCase):
+
+    def test_attributes(self):
+        context = DefaultContext()
+        self.assertIsNone(context.headers)
+        self.assertIsNone(context._raw_args)
+        context._raw_args = {'a': ['1']}
+        self.assertEqual(context._raw_args, {'a': ['1']})
+        # anything else can still be kept on a context
+        context.anything = 'else'
+        self.assertEqual(context.anything, 'else')
+
+    def test_state(self):
+        context, other = DefaultContext(), DefaultContext()
+        context.state.user_id = 1
+        self.assertIs(context.state, context.state)
+        self.assertFalse(hasattr(other.state, 'user_id'))
+
+    def test_json_body(self):
+        context = DefaultContext()
+        context.body = '{"a": [1]}'
+        self.assertEqual(context.json_body, {'a': [1]})
+        self.assertIs(context.json_body, context.json_body)
+        context = DefaultContext()
+        context.body = 'nope'
+        with self.assertRaises(ValueError):
+            context.json_body
+
+
+class FlaskContextTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+
+    def test_loaded_when_read(self):
+        with self.app.test_request_context('/?a=1&a=2&b=3',
+                headers={'Cookie': 'c=4'}):
+            context = DefaultFlaskContext(None, flask.request)
+            self.assertIs(context._headers, _UNLOADED)
+            self.assertIs(context._cookies, _UNLOADED)
+            self.assertIs(context._body, _UNLOADED)
+
+            raw_args = context._raw_args
+            self.assertEqual(raw_args.get('a'), ['1', '2'])
+            self.assertIsNone(raw_args.get('missing'))
+            self.assertIs(context._body, _UNLOADED)
+            self.assertIs(context._cookies, _UNLOADED)
+
+            self.assertEqual(context.cookies['c'], '4')
+            self.assertEqual(dict(raw_args), {'a': ['1', '2'], 'b': ['3']})
+
+    def test_overridden_build_args(self):
+        class ApiKeyContext(DefaultFlaskContext):
+            def build_args_from_request(self, request):
+                args = super(ApiKeyContext, self).build_args_from_request(
+                        request)
+                args['api_key'] = request.headers.get('X-Api-Key')
+                return args
+
+        with self.app.test_request_context('/?a=1',
+                headers={'X-Api-Key': 'secret'}):
+            context = ApiKeyContext(None, flask.request)
+            # the argument isn't something `_lookup_arg` knows about
+            self.assertEqual(context._raw_args.get('api_key'), 'secret')
+            self.assertEqual(context._raw_args.get('a'), ['1'])
+            self.assertEqual(dict(context._raw_args),
+                    {'a': ['1'], 'api_key': 'secret'})
+
+    def test_json_arguments(self):
+        with self.app.test_request_context('/?a=1&b=2', method='POST',
+                data=json.dumps({'a': 'json'}),
+                content_type='application/json'):
+            context = DefaultFlaskContext(None, flask.request)
+            self.assertEqual(context._raw_args.get('a'), 'json')
+            self.assertEqual(context._raw_args.get('b'), ['2'])
+            self.assertEqual(dict(context._raw_args),
+                    {'a': 'json', 'b': ['2']})
+
+
+class Webapp2ContextTests(unittest.TestCase):
+
+    def request(self, *args, **kwargs):
+        request = webapp2.Request.blank(*args, **kwargs)
+        request.route_args = ()
+        request.route_kwargs = {'c': 'route'}
+        return request
+
+    def test_arguments(self):
+        request = self.request('/?a=1&a=2&c=3', POST=json.dumps({'b': 4}),
+                content_type='application/json')
+        context = DefaultWebapp2Context(None, request)
+        self.assertIs(context._body, _UNLOADED)
+        raw_args = context._raw_args
+        self.assertEqual(raw_args.get('a'), ['1', '2'])
+        self.assertEqual(raw_args.get('b'), 4)
+        self.assertEqual(raw_args.get('c'), 'route')
+        self.assertEqual(dict(raw_args),
+                {'a': ['1', '2'], 'b': 4, 'c': 'route'})
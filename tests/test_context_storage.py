@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import unittest
+
+from webob import Request, Response
+
+from pale import Endpoint, config
+from pale import endpoint as pale_endpoint
+from pale.arguments import StringArgument
+from pale.context import DefaultContext
+from pale.context_storage import (available_context_storages,
+        get_context_storage, STORAGES, ThreadLocalStorage)
+from pale.endpoint import get_current_context, set_current_context
+from pale.resource import DebugResource
+
+try:
+    import greenlet
+except ImportError:
+    greenlet = None
+
+
+class YieldingEndpoint(Endpoint):
+    """Lets the other requests run in the middle of every request, like a
+    handler waiting on I/O under gevent would."""
+    _http_method = "GET"
+    _uri = "/yield"
+    _route_name = "yield"
+
+    _returns = DebugResource("The request's name.")
+
+    name = StringArgument("The request's name.", required=True)
+
+    def _handle(self, context):
+        greenlet.getcurrent().parent.switch()
+        return {'name': context.args['name'],
+                'current': get_current_context().args['name']}
+
+
+def create_context(endpoint, request):
+    context = DefaultContext()
+    context.request = request
+    context._raw_args = request.GET.dict_of_lists()
+    return context
+
+
+class ContextStorageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.creator = config.create_context
+        self.authenticator = config.authenticate_context
+        config.create_context = create_context
+        config.authenticate_context = lambda context: context
+
+    def tearDown(self):
+        config.create_context = self.creator
+        config.authenticate_context = self.authenticator
+        config.set_context_storage('thread')
+
+    def test_unknown_storage(self):
+        with self.assertRaises(ValueError):
+            get_context_storage('process')
+
+    def test_missing_storage_falls_back(self):
+        for storage in ('greenlet', 'contextvars'):
+            if storage not in available_context_storages():
+                self.assertIsInstance(get_context_storage(storage),
+                        ThreadLocalStorage)
+
+    def test_set_context_storage(self):
+        for storage in available_context_storages():
+            config.set_context_storage(storage)
+            self.assertIsInstance(pale_endpoint._context_storage,
+                    dict(STORAGES)[storage])
+            context = DefaultContext()
+            set_current_context(context)
+            self.assertIs(get_current_context(), context)
+            self.assertIs(pale_endpoint._context_storage.get(), context)
+
+    def test_thread_storage(self):
+        storage = get_context_storage('thread')
+        main_context = DefaultContext()
+        storage.set(main_context)
+        errors = []
+        def run():
+            try:
+                storage.get()
+            except AttributeError as e:
+                errors.append(e)
+            storage.set(DefaultContext())
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        # a thread that hasn't set a context doesn't have one
+        self.assertEqual(len(errors), 1)
+        self.assertIs(storage.get(), main_context)
+
+    @unittest.skipIf(greenlet is None, "greenlet isn't installed")
+    def test_greenlet_storage(self):
+        storage = get_context_storage('greenlet')
+        main_context = DefaultContext()
+        storage.set(main_context)
+        def run():
+            with self.assertRaises(AttributeError):
+                storage.get()
+            storage.set(DefaultContext())
+            return storage.get()
+        child_context = greenlet.greenlet(run).switch()
+        self.assertIsNot(child_context, main_context)
+        self.assertIs(storage.get(), main_context)
+
+    @unittest.skipIf(greenlet is None, "greenlet isn't installed")
+    def test_cooperative_requests(self):
+        config.set_context_storage('greenlet')
+        endpoint = YieldingEndpoint()
+        endpoint._set_response_class(Response)
+
+        responses = {}
+        def handle(name):
+            request = Request.blank('/yield?name=' + name)
+            response = endpoint._execute(request)
+            responses[name] = json.loads(response.body)
+
+        # every request is started before any of them finishes, so they're
+        # all in progress on the same thread at once
+        names = ['request%d' % i for i in xrange(200)]
+        workers = [greenlet.greenlet(handle) for _ in names]
+        for worker, name in zip(workers, names):
+            worker.switch(name)
+        while not all(worker.dead for worker in workers):
+            for worker in workers:
+                if not worker.dead:
+                    worker.switch()
+
+        self.assertEqual(len(responses), len(names))
+        for name in names:
+            self.assertEqual(responses[name],
+                    {'name': name, 'current': name})
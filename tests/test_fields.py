@@ -3,7 +3,7 @@ import unittest
 from collections import namedtuple
 from decimal import Decimal
 
-from pale import Resource
+from pale import Resource, ResourceList
 from pale.fields import (BaseField, IntegerField, ListField, ResourceField,
         ResourceListField, StringField, DecimalField)
 
@@ -193,3 +193,283 @@ class FieldsTests(unittest.TestCase):
                 "Why does this Resource have another Resource?")
         self.assertEqual(field.resource_type, Resource)
         self.assertEqual(field.subfields, None)
+
+
+class Owner(object):
+    name = 'owner'
+
+
+class Widget(object):
+    def __init__(self):
+        self.name = 'widget'
+        self.cost = '2.499'
+        self.count = 3
+        self.owner = Owner()
+
+    def label(self):
+        return self.name.upper()
+
+
+class ShoutingField(StringField):
+    def render(self, obj, name, context):
+        return super(ShoutingField, self).render(obj, name, context) + '!'
+
+
+class OwnerResource(Resource):
+    _value_type = 'Test owner resource'
+
+    name = StringField("The name")
+
+
+class WidgetResource(Resource):
+    _value_type = 'Test widget resource'
+
+    name = StringField("The name")
+    label = StringField("A method on the model")
+    title = StringField("The name, again", property_name='name')
+    double = IntegerField("Twice the count", value=lambda w: 2 * w.count)
+    cost = DecimalField("The cost", quantize='.01', prefix='$')
+    raw_cost = DecimalField("The cost, unrounded", property_name='cost')
+    missing = StringField("Not on the model")
+    loud = ShoutingField("The name, overridden", property_name='name')
+    owner = ResourceField("The owner", resource_type=OwnerResource)
+
+
+class CompiledRenderTests(unittest.TestCase):
+
+    def test_compiled_render_matches_render(self):
+        widget = Widget()
+        as_dict = {'name': 'widget', 'label': lambda: 'WIDGET',
+                   'cost': 1.5, 'count': 2, 'owner': {'name': 'dict'}}
+        for name, field in WidgetResource._fields.items():
+            if name == 'double':
+                # the lambda expects a Widget
+                objs = [widget]
+            else:
+                objs = [widget, as_dict]
+            for obj in objs:
+                compiled = field._compile_render(name, isinstance(obj, dict))
+                self.assertEqual(compiled(obj, None),
+                        field.render(obj, name, None),
+                        "%s rendered differently for %r" % (name, obj))
+
+
+    def test_resource_render_plan(self):
+        resource = WidgetResource()
+        rendered = resource._render_serializable(Widget(), None)
+        self.assertEqual(rendered, {
+            'name': 'widget',
+            'label': 'WIDGET',
+            'title': 'widget',
+            'double': 6,
+            'cost': '$2.50',
+            'raw_cost': '2.499',
+            'missing': None,
+            'loud': 'widget!',
+            'owner': {'name': 'owner'},
+        })
+        self.assertIsNone(resource._render_serializable(None, None))
+
+        # replacing the fields to render recompiles the plan
+        resource._fields_to_render = ('name', 'loud')
+        self.assertEqual(resource._render_serializable(Widget(), None),
+                {'name': 'widget', 'loud': 'widget!'})
+        self.assertEqual(
+                resource._render_serializable({'name': 'dict'}, None),
+                {'name': 'dict', 'loud': 'dict!'})
+
+
+    def test_select_fields(self):
+        resource = WidgetResource()
+        selection = (('name', None), ('owner', (('name', None),)))
+        narrowed = resource._select_fields(selection)
+        self.assertEqual(narrowed._render_serializable(Widget(), None),
+                {'name': 'widget', 'owner': {'name': 'owner'}})
+        # narrowed copies are cached, and don't touch the original
+        self.assertIs(resource._select_fields(selection), narrowed)
+        self.assertIsNot(narrowed._fields['owner'],
+                resource._fields['owner'])
+        self.assertEqual(len(resource._render_serializable(Widget(), None)),
+                len(WidgetResource._default_fields))
+
+        with self.assertRaises(ValueError):
+            resource._select_fields((('nope', None),))
+        with self.assertRaises(ValueError):
+            resource._select_fields((('name', (('upper', None),)),))
+
+        widgets = ResourceList('Some widgets', WidgetResource)
+        narrowed = widgets._select_fields((('double', None),))
+        self.assertEqual(narrowed._render_serializable([Widget()], None),
+                [{'double': 6}])
+        self.assertEqual(len(widgets._render_serializable([Widget()],
+            None)[0]), len(WidgetResource._default_fields))
+
+
+    def test_selection_cache_is_bounded(self):
+        resource = WidgetResource()
+        resource._max_cached_selections = 2
+        for name in ('name', 'label', 'title'):
+            resource._select_fields(((name, None),))
+        self.assertLessEqual(len(resource._selection_cache), 2)
+
+
+class Post(object):
+    def __init__(self):
+        self.title = 'A post'
+        self.author_id = 7
+        self.fetches = 0
+
+    @property
+    def author(self):
+        self.fetches += 1
+        return Owner()
+
+    @property
+    def widgets(self):
+        self.fetches += 1
+        return [Widget(), Widget()]
+
+
+class PostResource(Resource):
+    _value_type = 'Test post resource'
+
+    title = StringField("The title")
+    author = ResourceField("The author",
+            resource_type=OwnerResource,
+            expandable=True,
+            stub=lambda post: {'id': post.author_id})
+    widgets = ResourceListField("The widgets",
+            resource_type=WidgetResource,
+            subfields=('name', 'owner'),
+            expandable=True)
+
+
+class ExpandTests(unittest.TestCase):
+
+    def test_unexpanded_fields_render_stubs(self):
+        post = Post()
+        self.assertEqual(PostResource()._render_serializable(post, None),
+                {'title': 'A post', 'author': {'id': 7}, 'widgets': None})
+        self.assertEqual(post.fetches, 0)
+        self.assertTrue(PostResource.author.doc_dict()['expandable'])
+
+
+    def test_expand_fields(self):
+        resource = PostResource()
+        expanded = resource._expand_fields((('author', None),))
+        self.assertIs(resource._expand_fields((('author', None),)), expanded)
+        post = Post()
+        self.assertEqual(expanded._render_serializable(post, None),
+                {'title': 'A post', 'author': {'name': 'owner'},
+                 'widgets': None})
+        self.assertEqual(post.fetches, 1)
+        # the original resource is untouched
+        self.assertEqual(resource._render_serializable(post, None)['author'],
+                {'id': 7})
+
+        expanded = resource._expand_fields(
+                (('widgets', (('owner', None),)),))
+        widgets = expanded._render_serializable(post, None)['widgets']
+        self.assertEqual(widgets, [{'name': 'widget',
+                                    'owner': {'name': 'owner'}}] * 2)
+
+        with self.assertRaises(ValueError):
+            resource._expand_fields((('title', None),))
+        with self.assertRaises(ValueError):
+            resource._expand_fields((('nope', None),))
+
+        # selections and expansions combine
+        narrowed = resource._select_fields((('author', None),))
+        self.assertEqual(narrowed._expand_fields((('author', None),))
+                ._render_serializable(Post(), None),
+                {'author': {'name': 'owner'}})
+
+
+class Commenter(object):
+    renders = 0
+
+    def __init__(self, key):
+        self.key = key
+
+    def rendered_name(self):
+        Commenter.renders += 1
+        return 'commenter %d' % self.key
+
+
+class CommenterResource(Resource):
+    _value_type = 'Test commenter resource'
+    _memoize_renders = True
+
+    key = IntegerField("The key")
+    name = StringField("The name", property_name='rendered_name')
+
+    def _cache_key(self, commenter):
+        return commenter.key
+
+
+class Comment(object):
+    def __init__(self, commenter):
+        self.commenter = commenter
+
+
+class CommentResource(Resource):
+    _value_type = 'Test comment resource'
+
+    commenter = ResourceField("The commenter",
+            resource_type=CommenterResource)
+
+
+class RenderMemoTests(unittest.TestCase):
+
+    def setUp(self):
+        Commenter.renders = 0
+        # two copies of the first commenter, as if they were loaded twice
+        self.comments = [Comment(Commenter(i % 2)) for i in range(10)]
+        self.expected = [{'commenter': {'key': i % 2,
+                                        'name': 'commenter %d' % (i % 2)}}
+                         for i in range(10)]
+
+    def test_repeated_objects_render_once(self):
+        from pale.context import DefaultContext
+        comments = ResourceList('Comments', CommentResource)
+        self.assertEqual(comments._render_serializable(self.comments,
+            DefaultContext()), self.expected)
+        self.assertEqual(Commenter.renders, 2)
+
+        # the memo belongs to the request
+        comments._render_serializable(self.comments, DefaultContext())
+        self.assertEqual(Commenter.renders, 4)
+
+        # and there's nowhere to keep it without a context
+        comments._render_serializable(self.comments, None)
+        self.assertEqual(Commenter.renders, 14)
+
+    def test_repeated_objects_encode_once(self):
+        import json
+        from pale.compiled_json import resource_encoder
+        from pale.context import DefaultContext
+        from pale.serializers import PaleDefaultJSONEncoder
+        comments = ResourceList('Comments', CommentResource)
+        chunks = []
+        resource_encoder(comments).write(self.comments, DefaultContext(),
+                chunks.append, PaleDefaultJSONEncoder())
+        self.assertEqual(json.loads(''.join(chunks)), self.expected)
+        self.assertEqual(Commenter.renders, 2)
+
+    def test_memo_is_per_resource(self):
+        from pale.context import DefaultContext
+        context = DefaultContext()
+        resource = CommenterResource()
+        narrowed = resource._select_fields((('name', None),))
+        commenter = Commenter(1)
+        render = resource._renderer()
+        self.assertEqual(render(commenter, context),
+                {'key': 1, 'name': 'commenter 1'})
+        self.assertIs(render(commenter, context),
+                render(Commenter(1), context))
+        self.assertEqual(narrowed._renderer()(commenter, context),
+                {'name': 'commenter 1'})
+        self.assertEqual(Commenter.renders, 2)
+        # resources that don't memoize render every time
+        widgets = WidgetResource()
+        self.assertEqual(widgets._renderer(), widgets._render_serializable)
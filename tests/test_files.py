@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from pale.files import FileBody, UNSATISFIABLE, file_etag, parse_range
+
+
+class ParseRangeTests(unittest.TestCase):
+
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=90-200', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-200', 100), (0, 99))
+
+    def test_unsatisfiable_ranges(self):
+        self.assertIs(parse_range('bytes=100-', 100), UNSATISFIABLE)
+        self.assertIs(parse_range('bytes=-0', 100), UNSATISFIABLE)
+        for header in ('bytes=-10', 'bytes=0-', 'bytes=0-9'):
+            self.assertIs(parse_range(header, 0), UNSATISFIABLE, header)
+
+    def test_ignored_ranges(self):
+        for header in (None, '', 'bytes=5-1', 'bytes=a-b', 'items=0-1',
+                       'bytes=0-1,5-6', 'bytes=5'):
+            self.assertIsNone(parse_range(header, 100), header)
+
+
+class FileBodyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'data.bin')
+        self.data = ''.join(chr(i % 256) for i in xrange(1000))
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_path(self):
+        body = FileBody(self.path, block_size=64)
+        self.assertEqual(body.size, 1000)
+        self.assertEqual(body.name, self.path)
+        self.assertIsNotNone(body.mtime)
+        self.assertEqual(''.join(body.iter_range(0, None)), self.data)
+        self.assertTrue(body.file.closed)
+
+        body = FileBody(self.path, block_size=64)
+        self.assertEqual(''.join(body.iter_range(100, 250)),
+                self.data[100:350])
+        self.assertEqual(file_etag(body.size, body.mtime),
+                file_etag(1000, os.stat(self.path).st_mtime))
+
+    def test_file_like_objects(self):
+        body = FileBody(StringIO(self.data))
+        self.assertEqual(body.size, 1000)
+        self.assertIsNone(body.mtime)
+        self.assertIsNone(body.name)
+        self.assertEqual(''.join(body.iter_range(990, 10)), self.data[990:])
+
+    def test_file_wrapper(self):
+        wrapped = []
+        def file_wrapper(f, block_size):
+            wrapped.append(f)
+            return iter(lambda: f.read(block_size), '')
+        environ = {'wsgi.file_wrapper': file_wrapper}
+
+        body = FileBody(open(self.path, 'rb'))
+        self.assertEqual(''.join(body.wsgi_body(environ)), self.data)
+        self.assertEqual(wrapped, [body.file])
+
+        # ranges are read by Pale
+        body = FileBody(self.path)
+        self.assertEqual(''.join(body.wsgi_body(environ, 10, 5)),
+                self.data[10:15])
+        self.assertEqual(len(wrapped), 1)
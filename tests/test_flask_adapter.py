@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 import datetime
+import json
 import unittest
 
+from webob import Request
 from webtest import TestApp, AppError
 
+from pale.conditional import body_etag
+
 from tests.example_app.api.resources import DateTimeResource
 
 
@@ -129,6 +133,409 @@ class FlaskAdapterTests(unittest.TestCase):
         expected_fields = DateTimeResource._all_fields()
         self.assertExpectedFields(end, expected_fields)
 
+    def test_selecting_fields(self):
+        test_duration = 60 * 1000
+        resp = self.app.get('/api/time/range', {'duration': test_duration,
+            'fields': 'duration_microseconds,end.year,end.day'})
+        self.assertEqual(resp.status_code, 200)
+        returned_range = resp.json_body['range']
+        self.assertExpectedFields(returned_range,
+                ('duration_microseconds', 'end'))
+        self.assertExpectedFields(returned_range['end'], ('year', 'day'))
+
+        # a nested resource named on its own keeps its fields
+        resp = self.app.get('/api/time/range', {'duration': test_duration,
+            'fields': 'start'})
+        self.assertExpectedFields(resp.json_body['range']['start'],
+                DateTimeResource._default_fields)
+
+        # unknown fields, and nested fields of plain values, are rejected
+        # before the handler runs
+        for fields in ('start,nope', 'end.nope', 'duration_microseconds.x',
+                       'start..year'):
+            resp = self.app.get('/api/time/range',
+                    {'duration': test_duration, 'fields': fields},
+                    status=422)
+            self.assertIn('fields', resp.json_body['error'])
+
+
+    def test_cached_response(self):
+        from tests.example_app.api.endpoints import CachedTimeEndpoint
+        CachedTimeEndpoint._response_cache.clear()
+
+        first = self.app.get('/api/time/cached', {'name': 'first'})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers['Cache-Control'], 'max-age=60')
+        self.assertEqual(first.json_body['time']['name'], 'first')
+
+        # the handler doesn't run again for the same arguments
+        again = self.app.get('/api/time/cached', {'name': 'first'})
+        self.assertEqual(again.body, first.body)
+        self.assertEqual(again.content_type, 'application/json')
+        self.assertEqual(again.headers['Cache-Control'], 'max-age=60')
+
+        # but other arguments get their own response
+        other = self.app.get('/api/time/cached', {'name': 'other'})
+        self.assertEqual(other.json_body['time']['name'], 'other')
+        self.assertEqual(len(CachedTimeEndpoint._response_cache), 2)
+
+        # invalid arguments aren't cached
+        self.app.get('/api/time/cached', {'name': ['a', 'b']}, status=422)
+        self.assertEqual(len(CachedTimeEndpoint._response_cache), 2)
+
+
+    def test_uncacheable_responses(self):
+        from tests.example_app.api.endpoints import CachedTimeEndpoint
+        CachedTimeEndpoint._response_cache.clear()
+        handle = CachedTimeEndpoint.__dict__['_handle']
+        for headers in ([('Set-Cookie', 'session=abc')],
+                        [('Cache-Control', 'private, max-age=60')],
+                        [('Cache-Control', 'no-store')]):
+            CachedTimeEndpoint._handle = lambda self, context: (
+                    handle(self, context), 200, headers)
+            try:
+                resp = self.app.get('/api/time/cached')
+            finally:
+                CachedTimeEndpoint._handle = handle
+            for name, value in headers:
+                self.assertEqual(resp.headers[name], value)
+            self.assertEqual(len(CachedTimeEndpoint._response_cache), 0)
+        # so the next client doesn't get the first one's cookie
+        resp = self.app.get('/api/time/cached')
+        self.assertNotIn('Set-Cookie', resp.headers)
+
+
+    def test_etag(self):
+        self.app.post('/api/resource/reset')
+        resp = self.app.get('/api/resource')
+        etag = resp.headers['ETag']
+        self.assertEqual(len(etag), 34)
+        self.assertEqual(self.app.get('/api/resource').headers['ETag'], etag)
+
+        for if_none_match in (etag, 'W/' + etag, '"other", ' + etag, '*'):
+            resp = self.app.get('/api/resource',
+                    headers={'If-None-Match': if_none_match}, status=304)
+            self.assertEqual(resp.body, '')
+            self.assertEqual(resp.headers['ETag'], etag)
+            self.assertEqual(resp.headers['Cache-Control'], 'no-cache')
+
+        resp = self.app.get('/api/resource',
+                headers={'If-None-Match': '"other"'})
+        self.assertEqual(resp.json, {'key': 'value'})
+
+
+    def test_handler_supplied_etag(self):
+        resp = self.app.get('/api/time/epoch')
+        self.assertEqual(resp.headers['ETag'], '"epoch-v1"')
+        self.assertEqual(resp.headers['Last-Modified'],
+                'Thu, 01 Jan 1970 00:00:00 GMT')
+        self.assertEqual(resp.json_body['time']['year'], 1970)
+
+        self.app.get('/api/time/epoch',
+                headers={'If-None-Match': '"epoch-v1"'}, status=304)
+        later = 'Fri, 02 Jan 1970 00:00:00 GMT'
+        self.app.get('/api/time/epoch',
+                headers={'If-Modified-Since': later}, status=304)
+        # If-None-Match wins over If-Modified-Since
+        self.app.get('/api/time/epoch',
+                headers={'If-None-Match': '"epoch-v0"',
+                         'If-Modified-Since': later},
+                status=200)
+
+
+    def test_cached_response_etag(self):
+        from tests.example_app.api.endpoints import CachedTimeEndpoint
+        CachedTimeEndpoint._response_cache.clear()
+        etag = self.app.get('/api/time/cached').headers['ETag']
+        resp = self.app.get('/api/time/cached',
+                headers={'If-None-Match': etag}, status=304)
+        self.assertEqual(resp.headers['ETag'], etag)
+        self.assertEqual(resp.headers['Cache-Control'], 'max-age=60')
+
+
+    def test_head_request_no_content(self):
+        from pale.resource import NoContentResource
+        from tests.example_app.api.endpoints import GetResourceEndpoint
+        # an `_etag` endpoint renders its body for HEAD requests, and this
+        # one's is empty
+        returns = GetResourceEndpoint._returns
+        handle = GetResourceEndpoint.__dict__['_handle']
+        GetResourceEndpoint._returns = NoContentResource()
+        GetResourceEndpoint._handle = lambda self, context: None
+        try:
+            resp = self.app.head('/api/resource', status=204)
+        finally:
+            GetResourceEndpoint._returns = returns
+            GetResourceEndpoint._handle = handle
+        self.assertNotIn('Content-Type', resp.headers)
+
+
+    def test_head_request_isnt_cached(self):
+        from tests.example_app.api.endpoints import CachedTimeEndpoint
+        CachedTimeEndpoint._response_cache.clear()
+        # the ETag needs the body, which `_handle_head` doesn't return
+        CachedTimeEndpoint._handle_head = lambda self, context: None
+        try:
+            head = self.app.head('/api/time/cached', {'name': 'head'})
+        finally:
+            del CachedTimeEndpoint._handle_head
+        self.assertNotEqual(head.headers['ETag'], body_etag('null'))
+        self.assertNotEqual(head.headers['Content-Length'], '4')
+        self.assertEqual(len(CachedTimeEndpoint._response_cache), 0)
+
+        resp = self.app.get('/api/time/cached', {'name': 'head'})
+        self.assertEqual(resp.json_body['time']['name'], 'head')
+
+
+    def call_raw(self, url, **headers):
+        """Call the WSGI app directly, since webtest decodes compressed
+        responses."""
+        request = Request.blank(url, headers=headers)
+        status, headers, app_iter = request.call_application(self.app.app)
+        return status, dict(headers), ''.join(app_iter)
+
+
+    def test_compressed_responses(self):
+        import zlib
+        from tests.example_app.api.endpoints import GetResourceEndpoint
+        self.app.post('/api/resource/reset')
+        etag = self.app.get('/api/resource').headers['ETag']
+
+        # small responses aren't worth compressing
+        _, headers, _ = self.call_raw('/api/resource',
+                accept_encoding='gzip')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertNotIn('Vary', headers)
+
+        GetResourceEndpoint._compress_min_size = 0
+        try:
+            status, headers, body = self.call_raw('/api/resource',
+                    accept_encoding='gzip;q=0.5, deflate')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(headers['Content-Encoding'], 'deflate')
+            self.assertEqual(headers['Vary'], 'Accept-Encoding')
+            self.assertEqual(headers['ETag'], 'W/' + etag)
+            self.assertEqual(headers['Content-Type'], 'application/json')
+            self.assertEqual(int(headers['Content-Length']), len(body))
+            self.assertEqual(json.loads(zlib.decompress(body)),
+                    {'key': 'value'})
+            # the weak ETag still matches
+            status, headers, _ = self.call_raw('/api/resource',
+                    accept_encoding='gzip', if_none_match='W/' + etag)
+            self.assertEqual(status, '304 Not Modified')
+            # with the same Vary as the response it validates
+            self.assertEqual(headers['Vary'], 'Accept-Encoding')
+
+            _, headers, _ = self.call_raw('/api/resource')
+            self.assertNotIn('Content-Encoding', headers)
+            self.assertEqual(headers['Vary'], 'Accept-Encoding')
+
+            GetResourceEndpoint._compress = False
+            _, headers, _ = self.call_raw('/api/resource',
+                    accept_encoding='gzip')
+            self.assertNotIn('Content-Encoding', headers)
+        finally:
+            del GetResourceEndpoint._compress_min_size
+            GetResourceEndpoint._compress = True
+
+
+    def test_compressed_stream(self):
+        import zlib
+        request = Request.blank('/api/time/series?days=25',
+                headers={'Accept-Encoding': 'gzip'})
+        status, headers, app_iter = request.call_application(self.app.app)
+        headers = dict(headers)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', headers)
+        chunks = list(app_iter)
+        # 25 days at 10 per chunk, plus the opening key, closing brace and
+        # the gzip trailer
+        self.assertEqual(len(chunks), 6)
+        body = zlib.decompress(''.join(chunks), 16 + zlib.MAX_WBITS)
+        self.assertEqual(len(json.loads(body)['days']), 25)
+
+
+    def test_head_requests(self):
+        from tests.example_app.api.endpoints import EpochEndpoint
+        resp = self.app.head('/api/time/current')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.body, '')
+        self.assertEqual(resp.content_type, 'application/json')
+        self.assertEqual(resp.headers['Cache-Control'], 'no-cache')
+        self.assertEqual(resp.headers['After-Response'], 'OK')
+        self.app.head('/api/time/range', status=422)
+
+        # the ETag of an `_etag` endpoint needs the body, so the body's
+        # length is known too
+        self.app.post('/api/resource/reset')
+        get = self.app.get('/api/resource')
+        resp = self.app.head('/api/resource')
+        self.assertEqual(resp.headers['ETag'], get.headers['ETag'])
+        self.assertEqual(resp.headers['Content-Length'],
+                str(len(get.body)))
+        self.assertEqual(resp.body, '')
+
+        # `_handle_head` is called instead of `_handle`
+        handle = EpochEndpoint.__dict__['_handle']
+        EpochEndpoint._handle = lambda self, context: 1 / 0
+        try:
+            resp = self.app.head('/api/time/epoch')
+            self.assertEqual(resp.headers['ETag'], '"epoch-v1"')
+            self.assertEqual(resp.headers['Last-Modified'],
+                    'Thu, 01 Jan 1970 00:00:00 GMT')
+            self.app.head('/api/time/epoch',
+                    headers={'If-None-Match': '"epoch-v1"'}, status=304)
+        finally:
+            EpochEndpoint._handle = handle
+
+
+    def test_static_endpoint(self):
+        import zlib
+        from tests.example_app.api.endpoints import TimeUnitsEndpoint
+        units = ['year', 'month', 'day', 'hours', 'minutes', 'seconds']
+
+        # the response was rendered when the endpoint was bound
+        handle = TimeUnitsEndpoint.__dict__['_handle']
+        TimeUnitsEndpoint._handle = lambda self, context: 1 / 0
+        try:
+            resp = self.app.get('/api/time/units')
+            self.assertEqual(resp.json, {'units': units})
+            self.assertEqual(resp.content_type, 'application/json')
+            self.assertEqual(resp.headers['Cache-Control'], 'max-age=86400')
+            self.assertEqual(resp.headers['Access-Control-Allow-Origin'],
+                    '*')
+            self.assertEqual(resp.headers['After-Response'], 'OK')
+            etag = resp.headers['ETag']
+
+            self.app.get('/api/time/units',
+                    headers={'If-None-Match': etag}, status=304)
+            resp = self.app.head('/api/time/units')
+            self.assertEqual(resp.body, '')
+            self.assertEqual(resp.headers['ETag'], etag)
+
+            TimeUnitsEndpoint._compress_min_size = 0
+            try:
+                status, headers, body = self.call_raw('/api/time/units',
+                        accept_encoding='gzip')
+                self.assertEqual(headers['Content-Encoding'], 'gzip')
+                self.assertEqual(json.loads(zlib.decompress(body,
+                    16 + zlib.MAX_WBITS)), {'units': units})
+            finally:
+                del TimeUnitsEndpoint._compress_min_size
+        finally:
+            TimeUnitsEndpoint._handle = handle
+
+
+    def test_file_responses(self):
+        from tests.example_app.api.endpoints import ReadmeEndpoint
+        with open(ReadmeEndpoint.path, 'rb') as f:
+            readme = f.read()
+
+        resp = self.app.get('/api/files/readme')
+        self.assertEqual(resp.body, readme)
+        self.assertEqual(resp.headers['Content-Type'],
+                'text/plain; charset=utf-8')
+        self.assertEqual(resp.headers['Content-Length'], str(len(readme)))
+        self.assertEqual(resp.headers['Accept-Ranges'], 'bytes')
+        etag = resp.headers['ETag']
+        last_modified = resp.headers['Last-Modified']
+
+        self.app.get('/api/files/readme',
+                headers={'If-None-Match': etag}, status=304)
+        self.app.get('/api/files/readme',
+                headers={'If-Modified-Since': last_modified}, status=304)
+
+        resp = self.app.head('/api/files/readme')
+        self.assertEqual(resp.body, '')
+        self.assertEqual(resp.headers['Content-Length'], str(len(readme)))
+        self.assertEqual(resp.headers['ETag'], etag)
+
+        # files aren't compressed
+        _, headers, body = self.call_raw('/api/files/readme',
+                accept_encoding='gzip')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(body, readme)
+
+
+    def test_file_ranges(self):
+        size = len(self.app.get('/api/files/readme').body)
+        resp = self.app.get('/api/files/readme',
+                headers={'Range': 'bytes=2-9'}, status=206)
+        full = self.app.get('/api/files/readme').body
+        self.assertEqual(resp.body, full[2:10])
+        self.assertEqual(resp.headers['Content-Range'],
+                'bytes 2-9/%d' % size)
+        self.assertEqual(resp.headers['Content-Length'], '8')
+
+        resp = self.app.get('/api/files/readme',
+                headers={'Range': 'bytes=-5'}, status=206)
+        self.assertEqual(resp.body, full[-5:])
+
+        resp = self.app.get('/api/files/readme',
+                headers={'Range': 'bytes=%d-' % size}, status=416)
+        self.assertEqual(resp.headers['Content-Range'], 'bytes */%d' % size)
+
+        # a stale If-Range gets the whole file
+        resp = self.app.get('/api/files/readme',
+                headers={'Range': 'bytes=2-9', 'If-Range': '"stale"'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.body, full)
+        etag = resp.headers['ETag']
+        self.app.get('/api/files/readme',
+                headers={'Range': 'bytes=2-9', 'If-Range': etag},
+                status=206)
+
+
+    def test_streamed_resource_list(self):
+        resp = self.app.get('/api/time/series', {'days': 25})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content_type, 'application/json')
+
+        days = resp.json_body['days']
+        self.assertEqual(len(days), 25)
+        for day in days:
+            self.assertExpectedFields(day, DateTimeResource._default_fields)
+
+        resp = self.app.get('/api/time/series', {'days': 0})
+        self.assertEqual(resp.json_body, {'days': []})
+
+        # arguments are still validated before anything is streamed
+        self.app.get('/api/time/series', status=422)
+
+        # webtest buffers the body, so check that it's actually streamed
+        # by calling the WSGI app directly.
+        request = Request.blank('/api/time/series?days=25')
+        status, headers, app_iter = request.call_application(self.app.app)
+        self.assertEqual(status, '200 OK')
+        self.assertNotIn('Content-Length', dict(headers))
+        chunks = list(app_iter)
+        # 25 days at 10 per chunk, plus the opening key and closing brace
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(len(json.loads(''.join(chunks))['days']), 25)
+
+
+    def test_json_body_is_parsed_once(self):
+        import pale.context
+        real_json = pale.context.json
+        parsed = []
+        class CountingJSON(object):
+            @staticmethod
+            def loads(body):
+                parsed.append(body)
+                return real_json.loads(body)
+
+        self.app.post('/api/resource/reset')
+        pale.context.json = CountingJSON
+        try:
+            # the body is both the arguments and the resource to put
+            resp = self.app.put_json('/api/resource', {'key': 'once'})
+        finally:
+            pale.context.json = real_json
+        self.assertEqual(resp.json, {'key': 'once'})
+        self.assertEqual(len(parsed), 1)
+
+
     def test_resource(self):
 
         # Start by resetting the resource.
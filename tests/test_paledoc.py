@@ -6,7 +6,7 @@ from pale.doc import generate_doc_dict, generate_json_docs, generate_basic_type_
   document_endpoint, generate_raml_tree, generate_raml_resource_types, \
   generate_raml_resources, clean_description
 
-COUNT_ENDPOINTS = 9
+COUNT_ENDPOINTS = 15
 """Number of endpoints we expect to find in example_app."""
 
 class User(object):
@@ -169,7 +169,7 @@ class PaleDocTests(unittest.TestCase):
     def test_resource_doc(self):
         resources = self.doc_dict['resources']
         # we defined n resources in the example app
-        self.assertEqual(len(resources), 3)
+        self.assertEqual(len(resources), 4)
 
         resource = resources['DateTime Resource']
         self.assertEqual(resource['name'], 'DateTime Resource')
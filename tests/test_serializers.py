@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+import datetime
+import json
+import unittest
+import uuid
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+
+from dateutil import tz
+
+from pale import Endpoint, config
+from pale import serializers
+from pale.serializers import (available_backends, encoder_for,
+        format_datetime, get_serializer, PaleDefaultJSONEncoder, RawJSON,
+        register_encoder, sorted_serializer)
+
+
+class Money(object):
+    def __init__(self, cents):
+        self.cents = cents
+
+    def to_dict(self):
+        return {'cents': self.cents, 'currency': 'USD'}
+
+
+Point = namedtuple('Point', ['x', 'y'])
+
+
+EQUIVALENCE_CASES = [
+    None,
+    True,
+    u'caf\xe9 / "quoted" \n\t ☃',
+    'plain ascii',
+    0,
+    -12345678901234567890,
+    0.1,
+    1e100,
+    -2.5,
+    [],
+    {},
+    [1, [2, [3, []]], {'nested': {'deeper': [None]}}],
+    (1, 2, 3),
+    Point(1, 2),
+    OrderedDict([('b', 1), ('a', 2)]),
+    {1: 'integer key'},
+    datetime.datetime(2015, 6, 1, 12, 30, 45),
+    datetime.datetime(2015, 6, 1, 12, 30, 45, 123456),
+    datetime.datetime(2015, 6, 1, 12, 30, tzinfo=tz.tzutc()),
+    datetime.datetime(2015, 6, 1, 12, 30, tzinfo=tz.tzoffset(None, -18000)),
+    datetime.date(2015, 6, 1),
+    Decimal('10.50'),
+    set(['only item']),
+    frozenset(),
+    uuid.UUID('12345678123456781234567812345678'),
+    Money(150),
+    {'price': Money(99), 'when': [datetime.datetime(2000, 1, 1)]},
+]
+
+
+class SerializerEquivalenceTests(unittest.TestCase):
+    """Every backend must produce the same JSON (modulo whitespace) as the
+    standard library encoder."""
+
+    def setUp(self):
+        self.reference = get_serializer('stdlib')
+        self.backends = [b for b in available_backends() if b != 'stdlib']
+
+    def test_stdlib_is_the_default_encoder(self):
+        self.assertIsInstance(self.reference, PaleDefaultJSONEncoder)
+        self.assertIsInstance(Endpoint._json_serializer,
+                PaleDefaultJSONEncoder)
+
+    def test_equivalent_output(self):
+        for backend in self.backends:
+            serializer = get_serializer(backend)
+            for case in EQUIVALENCE_CASES:
+                expected = self.reference.encode(case)
+                actual = serializer.encode(case)
+                self.assertEqual(json.loads(actual), json.loads(expected),
+                        "%s encoded %r as %s, expected %s" % (
+                            backend, case, actual, expected))
+
+    def test_identical_datetimes(self):
+        for backend in self.backends:
+            serializer = get_serializer(backend)
+            for case in EQUIVALENCE_CASES:
+                if isinstance(case, datetime.datetime):
+                    self.assertEqual(serializer.encode(case),
+                            self.reference.encode(case))
+
+    def test_unsupported_types(self):
+        for backend in ['stdlib'] + self.backends:
+            serializer = get_serializer(backend)
+            for case in (object(), {'a': [object()]}, Point):
+                with self.assertRaises(TypeError):
+                    serializer.encode(case)
+
+    def test_sort_keys(self):
+        value = {'c': 1, 'a': {'z': 1, 'b': 2}, 'b': [3]}
+        for backend in ['stdlib'] + self.backends:
+            encoded = get_serializer(backend, sort_keys=True).encode(value)
+            compact = encoded.replace(' ', '')
+            self.assertEqual(compact, '{"a":{"b":2,"z":1},"b":[3],"c":1}')
+
+    def test_sorted_serializer(self):
+        value = {'c': 1, 'a': {'z': 1, 'b': 2}, 'b': [3]}
+        for backend in ['stdlib'] + self.backends:
+            serializer = get_serializer(backend)
+            sorted_one = sorted_serializer(serializer)
+            self.assertIs(sorted_serializer(serializer), sorted_one)
+            compact = sorted_one.encode(value).replace(' ', '')
+            self.assertEqual(compact, '{"a":{"b":2,"z":1},"b":[3],"c":1}')
+
+
+class RawJSONTests(unittest.TestCase):
+
+    def test_spliced_by_every_backend(self):
+        raw = RawJSON('{"b":[1,2.50,"x"]}')
+        value = {'a': raw, 'list': [RawJSON(' 7 '), RawJSON('"s"')],
+                 'text': u'\ufdd0pale-raw-json:1'}
+        for backend in available_backends():
+            encoded = get_serializer(backend).encode(value)
+            # the text is written as it is, so 2.50 isn't reformatted
+            self.assertIn('{"b":[1,2.50,"x"]}', encoded)
+            self.assertEqual(json.loads(encoded),
+                    {'a': {'b': [1, 2.5, 'x']}, 'list': [7, 's'],
+                     'text': u'\ufdd0pale-raw-json:1'})
+            self.assertEqual(get_serializer(backend).encode(raw),
+                    raw.json)
+
+    def test_outside_of_encode(self):
+        self.assertEqual(PaleDefaultJSONEncoder().default(RawJSON('[1]')),
+                [1])
+
+    def test_validation(self):
+        for text in ('{}', '[1, 2]', '"a"', 'null', 'true', '-1.5e3', '0',
+                     u'  {"a": 1}\n'):
+            RawJSON(text)
+        for text in ('', '   ', '{', '"', 'nope', '[1}', None):
+            with self.assertRaises(ValueError):
+                RawJSON(text)
+        self.assertEqual(RawJSON('nope', validate=False).json, 'nope')
+
+
+class FrozenDatetime(datetime.datetime):
+    def isoformat(self, sep='T'):
+        return 'frozen'
+
+
+class FormatDatetimeTests(unittest.TestCase):
+    """`format_datetime` must match the arrow formatting it replaced, byte
+    for byte."""
+
+    def test_matches_arrow(self):
+        import arrow
+        naive = datetime.datetime(2015, 6, 1, 12, 30, 45)
+        cases = [
+            naive,
+            naive.replace(microsecond=123456),
+            naive.replace(microsecond=1),
+            datetime.datetime.min,
+            datetime.datetime.max,
+            naive.replace(tzinfo=tz.tzutc()),
+            naive.replace(tzinfo=tz.tzoffset(None, -18000)),
+            naive.replace(tzinfo=tz.tzoffset('IST', 19800)),
+            naive.replace(microsecond=5, tzinfo=tz.tzoffset(None, 3600)),
+            naive.replace(tzinfo=tz.gettz('America/New_York')),
+            naive.replace(month=1, tzinfo=tz.gettz('America/New_York')),
+            naive.replace(tzinfo=tz.tzlocal()),
+            FrozenDatetime(2015, 6, 1, 12, 30, 45),
+            FrozenDatetime(2015, 6, 1, 12, 30, 45, tzinfo=tz.tzutc()),
+        ]
+        for case in cases:
+            self.assertEqual(format_datetime(case),
+                    arrow.get(case).isoformat(),
+                    "%r formatted differently" % (case,))
+
+    def test_formats(self):
+        self.assertEqual(
+                format_datetime(datetime.datetime(2015, 6, 1, 12, 30)),
+                '2015-06-01T12:30:00+00:00')
+        self.assertEqual(
+                format_datetime(datetime.datetime(2015, 6, 1, 12, 30, 0, 10,
+                    tzinfo=tz.tzoffset(None, -18000))),
+                '2015-06-01T12:30:00.000010-05:00')
+
+
+class OldStyleMoney:
+    def to_dict(self):
+        return {'cents': 1}
+
+
+class EncoderRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.encoder = PaleDefaultJSONEncoder()
+        self.registered = serializers._registered_encoders.copy()
+
+    def tearDown(self):
+        serializers._registered_encoders.clear()
+        serializers._registered_encoders.update(self.registered)
+        serializers._encoder_cache.clear()
+
+    def test_builtin_encoders(self):
+        encode = self.encoder.encode
+        self.assertEqual(encode(Decimal('1.50')), '"1.50"')
+        self.assertEqual(encode(datetime.date(2015, 6, 1)), '"2015-06-01"')
+        self.assertEqual(encode(set([3])), '[3]')
+        self.assertEqual(encode(uuid.UUID(int=1)),
+                '"00000000-0000-0000-0000-000000000001"')
+        self.assertEqual(encode(datetime.datetime(2015, 6, 1)),
+                '"2015-06-01T00:00:00+00:00"')
+
+    def test_to_dict(self):
+        self.assertEqual(json.loads(self.encoder.encode([Money(5)])),
+                [{'cents': 5, 'currency': 'USD'}])
+        self.assertEqual(self.encoder.encode(OldStyleMoney()),
+                '{"cents": 1}')
+
+        class Loose(object):
+            pass
+        loose = Loose()
+        with self.assertRaises(TypeError):
+            self.encoder.encode(loose)
+        # to_dict on the instance, rather than the class, still works
+        loose.to_dict = lambda: {'loose': True}
+        self.assertEqual(self.encoder.encode(loose), '{"loose": true}')
+
+    def test_register_encoder(self):
+        class Kelvin(object):
+            def __init__(self, degrees):
+                self.degrees = degrees
+
+        with self.assertRaises(TypeError):
+            self.encoder.encode(Kelvin(3))
+        register_encoder(Kelvin, lambda k: '%dK' % k.degrees)
+        self.assertEqual(self.encoder.encode(Kelvin(3)), '"3K"')
+
+        # registered encoders win over to_dict
+        register_encoder(Money, lambda m: m.cents)
+        self.assertEqual(self.encoder.encode(Money(5)), '5')
+
+        # subclasses resolve through their MRO
+        class SpecialMoney(Money):
+            pass
+        self.assertEqual(self.encoder.encode(SpecialMoney(7)), '7')
+        register_encoder(SpecialMoney, lambda m: 'special')
+        self.assertEqual(self.encoder.encode(SpecialMoney(7)), '"special"')
+        self.assertEqual(self.encoder.encode(Money(5)), '5')
+
+    def test_dispatch_is_cached(self):
+        self.assertIsNone(encoder_for(object))
+        self.assertIn(object, serializers._encoder_cache)
+        self.assertIs(encoder_for(Money), serializers._encode_with_to_dict)
+
+
+class SerializerSelectionTests(unittest.TestCase):
+
+    def tearDown(self):
+        config.set_json_backend('stdlib')
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_serializer('yaml')
+
+    def test_missing_backend_falls_back(self):
+        missing = [b for b in ('simplejson', 'ujson', 'orjson')
+                   if b not in available_backends()]
+        for backend in missing:
+            self.assertIsInstance(get_serializer(backend),
+                    PaleDefaultJSONEncoder)
+
+    def test_set_json_backend(self):
+        config.set_json_backend('fastest')
+        self.assertIsNot(Endpoint._json_serializer, None)
+        self.assertEqual(Endpoint._json_serializer.encode({'a': 1})
+                .replace(' ', ''), '{"a":1}')
+
+        config.set_json_backend('stdlib')
+        self.assertIsInstance(Endpoint._json_serializer,
+                PaleDefaultJSONEncoder)
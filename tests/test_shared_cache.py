@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+
+from pale.shared_cache import SharedMemoryCache
+from tests.test_cache import FakeClock
+
+
+class SharedMemoryCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'pale.cache')
+        self.clock = FakeClock()
+        self.caches = []
+
+    def tearDown(self):
+        for cache in self.caches:
+            cache.close()
+        shutil.rmtree(self.directory)
+
+    def open(self, **kwargs):
+        kwargs.setdefault('slot_count', 64)
+        kwargs.setdefault('slot_size', 256)
+        kwargs.setdefault('ways', 4)
+        cache = SharedMemoryCache(self.path, clock=self.clock, **kwargs)
+        self.caches.append(cache)
+        return cache
+
+    def test_get_and_set(self):
+        cache = self.open()
+        response = ('200 OK', [('Content-Type', 'application/json')],
+                    '{"time": {}}')
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', response)
+        cache.set(('fragment', 1), {'key': 1})
+        self.assertEqual(cache.get('a'), response)
+        self.assertEqual(cache.get(('fragment', 1)), {'key': 1})
+        cache.set('a', 'replaced')
+        self.assertEqual(cache.get('a'), 'replaced')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+        cache.delete('a')
+        self.assertIsNone(cache.get('a'))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_values_that_dont_fit_are_skipped(self):
+        cache = self.open()
+        cache.set('big', 'x' * 256)
+        self.assertIsNone(cache.get('big'))
+
+    def test_ttl(self):
+        cache = self.open(ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=60)
+        self.clock.now += 10
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+
+    def test_clock_eviction(self):
+        # a single bucket, so every key competes for the same slots
+        cache = self.open(slot_count=4, ways=4)
+        for i in range(4):
+            cache.set(i, i)
+        # recently read values survive the next sweep
+        cache.get(0)
+        cache.get(2)
+        cache.set(4, 4)
+        cache.set(5, 5)
+        self.assertEqual([cache.get(i) for i in range(6)],
+                [0, None, 2, None, 4, 5])
+
+    def test_shared_between_processes(self):
+        cache = self.open()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                child = SharedMemoryCache(self.path, slot_count=64,
+                        slot_size=256, ways=4, clock=self.clock)
+                child.set('from child', {'pid': os.getpid()})
+                status = 0 if child.get('from parent') is None else 1
+            except Exception:
+                status = 2
+            os._exit(status)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+        self.assertEqual(cache.get('from child'), {'pid': pid})
+
+        # the geometry of an existing file can't change
+        with self.assertRaises(ValueError):
+            self.open(slot_count=128)
+
+    def test_refuses_files_others_can_write(self):
+        self.open().close()
+        self.caches = []
+        os.chmod(self.path, 0666)
+        with self.assertRaises(ValueError):
+            self.open()
+
+        link = os.path.join(self.directory, 'link.cache')
+        os.chmod(self.path, 0600)
+        os.symlink(self.path, link)
+        with self.assertRaises(OSError) as raised:
+            SharedMemoryCache(link, slot_count=64, slot_size=256, ways=4)
+        self.assertEqual(raised.exception.errno, errno.ELOOP)
+
+    @unittest.skipIf(os.getuid() != 0, "only root can give away files")
+    def test_refuses_other_users_files(self):
+        self.open().close()
+        self.caches = []
+        os.chown(self.path, 65534, -1)
+        with self.assertRaises(ValueError):
+            self.open()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import unittest
+
+from webob import Request, Response
+
+from pale import Endpoint
+from pale.arguments import IntegerArgument
+from pale.resource import DebugResource, NoContentResource
+
+
+class CounterEndpoint(Endpoint):
+    """Counts how many times its response was rendered."""
+    _http_method = "GET"
+    _uri = "/counter"
+    _route_name = "counter"
+
+    _static = True
+    _static_refresh = 60
+
+    _returns = DebugResource("The count.")
+
+    def __init__(self):
+        self.renders = 0
+        self.fail = False
+
+    def _handle(self, context):
+        if self.fail:
+            raise ValueError("the database is down")
+        self.renders += 1
+        return {'renders': self.renders}
+
+
+class NothingEndpoint(Endpoint):
+    """Always responds with nothing."""
+    _http_method = "GET"
+    _uri = "/nothing"
+    _route_name = "nothing"
+
+    _static = True
+
+    _returns = NoContentResource()
+
+    def _handle(self, context):
+        return None
+
+
+class StaticEndpointTests(unittest.TestCase):
+
+    def setUp(self):
+        self.endpoint = CounterEndpoint()
+        self.endpoint._set_response_class(Response)
+        self.endpoint._prerender_static()
+
+    def get(self):
+        response = self.endpoint._execute(Request.blank('/counter'))
+        return json.loads(response.body)['renders']
+
+    def expire(self):
+        static = self.endpoint._static_response
+        self.endpoint._static_response = (time.time() - 1,) + static[1:]
+
+    def test_refresh(self):
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(self.get(), 1)
+        self.expire()
+        self.assertEqual(self.get(), 2)
+        self.assertEqual(self.endpoint.renders, 2)
+
+        # the old response is kept if rendering a new one fails
+        self.endpoint.fail = True
+        self.expire()
+        self.assertEqual(self.get(), 2)
+        self.assertGreater(self.endpoint._static_response[0], time.time())
+
+    def test_refreshes_dont_block_other_endpoints(self):
+        class OtherCounterEndpoint(CounterEndpoint):
+            _route_name = "other_counter"
+
+        other = OtherCounterEndpoint()
+        other._set_response_class(Response)
+        other._prerender_static()
+        static = other._static_response
+        other._static_response = (time.time() - 1,) + static[1:]
+        # while this endpoint is refreshing its response...
+        with self.endpoint._static_refresh_lock:
+            response = other._execute(Request.blank('/counter'))
+        # ...the other one still refreshes its own
+        self.assertEqual(json.loads(response.body)['renders'], 2)
+
+    def test_no_content(self):
+        endpoint = NothingEndpoint()
+        endpoint._set_response_class(Response)
+        endpoint._prerender_static()
+        for method in ('GET', 'HEAD'):
+            response = endpoint._execute(Request.blank('/nothing',
+                    method=method))
+            self.assertEqual(response.status_int, 204)
+            self.assertNotIn('Content-Type', response.headers)
+
+    def test_static_endpoints_have_no_arguments(self):
+        with self.assertRaises(TypeError):
+            class ArgumentEndpoint(Endpoint):
+                _http_method = "GET"
+                _uri = "/argument"
+                _route_name = "argument"
+                _static = True
+                _returns = DebugResource("Nothing.")
+
+                count = IntegerArgument("A count")
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import sys
+import threading
+import unittest
+
+from webtest import TestApp
+
+
+class ThreadSafetyTests(unittest.TestCase):
+    """Endpoints and their arguments are shared by every request, so
+    concurrent requests mustn't see each other's data."""
+
+    THREADS = 8
+    REQUESTS = 40
+
+    def setUp(self):
+        from tests.example_app.flask_app import create_pale_flask_app
+        self.flask_app = create_pale_flask_app()
+        # switch threads as often as possible, so races actually happen
+        self.check_interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+
+    def tearDown(self):
+        sys.setcheckinterval(self.check_interval)
+
+
+    def run_threads(self, target):
+        errors = []
+        start = threading.Event()
+        def run(thread_number):
+            # webtest apps aren't meant to be shared between threads
+            app = TestApp(self.flask_app)
+            start.wait()
+            try:
+                for i in xrange(self.REQUESTS):
+                    target(app, thread_number, i)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=run, args=(n,))
+                   for n in xrange(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+
+    def test_concurrent_requests(self):
+        def request(app, thread_number, i):
+            links = ['http://example.com/%d/%d/%d' % (thread_number, i, n)
+                     for n in xrange(thread_number % 3 + 1)]
+            mirrors = ['http://mirror.example.com/%d' % thread_number] * i
+            resp = app.get('/api/links',
+                    [('links', link) for link in links] +
+                    [('mirrors', mirror) for mirror in mirrors])
+            self.assertEqual(resp.json, {'links': links, 'mirrors': mirrors,
+                                         'count': len(links) + i})
+        self.run_threads(request)
+
+
+    def test_concurrent_argument_errors(self):
+        # the lists share their item argument, so its errors have to name
+        # the list that was being validated in the same request
+        def request(app, thread_number, i):
+            bad = 'links' if (thread_number + i) % 2 else 'mirrors'
+            params = [('links', 'http://example.com'),
+                      ('mirrors', 'http://example.com')]
+            params.append((bad, 'not a url'))
+            resp = app.get('/api/links', params, status=422)
+            self.assertIn('`%s`' % bad, resp.json['error'])
+        self.run_threads(request)